@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 from corsheaders.defaults import default_headers
 import environ
@@ -210,12 +211,16 @@ AUTH_USER_MODEL = 'users.User'
 # Rest Framework Authentication
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'app.utils.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': (
         'rest_framework.pagination.PageNumberPagination',
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    'DEFAULT_RENDERER_CLASSES': (
+        'app.utils.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     "PAGE_SIZE": 5,
 }
 
@@ -263,13 +268,64 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_TIME_LIMIT = 5 * 60  # 5 minutes
 CELERY_TASK_SOFT_TIME_LIMIT = 60  # 1 minute
 
+# Routing settings
+# The openai queue is consumed by its own worker; stock writes and their upkeep go to the stock queue
+CELERY_TASK_ROUTES = {
+    "apply_landing_ingestions": {"queue": "stock"},
+    "compact_stock_shards": {"queue": "stock"},
+    "purge_synced_operations": {"queue": "stock"},
+}
+
 # Scheduler settings
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+# Installed in the database scheduler by beat on startup
+CELERY_BEAT_SCHEDULE = {
+    # Landings whose task was never enqueued (broker down) or was lost stay pending until the next run
+    "apply-pending-landings": {
+        "task": "apply_landing_ingestions",
+        "schedule": timedelta(minutes=1),
+    },
+    # Keeps the number of shard rows summed into every stock read small
+    "compact-stock-shards": {
+        "task": "compact_stock_shards",
+        "schedule": timedelta(minutes=5),
+    },
+    "purge-synced-operations": {
+        "task": "purge_synced_operations",
+        "schedule": timedelta(days=1),
+    },
+}
 
 # Event settings
 CELERY_WORKER_SEND_TASK_EVENTS = True
 CELERY_TASK_SEND_SENT_EVENT = True
 
+# Landings accepted in async mode are applied by the apply_landing_ingestions task this many at a time
+LANDING_INGESTION_BATCH_SIZE = env.int("LANDING_INGESTION_BATCH_SIZE", 200)
+
+# op_ids of /records/sync/ operations are remembered this long; a device replaying an older one applies it again
+SYNCED_OPERATION_RETENTION_DAYS = env.int("SYNCED_OPERATION_RETENTION_DAYS", 30)
+
+# List endpoints serialize through app.utils.compiled_serializers when the serializer allows it
+COMPILED_SERIALIZERS = env.bool("COMPILED_SERIALIZERS", True)
+
+# Encoder of every JSON response, see app.utils.renderers (orjson_dumps or stdlib_dumps)
+JSON_DUMPS = env("JSON_DUMPS", default="app.utils.renderers.orjson_dumps")
+
+# Rows fetched per round trip (and written per chunk) by the streaming exports, see app.utils.exports
+EXPORT_CHUNK_SIZE = env.int("EXPORT_CHUNK_SIZE", 2000)
+
+# page=all returns at most this many rows (with the real count), fetched from the database in chunks
+PAGE_ALL_MAX_ROWS = env.int("PAGE_ALL_MAX_ROWS", 5000)
+SERIALIZATION_CHUNK_SIZE = env.int("SERIALIZATION_CHUNK_SIZE", 1000)
+
+# Seconds between writes of the per-process listing cache hit counters to redis, see app.utils.response_cache
+CACHE_STATS_FLUSH_INTERVAL = env.int("CACHE_STATS_FLUSH_INTERVAL", 10)
+
+# In-process cache of reference data (fish, places, organizations...), see app.utils.local_cache
+LOCAL_CACHE_MAX_ENTRIES = env.int("LOCAL_CACHE_MAX_ENTRIES", 10000)
+LOCAL_CACHE_TIMEOUT = env.int("LOCAL_CACHE_TIMEOUT", 60)
+
 
 SITE_ID = 1
 # Static files (CSS, JavaScript, Images)
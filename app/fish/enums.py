@@ -1,3 +1,4 @@
+from decimal import Decimal, ROUND_HALF_UP
 from enum import unique
 from django.db import models
 
@@ -9,3 +10,16 @@ class WeightUnit(models.TextChoices):
     POUNDS = 'lb', 'Pounds'
     TONNE = 't', 'Tonne'
     KILOTONNE = 'kt', 'KiloTonne'
+
+    def to_grams(self, weight):
+        """Convert a weight expressed in this unit to whole grams, the canonical unit used for aggregation."""
+        return int((Decimal(weight) * GRAMS_PER_UNIT[self.value]).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+GRAMS_PER_UNIT = {
+    WeightUnit.KILOGRAMS.value: Decimal(1000),
+    WeightUnit.GRAMS.value: Decimal(1),
+    WeightUnit.POUNDS.value: Decimal('453.59237'),
+    WeightUnit.TONNE.value: Decimal(1000000),
+    WeightUnit.KILOTONNE.value: Decimal(1000000000),
+}
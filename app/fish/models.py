@@ -4,6 +4,7 @@ from django.urls import reverse
 
 from app.fish.enums import WeightUnit
 from app.organizations.enums import PlaceType
+from app.utils.querysets import SignalingQuerySet
 
 # Create a list of choices for the 'type' field with only 'Retail', 'Market', and 'Merchant' options for Sales
 SALES_TYPE_CHOICES = [(PlaceType.RETAIL, 'Retail'), (PlaceType.MARKET, 'Market'), (PlaceType.MERCHANT, 'Merchant')]
@@ -17,6 +18,8 @@ class Fish(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.id}. name: {self.name} org:{self.organization}"
 
@@ -43,6 +46,8 @@ class FishVariant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"id: {self.id}. fish: {self.fish.name} variant: [{self.name}]"
 
@@ -71,6 +76,8 @@ class Discount(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"id: {self.id}. name: {self.name} type: {self.type}"
 
@@ -89,5 +96,7 @@ class PriceHistory(models.Model):
     fish_variant = models.ForeignKey('fish.FishVariant', on_delete=models.SET_NULL,
                                      blank=True, null=True, related_name="price_history")
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"id: {self.id}. changed price: {self.price} effective_time: {self.effective_time} user: {self.user.name}"
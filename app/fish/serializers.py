@@ -27,6 +27,8 @@ class FishVariantSerializer(serializers.ModelSerializer):
     class Meta:
         model = FishVariant
         exclude = ('fish', )
+        # Method fields rendering an enum, precomputed by the compiled serializer
+        enum_fields = {'weight_unit': WeightUnit}
 
 
 class DiscountSerializer(serializers.ModelSerializer):
@@ -41,6 +43,7 @@ class DiscountSerializer(serializers.ModelSerializer):
     class Meta:
         model = Discount
         fields = '__all__'
+        enum_fields = {'type': PlaceType}
 
 
 class PriceHistorySerializer(serializers.ModelSerializer):
@@ -1,5 +1,4 @@
 from django.core.cache import cache
-from django.http import JsonResponse
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -12,8 +11,11 @@ from app.fish.schemas import FishCreationReqSchema, FishEditReqSchema, FishListi
 from app.fish.serializers import DiscountSerializer, FishVariantSerializer, FishSerializer, PriceHistorySerializer
 from app.utils.authentication import IsOrganizationUser
 from app.utils.constants import Timeouts, CacheKeys
-from app.utils.helpers import qdict_to_dict, build_cache_key
+from app.utils.helpers import qdict_to_dict, get_sparse_fieldset, \
+    SPARSE_FIELDSET_PARAMETERS, is_normalized
 from app.utils.pagination import CustomPageNumberPagination
+from app.utils.renderers import JsonResponse
+from app.utils.response_cache import cache_detail, cached_listing, conditional_detail, get_evictions
 
 
 class FishViewSet(viewsets.ViewSet):
@@ -126,8 +128,10 @@ class FishViewSet(viewsets.ViewSet):
                              description='organization_id'),
             OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=False, type=bool,
                              description='is_active'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.FISH_LIST, FishListingReqSchema)
     def list(self, request, **kwargs):
         """
         Serves GET requests given on the entity API root path.
@@ -143,42 +147,26 @@ class FishViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-        cache_key = build_cache_key(
-            CacheKeys.FISH_LIST,
+        # Get and Filter
+        errors, data = self.controller.filter_fish(
             name=data.name,
             organization_id=data.organization_id or user.organization.id,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_fish(
-                name=data.name,
-                organization_id=data.organization_id or user.organization.id,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
+
+        # Serialize data
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="""
@@ -194,6 +182,7 @@ class FishViewSet(viewsets.ViewSet):
                              description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.FISH_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         """
         Serves GET requests coming for a particular entity by id `pk`
@@ -206,16 +195,16 @@ class FishViewSet(viewsets.ViewSet):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.FISH_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
                 return JsonResponse({"error": "fish with this id does not exists"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -257,12 +246,15 @@ class FishViewSet(viewsets.ViewSet):
         parameters=[
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int,
                              description='pk'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
     @action(methods=['GET'], detail=True)
     def fish_variants(self, request, pk, *args, **kwargs):
         # Paginate queryset
         paginator = CustomPageNumberPagination()
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         page_key = request.query_params.get('page')
         locale = request.LANGUAGE_CODE
 
@@ -280,7 +272,8 @@ class FishViewSet(viewsets.ViewSet):
             page = data
 
         # Serialize data
-        data = self.fish_variant_controller.serialize_queryset(page, self.fish_variant_serializer)
+        data = self.fish_variant_controller.serialize_queryset(page, self.fish_variant_serializer,
+                                                               fields=fields, expand=expand, normalize=normalize)
         result = paginator.get_paginated_response(data)
         return result
 
@@ -297,9 +290,12 @@ class FishViewSet(viewsets.ViewSet):
                              description='Start time for the price history'),
             OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
                              description='End time for the price history'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
     @action(methods=['GET'], detail=False)
+    @cached_listing(CacheKeys.PRICE_HISTORY_LIST, PriceHistoryListingSchema,
+                    serializer_attr='price_history_serializer')
     def price_histories(self, request, *args, **kwargs):
         # Parsing request
         errors, data = self.controller.parse_request(PriceHistoryListingSchema, qdict_to_dict(request.query_params))
@@ -308,47 +304,27 @@ class FishViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
-
-        cache_key = build_cache_key(
-            CacheKeys.PRICE_HISTORY_LIST,
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
+        # Get and Filter
+        errors, data = self.price_history_controller.filter_price_histories(
             user_id=data.user_id,
             fish_id=data.fish_id,
-            fish_variant=data.fish_variant_id,
+            fish_variant_id=data.fish_variant_id,
             start_time=data.get_start_time(),
             end_time=data.get_end_time(),
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            errors, data = self.price_history_controller.filter_price_histories(
-                user_id=data.user_id,
-                fish_id=data.fish_id,
-                fish_variant_id=data.fish_variant_id,
-                start_time=data.get_start_time(),
-                end_time=data.get_end_time(),
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.price_history_controller.serialize_queryset(page, self.price_history_serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
 
+        # Serialize data
+        data = self.price_history_controller.serialize_queryset(page, self.price_history_serializer,
+                                                                fields=fields, expand=expand, normalize=normalize)
+        return paginator.get_paginated_response(data)
 
 class FishVariantViewSet(viewsets.ViewSet):
     permission_classes = (IsOrganizationUser,)
@@ -460,8 +436,10 @@ class FishVariantViewSet(viewsets.ViewSet):
                              description='Name of the fish variant'),
             OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=False, type=bool,
                              description='Active status of the fish variant'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.FISH_VARIANT_LIST, FishVariantListingReqSchema)
     def list(self, request, **kwargs):
         """
         Serves GET requests for a list of fish variants.
@@ -477,44 +455,27 @@ class FishVariantViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-        cache_key = build_cache_key(
-            CacheKeys.FISH_VARIANT_LIST,
+        # Get and Filter
+        errors, fish_variants = self.controller.filter_fish_variants(
             fish_id=data.fish_id,
-            name=data.name,
             organization_id=data.organization_id or user.organization.id,
+            name=data.name,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            errors, fish_variants = self.controller.filter_fish_variants(
-                fish_id=data.fish_id,
-                organization_id=data.organization_id or user.organization.id,
-                name=data.name,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(fish_variants, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(fish_variants, request)
+        if page is None:
+            page = data
+
+        # Serialize data
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="""
@@ -529,6 +490,7 @@ class FishVariantViewSet(viewsets.ViewSet):
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.FISH_VARIANT_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         """
         Serves GET requests for a particular fish variant by ID.
@@ -541,16 +503,16 @@ class FishVariantViewSet(viewsets.ViewSet):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.FISH_VARIANT_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
                 return JsonResponse({"error": "Fish variant with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -681,8 +643,10 @@ class DiscountViewSet(viewsets.ViewSet):
                              description='Type'),
             OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=True, type=bool,
                              description='Is Active'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.DISCOUNT_LIST, DiscountListingReqSchema)
     def list(self, request, **kwargs):
         """
         Serves GET requests for a list of discounts.
@@ -698,45 +662,28 @@ class DiscountViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-        cache_key = build_cache_key(
-            CacheKeys.DISCOUNT_LIST,
+        # Get and Filter
+        # Filter discounts based on the provided criteria
+        errors, discount_qs = self.controller.filter_discounts(
             organization_id=data.organization_id or user.organization.id,
             name=data.name,
             type=data.type,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            # Filter discounts based on the provided criteria
-            errors, discount_qs = self.controller.filter_discounts(
-                organization_id=data.organization_id or user.organization.id,
-                name=data.name,
-                type=data.type,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(discount_qs, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(discount_qs, request)
+        if page is None:
+            page = data
+
+        # Serialize data
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="Retrieve a specific discount by ID.",
@@ -745,21 +692,22 @@ class DiscountViewSet(viewsets.ViewSet):
                              description='Discount ID'),
         ],
     )
+    @conditional_detail(CacheKeys.DISCOUNT_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         # Retrieve a specific discount by ID
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.DISCOUNT_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
 
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             discount_obj = self.controller.get_instance_by_pk(pk=pk)
             if not discount_obj:
                 return JsonResponse({"error": "Discount with this ID does not exist"}, status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(discount_obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
 
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
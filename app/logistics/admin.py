@@ -1,9 +1,14 @@
 from django.contrib import admin
 
-from app.logistics.models import Record, BillItem, Bill, Stock, Expense
+from app.logistics.models import Record, BillItem, Bill, Stock, Expense, StockMovement, LandingIngestion, StockShard, \
+    SyncedOperation
 
 admin.site.register(Record)
 admin.site.register(BillItem)
 admin.site.register(Bill)
 admin.site.register(Stock)
 admin.site.register(Expense)
+admin.site.register(StockMovement)
+admin.site.register(LandingIngestion)
+admin.site.register(SyncedOperation)
+admin.site.register(StockShard)
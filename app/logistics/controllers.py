@@ -1,14 +1,30 @@
+import random
+from decimal import Decimal
 from typing import Optional
 
 from django.conf import settings
-from django.db.models import F, Q, Case, When, Value, Count
+from django.core.cache import cache
+from django.db.models import F, Q, Case, When, Value, Count, Sum, OuterRef, Subquery, DecimalField, \
+    BigIntegerField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils import translation
-from django.db import IntegrityError, transaction
-from app.logistics.models import Record, Expense, Bill, BillItem, Stock
-from app.logistics.schemas import BillItemCreationReqSchema
+from django.db import IntegrityError, OperationalError, connection, transaction
+from app.fish.enums import GRAMS_PER_UNIT, WeightUnit
+from app.logistics.enums import IngestionStatus, RecordType
+from app.logistics.models import Record, Expense, Bill, BillItem, Stock, StockMovement, LandingIngestion, \
+    StockShard, SyncedOperation
+from app.logistics.schemas import BillItemCreationReqSchema, RecordCreationReqSchema
+from app.utils.constants import CacheKeys, Timeouts
 from app.utils.controllers import Controller
 from app.utils.helpers import get_serialized_exception
+from app.utils.response_cache import invalidate, invalidate_pks
+
+
+# SQLSTATE of a transaction that must be retried because of a concurrent write
+SERIALIZATION_FAILURE = '40001'
+# Times a stock reconciliation is attempted before giving up on concurrent writes
+RECONCILE_ATTEMPTS = 3
 
 
 class RecordController(Controller):
@@ -36,6 +52,23 @@ class RecordController(Controller):
         except IntegrityError as e:
             return get_serialized_exception(e)
 
+    def create_bulk_records(self, records):
+        """
+        Insert many records with a single query
+        :param records: list of dicts holding the Record field values (as taken by create_record)
+        :return: list of created Record objects, in the same order
+        """
+        try:
+            records = [self.model(**record) for record in records]
+            for record in records:
+                # bulk_create skips save(), so keep the canonical weight in sync here
+                record.weight_in_grams = WeightUnit(record.weight_unit).to_grams(record.weight)
+            with transaction.atomic():
+                record_qs = self.model.objects.bulk_create(records)
+            return None, record_qs
+        except IntegrityError as e:
+            return get_serialized_exception(e)
+
     def edit_record(self, record_obj, organization_id, user_id, import_from_id, export_to_id, record_type, discount_id,
                     fish_id, fish_variant_id, weigh_place_id, weight, weight_unit, is_SP, is_active):
         try:
@@ -224,7 +257,25 @@ class BillController(Controller):
             return get_serialized_exception(e)
 
     def get_valid_bills(self):
-        return self.model.objects.all()
+        return self.annotate_bill_totals(self.model.objects.all())
+
+    def get_instance_by_pk(self, pk: int):
+        try:
+            return self.get_valid_bills().get(pk=pk)
+        except self.model.DoesNotExist:
+            return None
+
+    def annotate_bill_totals(self, bill_qs):
+        """Annotate total_weight and item_count of every bill within the bill query itself"""
+        bill_items = BillItem.objects.filter(bill=OuterRef('pk')).order_by().values('bill')
+        return bill_qs.annotate(
+            total_weight=Coalesce(
+                Subquery(bill_items.annotate(total=Sum('weight')).values('total')),
+                Value(Decimal(0)),
+                output_field=DecimalField(max_digits=20, decimal_places=2)
+            ),
+            item_count=Coalesce(Subquery(bill_items.annotate(count=Count('pk')).values('count')), Value(0)),
+        )
 
     def make_inactive(self, obj):
         try:
@@ -278,7 +329,8 @@ class BillItemController(Controller):
                     fish_id=item.fish_id,
                     fish_variant_id=item.fish_variant_id,
                     is_SP=item.is_SP,
-                    is_active=item.is_active
+                    is_active=item.is_active,
+                    weight_in_grams=WeightUnit(item.weight_unit).to_grams(item.weight)
                 )
                 for item in bill_items
             ]
@@ -359,14 +411,16 @@ class StockController(Controller):
                      weight,
                      weight_unit):
         try:
-            stock = self.model.objects.create(
-                place_id=place_id,
-                fish_id=fish_id,
-                fish_variant_id=fish_variant_id,
-                is_SP=is_SP,
-                weight=weight,
-                weight_unit=weight_unit
-            )
+            with transaction.atomic():
+                stock = self.model.objects.create(
+                    place_id=place_id,
+                    fish_id=fish_id,
+                    fish_variant_id=fish_variant_id,
+                    is_SP=is_SP,
+                    weight=weight,
+                    weight_unit=weight_unit
+                )
+                StockMovement.objects.create(stock=stock, weight=weight)
             return None, stock
         except IntegrityError as e:
             return get_serialized_exception(e)
@@ -377,30 +431,285 @@ class StockController(Controller):
                             fish_variant_id,
                             is_SP,
                             weight,
-                            weight_unit):
+                            weight_unit,
+                            record_id=None,
+                            bill_item_id=None):
+        key = (place_id, fish_id, fish_variant_id, is_SP, weight_unit)
+        errors, stocks = self.update_stock_weights([key + (weight,)],
+                                                   sources=[{'record_id': record_id, 'bill_item_id': bill_item_id}])
+        if errors:
+            return errors, None
+        return None, stocks[key]
+
+    def aggregate_stock_deltas(self, deltas):
+        """
+        Merge weight deltas that hit the same stock row
+        :param deltas: iterable of (place_id, fish_id, fish_variant_id, is_SP, weight_unit, weight)
+        :return: dict of stock key -> summed weight
+        """
+        merged = {}
+        for place_id, fish_id, fish_variant_id, is_SP, weight_unit, weight in deltas:
+            key = (place_id, fish_id, fish_variant_id, is_SP, weight_unit)
+            merged[key] = merged.get(key, Decimal(0)) + weight
+        return merged
+
+    def update_stock_weights(self, deltas, sources=None):
+        """
+        Apply a batch of stock weight deltas in a single INSERT ... ON CONFLICT DO UPDATE statement.
+        Relies on the unique_stock_key constraint, so concurrent writers can neither create duplicate
+        rows nor lose increments. Deltas of sharded stocks go to a random StockShard of the stock instead.
+        Every delta is also appended to the StockMovement ledger by the same statement.
+        :param deltas: iterable of (place_id, fish_id, fish_variant_id, is_SP, weight_unit, weight)
+        :param sources: optional list, parallel to deltas, of dicts with the record_id / bill_item_id
+                        that caused each delta
+        :return: dict of stock key -> Stock
+        """
         try:
-            stock, created = self.model.objects.get_or_create(
-                place_id=place_id,
-                fish_id=fish_id,
-                fish_variant_id=fish_variant_id,
-                is_SP=is_SP,
-                weight_unit=weight_unit,
-                defaults={'weight': weight, 'weight_unit': weight_unit}
+            deltas = list(deltas)
+            merged = self.aggregate_stock_deltas(deltas)
+            if not merged:
+                return None, {}
+            sharded = self.get_sharded_stocks()
+            # Upsert rows in a fixed order so concurrent batches touching the same rows cannot deadlock
+            keys = sorted((key for key in merged if key not in sharded),
+                          key=lambda k: (k[0] or 0, k[1] or 0, k[2] or 0, k[3], str(k[4])))
+            shard_deltas = sorted(
+                (sharded[key][0], random.randrange(sharded[key][1]), merged[key],
+                 WeightUnit(key[4]).to_grams(merged[key]))
+                for key in merged if key in sharded
             )
+            now = timezone.now()
+            row_movements = []
+            shard_movements = []
+            for delta, source in zip(deltas, sources or [None] * len(deltas)):
+                key, source = delta[:5], source or {}
+                movement = (source.get('record_id'), source.get('bill_item_id'), delta[5])
+                if key in sharded:
+                    shard_movements.append((sharded[key][0],) + movement)
+                else:
+                    row_movements.append(key + movement)
 
-            if not created:
-                # Update the weight if the object was retrieved, not created
-                self.model.objects.filter(
-                    place_id=place_id,
-                    fish_id=fish_id,
-                    fish_variant_id=fish_variant_id,
-                    is_SP=is_SP,
-                    weight_unit=weight_unit
-                ).update(weight=F('weight') + weight)
-            return None, stock
+            stocks = {}
+            # (pk, organization id, {}) of the written stocks, for the response cache
+            written = []
+            with transaction.atomic():
+                if keys:
+                    for pk, place_id, fish_id, fish_variant_id, is_SP, weight_unit, weight, weight_in_grams, \
+                            updated_at, organization_id in self.upsert_stock_rows(keys, merged, row_movements, now):
+                        written.append((pk, organization_id, {}))
+                        stocks[(place_id, fish_id, fish_variant_id, is_SP, weight_unit)] = self.model(
+                            pk=pk,
+                            place_id=place_id,
+                            fish_id=fish_id,
+                            fish_variant_id=fish_variant_id,
+                            is_SP=is_SP,
+                            weight_unit=weight_unit,
+                            weight=weight,
+                            weight_in_grams=weight_in_grams,
+                            updated_at=updated_at
+                        )
+                if shard_deltas:
+                    self.upsert_stock_shards(shard_deltas, shard_movements, now)
+                    for key in merged:
+                        if key in sharded:
+                            written.append((sharded[key][0], sharded[key][2], {}))
+                            stocks[key] = self.model(
+                                pk=sharded[key][0],
+                                place_id=key[0],
+                                fish_id=key[1],
+                                fish_variant_id=key[2],
+                                is_SP=key[3],
+                                weight_unit=key[4],
+                                shard_count=sharded[key][1]
+                            )
+                # Stock rows are written with raw SQL, no post_save. Movements aren't rendered by cached responses
+                invalidate(self.model, written)
+            return None, {key: stocks[key] for key in merged}
         except IntegrityError as e:
             return get_serialized_exception(e)
 
+    def upsert_stock_rows(self, keys, merged, movements, now):
+        """
+        Add the merged deltas of the given (sorted) keys to their Stock rows, creating missing rows, and append
+        the deltas they merge to the ledger
+        :param movements: list of (place, fish, fish_variant, is_SP, weight_unit, record_id, bill_item_id, weight)
+        :return: rows of (pk, place, fish, fish_variant, is_SP, weight_unit, weight, weight_in_grams, updated_at,
+                 organization of the place)
+        """
+        params = []
+        for key in keys:
+            params.extend(key[:4] + (str(key[4]), merged[key], WeightUnit(key[4]).to_grams(merged[key]), now, 0))
+
+        opts = self.model._meta
+        place_opts = opts.get_field('place').related_model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        columns = [qn(opts.get_field(name).column)
+                   for name in ('place', 'fish', 'fish_variant', 'is_SP', 'weight_unit', 'weight',
+                                'weight_in_grams', 'updated_at')]
+        place, fish, fish_variant, is_SP, weight_unit, weight, weight_in_grams, updated_at = columns
+        insert_columns = columns + [qn(opts.get_field('shard_count').column)]
+        # Typed, since a VALUES column of NULLs would be text
+        movement_types = [opts.get_field(name).db_type(connection)
+                          for name in ('place', 'fish', 'fish_variant', 'is_SP', 'weight_unit')]
+        movement_types += [StockMovement._meta.get_field(name).db_type(connection)
+                           for name in ('record', 'bill_item', 'weight')]
+        movement_row = '(' + ', '.join(f'%s::{db_type}' for db_type in movement_types) + ')'
+        params.append(now)
+        for movement in movements:
+            params.extend(movement[:4] + (str(movement[4]),) + movement[5:])
+        sql = (
+            f"WITH upserted AS ("
+            f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+            f"VALUES {', '.join(['(' + ', '.join(['%s'] * len(insert_columns)) + ')'] * len(keys))} "
+            f"ON CONFLICT (COALESCE({place}, 0), COALESCE({fish}, 0), COALESCE({fish_variant}, 0), "
+            f"{is_SP}, {weight_unit}) "
+            f"DO UPDATE SET {weight} = {table}.{weight} + EXCLUDED.{weight}, "
+            f"{weight_in_grams} = "
+            f"{self.get_grams_sql(f'{table}.{weight} + EXCLUDED.{weight}', f'{table}.{weight_unit}')}, "
+            f"{updated_at} = EXCLUDED.{updated_at} "
+            f"RETURNING {qn(opts.pk.column)}, {', '.join(columns)}, "
+            f"(SELECT {qn(place_opts.get_field('organization').column)} FROM {qn(place_opts.db_table)} "
+            f"WHERE {qn(place_opts.pk.column)} = {table}.{place})"
+            f"), movements AS ("
+            f"INSERT INTO {self.get_movement_columns_sql()} "
+            f"SELECT upserted.{qn(opts.pk.column)}, m.record, m.bill_item, m.weight, %s "
+            f"FROM (VALUES {', '.join([movement_row] * len(movements))}) "
+            f"AS m(place, fish, fish_variant, is_sp, weight_unit, record, bill_item, weight) "
+            f"JOIN upserted ON upserted.{place} IS NOT DISTINCT FROM m.place "
+            f"AND upserted.{fish} IS NOT DISTINCT FROM m.fish "
+            f"AND upserted.{fish_variant} IS NOT DISTINCT FROM m.fish_variant "
+            f"AND upserted.{is_SP} = m.is_sp AND upserted.{weight_unit} = m.weight_unit"
+            f") SELECT * FROM upserted"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def upsert_stock_shards(self, shard_deltas, movements, now):
+        """
+        Add deltas to stock shards, creating missing shard rows, and append the deltas they merge to the ledger
+        :param shard_deltas: sorted list of (stock_id, shard, weight, weight_in_grams)
+        :param movements: list of (stock_id, record_id, bill_item_id, weight)
+        """
+        opts = StockShard._meta
+        stock_opts = self.model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        columns = [qn(opts.get_field(name).column)
+                   for name in ('stock', 'shard', 'weight', 'weight_in_grams', 'updated_at')]
+        stock, shard, weight, weight_in_grams, updated_at = columns
+        weight_unit = (f"(SELECT {qn(stock_opts.get_field('weight_unit').column)} FROM {qn(stock_opts.db_table)} "
+                       f"WHERE {qn(stock_opts.pk.column)} = {table}.{stock})")
+        sql = (
+            f"WITH upserted AS ("
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES {', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(shard_deltas))} "
+            f"ON CONFLICT ({stock}, {shard}) "
+            f"DO UPDATE SET {weight} = {table}.{weight} + EXCLUDED.{weight}, "
+            f"{weight_in_grams} = {self.get_grams_sql(f'{table}.{weight} + EXCLUDED.{weight}', weight_unit)}, "
+            f"{updated_at} = EXCLUDED.{updated_at}"
+            f") INSERT INTO {self.get_movement_columns_sql()} "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(movements))}"
+        )
+        params = []
+        for shard_delta in shard_deltas:
+            params.extend(shard_delta + (now,))
+        for movement in movements:
+            params.extend(movement + (now,))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def get_grams_sql(self, weight, weight_unit):
+        """
+        SQL converting the weight expression, in the unit of the weight_unit expression, to whole grams rounded
+        like WeightUnit.to_grams. Running totals are converted from their weight every time they change rather
+        than summing converted deltas, whose rounding errors would add up.
+        """
+        factors = ' '.join(f"WHEN '{unit}' THEN {factor}" for unit, factor in GRAMS_PER_UNIT.items())
+        return f"ROUND(({weight}) * CASE {weight_unit} {factors} END)"
+
+    def get_movement_columns_sql(self):
+        """StockMovement table and the (stock, record, bill_item, weight, created_at) columns, quoted for SQL"""
+        opts = StockMovement._meta
+        qn = connection.ops.quote_name
+        columns = [qn(opts.get_field(name).column) for name in ('stock', 'record', 'bill_item', 'weight', 'created_at')]
+        return f"{qn(opts.db_table)} ({', '.join(columns)})"
+
+    def get_sharded_stocks(self):
+        """
+        Stocks whose updates go through shards, as stock key -> (stock id, shard count, organization id).
+        Cached briefly; a stale entry only sends a delta to the stock row instead of a shard or the other way
+        round, and both are counted.
+        """
+        sharded = cache.get(CacheKeys.SHARDED_STOCKS.value)
+        if sharded is None:
+            stocks = self.model.objects.filter(shard_count__gt=1).values_list(
+                'pk', 'place_id', 'fish_id', 'fish_variant_id', 'is_SP', 'weight_unit', 'shard_count',
+                'place__organization_id')
+            sharded = {(place_id, fish_id, fish_variant_id, is_SP, weight_unit): (pk, shard_count, organization_id)
+                       for pk, place_id, fish_id, fish_variant_id, is_SP, weight_unit, shard_count, organization_id
+                       in stocks}
+            cache.set(CacheKeys.SHARDED_STOCKS.value, sharded, timeout=Timeouts.MINUTES_2)
+        return sharded
+
+    def compact_stock_shards(self, stock_ids=None):
+        """
+        Fold shard weights back into their stock rows with a single statement: the shards are deleted and
+        their totals added to the stocks, whose grams are converted again from the new total. The ledger is
+        untouched since the total weight doesn't change.
+        :param stock_ids: only compact these stocks, all of them by default
+        :return: number of stocks compacted
+        """
+        stock_opts = self.model._meta
+        shard_opts = StockShard._meta
+        qn = connection.ops.quote_name
+        stock_table = qn(stock_opts.db_table)
+        shard_table = qn(shard_opts.db_table)
+        shard_stock = qn(shard_opts.get_field('stock').column)
+        weight = qn(stock_opts.get_field('weight').column)
+        weight_in_grams = qn(stock_opts.get_field('weight_in_grams').column)
+        weight_unit = qn(stock_opts.get_field('weight_unit').column)
+        updated_at = qn(stock_opts.get_field('updated_at').column)
+        pk = qn(stock_opts.pk.column)
+        params = []
+        where = ""
+        if stock_ids is not None:
+            where = f"WHERE {shard_stock} = ANY(%s) "
+            params.append(list(stock_ids))
+        sql = (
+            f"WITH folded AS (DELETE FROM {shard_table} {where}"
+            f"RETURNING {shard_stock} AS stock_id, {weight} AS weight), "
+            f"totals AS (SELECT stock_id, SUM(weight) AS weight FROM folded GROUP BY stock_id) "
+            f"UPDATE {stock_table} SET {weight} = {stock_table}.{weight} + totals.weight, "
+            f"{weight_in_grams} = "
+            f"{self.get_grams_sql(f'{stock_table}.{weight} + totals.weight', f'{stock_table}.{weight_unit}')}, "
+            f"{updated_at} = %s "
+            f"FROM totals WHERE {stock_table}.{pk} = totals.stock_id RETURNING {stock_table}.{pk}"
+        )
+        params.append(timezone.now())
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            compacted = [pk for pk, in cursor.fetchall()]
+            invalidate_pks(self.model, compacted)
+            return len(compacted)
+
+    def annotate_shard_weights(self, stock_qs):
+        """Annotate shard_weight and shard_weight_in_grams: the shard totals not yet compacted into the stock"""
+        shards = StockShard.objects.filter(stock=OuterRef('pk')).order_by().values('stock')
+        return stock_qs.annotate(
+            shard_weight=Coalesce(
+                Subquery(shards.annotate(total=Sum('weight')).values('total')),
+                Value(Decimal(0)),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            ),
+            shard_weight_in_grams=Coalesce(
+                Subquery(shards.annotate(total=Sum('weight_in_grams')).values('total')),
+                Value(0),
+                output_field=BigIntegerField()
+            ),
+        )
+
     def edit_stock(self,
                    stock,
                    place_id,
@@ -410,18 +719,38 @@ class StockController(Controller):
                    weight,
                    weight_unit):
         try:
-            stock.place_id = place_id
-            stock.fish_id = fish_id
-            stock.fish_variant_id = fish_variant_id
-            stock.is_SP = is_SP
-            stock.weight = weight
-            stock.weight_unit = weight_unit
-
-            stock.save()
+            with transaction.atomic():
+                # The new weight replaces the total, so shards must not add to it afterwards
+                self.compact_stock_shards(stock_ids=[stock.pk])
+                current_weight = self.model.objects.select_for_update().values_list('weight', flat=True).get(
+                    pk=stock.pk)
+                stock.place_id = place_id
+                stock.fish_id = fish_id
+                stock.fish_variant_id = fish_variant_id
+                stock.is_SP = is_SP
+                stock.weight = weight
+                stock.weight_unit = weight_unit
+
+                stock.save()
+                if weight != current_weight:
+                    StockMovement.objects.create(stock=stock, weight=weight - current_weight)
             return None, stock
         except IntegrityError as e:
             return get_serialized_exception(e)
 
+    def get_stock_weight_at(self, stock, at):
+        """
+        Weight of a stock at a past moment: the current snapshot minus every movement made after it.
+        Only the movements newer than `at` are scanned.
+        """
+        try:
+            weight = self.annotate_shard_weights(self.model.objects.filter(pk=stock.pk)).annotate(
+                moved_since=Coalesce(Sum('movements__weight', filter=Q(movements__created_at__gt=at)), Decimal(0))
+            ).values_list(F('weight') + F('shard_weight') - F('moved_since'), flat=True).get()
+            return None, weight
+        except Exception as e:
+            return get_serialized_exception(e)
+
     def filter_stocks(self,
                       organization_id,
                       place_id,
@@ -456,7 +785,107 @@ class StockController(Controller):
             return get_serialized_exception(e)
 
     def get_valid_stocks(self):
-        return self.model.objects.select_related('place', 'fish_variant').all()
+        return self.annotate_shard_weights(self.model.objects.select_related('place', 'fish_variant').all())
+
+    def get_instance_by_pk(self, pk: int):
+        try:
+            return self.get_valid_stocks().get(pk=pk)
+        except self.model.DoesNotExist:
+            return None
+
+    def get_total_stock_weights(self, organization_id, place_id, fish_id, fish_variant_id, is_SP):
+        """
+        Stock totals across every weight unit, summed in the database on the canonical gram column
+        """
+        stock_qs = self.annotate_shard_weights(self.model.objects.all())
+        try:
+            if organization_id:
+                stock_qs = stock_qs.filter(place__organization_id=organization_id)
+            if place_id:
+                stock_qs = stock_qs.filter(place_id=place_id)
+            if fish_id:
+                stock_qs = stock_qs.filter(fish_id=fish_id)
+            if fish_variant_id:
+                stock_qs = stock_qs.filter(fish_variant_id=fish_variant_id)
+            if is_SP is not None:
+                stock_qs = stock_qs.filter(is_SP=is_SP)
+            totals = stock_qs.values('place_id', 'fish_id', 'fish_variant_id', 'is_SP').annotate(
+                weight_in_grams=Sum(F('weight_in_grams') + F('shard_weight_in_grams'))
+            ).order_by('place_id', 'fish_id', 'fish_variant_id', 'is_SP')
+            return None, totals
+        except Exception as e:
+            return get_serialized_exception(e)
+
+    def get_expected_stock_weights(self, organization_id, chunk_size=2000):
+        """
+        Recompute what every stock of an organization should weigh from its history: active imports add to
+        the receiving place, active exports and active bill items take from the sending / billing place.
+        Sums are computed in the database and streamed, so memory grows with the number of stock keys and
+        not with the number of records.
+        :return: dict of stock key -> expected weight
+        """
+        sources = (
+            (Record.objects.filter(organization_id=organization_id, record_type=RecordType.IMPORT, is_active=True),
+             'export_to_id', 1),
+            (Record.objects.filter(organization_id=organization_id, record_type=RecordType.EXPORT, is_active=True),
+             'import_from_id', -1),
+            (BillItem.objects.filter(bill__organization_id=organization_id, is_active=True),
+             'bill__bill_place_id', -1),
+        )
+        expected = {}
+        for queryset, place_field, sign in sources:
+            totals = queryset.exclude(**{place_field: None}).values_list(
+                place_field, 'fish_id', 'fish_variant_id', 'is_SP', 'weight_unit'
+            ).annotate(total=Sum('weight')).order_by()
+            for place_id, fish_id, fish_variant_id, is_SP, weight_unit, total in totals.iterator(chunk_size=chunk_size):
+                key = (place_id, fish_id, fish_variant_id, is_SP, weight_unit)
+                expected[key] = expected.get(key, Decimal(0)) + sign * total
+        return expected
+
+    def get_stock_weight_diffs(self, organization_id, chunk_size=2000):
+        """
+        Compare the Stock table of an organization with its recomputed history
+        :return: list of (stock key, stored weight or None when the row is missing, expected weight)
+        """
+        expected = self.get_expected_stock_weights(organization_id, chunk_size=chunk_size)
+        diffs = []
+        stocks = self.annotate_shard_weights(self.model.objects.filter(place__organization_id=organization_id))
+        stocks = stocks.values_list(
+            'place_id', 'fish_id', 'fish_variant_id', 'is_SP', 'weight_unit', F('weight') + F('shard_weight')
+        ).order_by()
+        for place_id, fish_id, fish_variant_id, is_SP, weight_unit, weight in stocks.iterator(chunk_size=chunk_size):
+            key = (place_id, fish_id, fish_variant_id, is_SP, weight_unit)
+            expected_weight = expected.pop(key, Decimal(0))
+            if weight != expected_weight:
+                diffs.append((key, weight, expected_weight))
+        diffs.extend((key, None, weight) for key, weight in expected.items() if weight)
+        return diffs
+
+    def reconcile_stock_weights(self, organization_id, apply=False, chunk_size=2000):
+        """
+        get_stock_weight_diffs of an organization, corrected through update_stock_weights when apply is set.
+        Both run in one REPEATABLE READ transaction: the history and the stock rows are compared as of the same
+        snapshot, and the corrections fail to commit if a row they change was written since it was taken, in
+        which case the whole comparison starts over. Manual stock edits are not part of that history: applying
+        reverts them.
+        :return: list of (stock key, stored weight or None when the row is missing, expected weight)
+        """
+        for attempt in range(1, RECONCILE_ATTEMPTS + 1):
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    diffs = self.get_stock_weight_diffs(organization_id, chunk_size=chunk_size)
+                    if apply and diffs:
+                        errors, _ = self.update_stock_weights(
+                            key + (expected - (weight or 0),) for key, weight, expected in diffs
+                        )
+                        if errors:
+                            return errors, None
+                return None, diffs
+            except OperationalError as e:
+                if getattr(e.__cause__, 'pgcode', None) != SERIALIZATION_FAILURE or attempt == RECONCILE_ATTEMPTS:
+                    return get_serialized_exception(e)
 
 
 class ExpenseController(Controller):
@@ -527,3 +956,167 @@ class ExpenseController(Controller):
 
     def get_valid_expenses(self):
         return self.model.objects.all()
+
+
+class SyncedOperationController(Controller):
+    model = SyncedOperation
+
+    def get_synced_results(self, organization_id, device_id, op_ids):
+        """
+        :return: dict of op_id -> result of the given operations that were already synced from the device
+        """
+        return dict(
+            self.model.objects.filter(organization_id=organization_id, device_id=device_id, op_id__in=op_ids)
+            .values_list('op_id', 'result')
+        )
+
+    def create_synced_operations(self, organization_id, device_id, results):
+        """
+        Record operations as synced; raises IntegrityError if one of them already was
+        :param results: iterable of (op_id, result)
+        """
+        self.model.objects.bulk_create([
+            self.model(organization_id=organization_id, device_id=device_id, op_id=op_id, result=result)
+            for op_id, result in results
+        ])
+
+    def purge_synced_operations(self, before):
+        """Forget operations synced before the given time; replaying them applies them again"""
+        return self.model.objects.filter(created_at__lt=before).delete()[0]
+
+
+class LandingIngestionController(Controller):
+    model = LandingIngestion
+
+    def __init__(self):
+        self.record_controller = RecordController()
+        self.stock_controller = StockController()
+
+    def enqueue_landing(self, organization_id, user_id, place_id, payload):
+        try:
+            ingestion = self.model.objects.create(
+                organization_id=organization_id,
+                user_id=user_id,
+                place_id=place_id,
+                payload=payload
+            )
+            return None, ingestion
+        except IntegrityError as e:
+            return get_serialized_exception(e)
+
+    def get_ingestion_by_ticket(self, organization_id, ticket):
+        return self.model.objects.filter(organization_id=organization_id, ticket=ticket).first()
+
+    def apply_pending_landings(self, batch_size):
+        """
+        Apply up to batch_size pending landings, oldest first, with one bulk record insert and one stock
+        upsert. Rows are claimed with SKIP LOCKED so several workers can drain the queue side by side.
+        If the batch fails as a whole, every landing is retried on its own so one bad payload only fails
+        its own ticket.
+        :return: number of landings processed (applied or failed)
+        """
+        try:
+            with transaction.atomic():
+                ingestions = list(
+                    self.model.objects.select_for_update(skip_locked=True)
+                    .filter(status=IngestionStatus.PENDING)
+                    .order_by('created_at')[:batch_size]
+                )
+                if not ingestions:
+                    return None, 0
+                try:
+                    with transaction.atomic():
+                        self.apply_landings(ingestions)
+                        # Foreign keys are deferred until commit; check them now so the savepoint catches it
+                        connection.check_constraints()
+                except Exception:
+                    for ingestion in ingestions:
+                        try:
+                            with transaction.atomic():
+                                self.apply_landings([ingestion])
+                                connection.check_constraints()
+                        except Exception as e:
+                            ingestion.status = IngestionStatus.FAILED
+                            ingestion.result = None
+                            ingestion.errors = get_serialized_exception(e)[0]
+                now = timezone.now()
+                for ingestion in ingestions:
+                    ingestion.processed_at = now
+                self.model.objects.bulk_update(ingestions, ['status', 'result', 'errors', 'processed_at'])
+            return None, len(ingestions)
+        except Exception as e:
+            return get_serialized_exception(e)
+
+    def apply_landings(self, ingestions):
+        """
+        Same writes as the synchronous add_to_landings, for a list of ingestions. Sets status and result
+        on the (unsaved) ingestions; raises if the database rejects the batch.
+        """
+        records = []
+        stock_deltas = []
+        stock_delta_records = []
+        applied = []
+        for ingestion in ingestions:
+            errors, data = self.parse_request(RecordCreationReqSchema, ingestion.payload)
+            if errors:
+                ingestion.status = IngestionStatus.FAILED
+                ingestion.errors = errors
+                continue
+            applied.append((ingestion, data, len(records)))
+            record_fields = dict(
+                discount_id=data.discount_id,
+                fish_id=data.fish_id,
+                fish_variant_id=data.fish_variant_id,
+                weigh_place_id=ingestion.place_id,
+                weight=data.weight,
+                weight_unit=data.weight_unit,
+                is_SP=data.is_SP,
+                is_active=data.is_active
+            )
+            records.append(dict(
+                organization_id=data.organization_id or ingestion.organization_id,
+                user_id=data.user_id or ingestion.user_id,
+                import_from_id=data.import_from_id,
+                export_to_id=ingestion.place_id,
+                record_type=RecordType.IMPORT,
+                **record_fields
+            ))
+            if data.export_to_id is not None:
+                records.append(dict(
+                    organization_id=ingestion.organization_id,
+                    user_id=ingestion.user_id,
+                    import_from_id=ingestion.place_id,
+                    export_to_id=data.export_to_id,
+                    record_type=RecordType.EXPORT,
+                    **record_fields
+                ))
+            else:
+                stock_deltas.append((ingestion.place_id, data.fish_id, data.fish_variant_id, data.is_SP,
+                                     data.weight_unit, data.weight))
+                stock_delta_records.append(len(records) - 1)
+
+        errors, records = self.record_controller.create_bulk_records(records)
+        if errors:
+            raise Exception(errors)
+        errors, stocks = self.stock_controller.update_stock_weights(
+            stock_deltas,
+            sources=[{'record_id': records[index].pk} for index in stock_delta_records]
+        )
+        if errors:
+            raise Exception(errors)
+
+        for ingestion, data, index in applied:
+            if data.export_to_id is not None:
+                result = {
+                    "import_id": records[index].pk,
+                    "export_id": records[index + 1].pk,
+                }
+            else:
+                stock_key = (ingestion.place_id, data.fish_id, data.fish_variant_id, data.is_SP, data.weight_unit)
+                result = {
+                    "record_id": records[index].pk,
+                    "stock_id": stocks[stock_key].pk,
+                }
+            ingestion.status = IngestionStatus.APPLIED
+            ingestion.result = result
+            ingestion.errors = None
@@ -12,3 +12,17 @@ class PayType(models.IntegerChoices):
 class RecordType(models.IntegerChoices):
     IMPORT = 1, 'Import'
     EXPORT = 2, 'Export'
+
+
+@unique
+class SyncOperation(models.TextChoices):
+    ADD_TO_LANDINGS = 'add_to_landings', 'Add to Landings'
+    ADD_TO_SALES = 'add_to_sales', 'Add to Sales'
+    SEND_STOCK = 'send_stock', 'Send Stock'
+
+
+@unique
+class IngestionStatus(models.IntegerChoices):
+    PENDING = 1, 'Pending'
+    APPLIED = 2, 'Applied'
+    FAILED = 3, 'Failed'
@@ -0,0 +1,91 @@
+# description :- Recomputes stock from Record imports/exports and active BillItems and reports or fixes drift.
+# python manage.py reconcile_stock
+# python manage.py reconcile_stock --organization 1 2 --apply
+# python manage.py reconcile_stock --workers 4 --chunk-size 5000
+# --apply - write the corrections (as stock movements) instead of only reporting them, in the snapshot they
+#           were computed in. WARNING: stock is reset to what the records and bill items add up to, so manual
+#           stock edits (StockViewSet create/update), which are not records, are reverted. Report first.
+# --workers - reconcile that many organizations in parallel
+
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from app.logistics.controllers import StockController
+from app.organizations.models import Organization
+
+
+class Command(BaseCommand):
+    help = ("Compare stock with the Record/BillItem history and optionally apply corrections. --apply resets "
+            "stock to that history, reverting manual stock edits made through the stock endpoints.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            nargs='+',
+            type=int,
+            help='organization id(s) to reconcile, all active organizations by default',
+        )
+        parser.add_argument(
+            '--apply',
+            action='store_true',
+            help='apply the corrections instead of only reporting them; REVERTS manual stock edits, which are '
+                 'not records',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='number of organizations reconciled in parallel',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='rows fetched per round trip while streaming',
+        )
+
+    def handle(self, *args, **options):
+        organization_ids = options['organization'] or list(
+            Organization.objects.filter(is_active=True).values_list('id', flat=True)
+        )
+        if options['apply']:
+            self.stdout.write(self.style.WARNING(
+                "Applying corrections: manual stock edits that no record or bill item accounts for are reverted"))
+        reconcile = partial(self.reconcile_organization, apply=options['apply'], chunk_size=options['chunk_size'])
+
+        total_diffs = 0
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                reports = executor.map(reconcile, organization_ids)
+                for organization_id, lines in zip(organization_ids, reports):
+                    total_diffs += self.write_report(organization_id, lines)
+        else:
+            for organization_id in organization_ids:
+                total_diffs += self.write_report(organization_id, reconcile(organization_id))
+
+        action = "corrected" if options['apply'] else "found"
+        self.stdout.write(self.style.SUCCESS(
+            f"{total_diffs} stock difference(s) {action} across {len(organization_ids)} organization(s)"))
+
+    def reconcile_organization(self, organization_id, apply, chunk_size):
+        try:
+            errors, diffs = StockController().reconcile_stock_weights(organization_id, apply, chunk_size=chunk_size)
+            if errors:
+                raise Exception(errors)
+            return diffs
+        finally:
+            # Worker threads open their own connection; don't leave it dangling
+            connection.close()
+
+    def write_report(self, organization_id, diffs):
+        for (place_id, fish_id, fish_variant_id, is_SP, weight_unit), weight, expected in diffs:
+            self.stdout.write(
+                f"org: {organization_id} place: {place_id} fish: {fish_id} variant: {fish_variant_id} "
+                f"is_sp: {is_SP} unit: {weight_unit} stock: {weight if weight is not None else 'missing'} "
+                f"expected: {expected} diff: {expected - (weight or 0)}"
+            )
+        return len(diffs)
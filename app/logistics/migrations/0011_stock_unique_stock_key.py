@@ -0,0 +1,55 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:25
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def merge_duplicate_stocks(apps, schema_editor):
+    """Fold duplicate stock rows into the oldest row of each key before the constraint is added."""
+    Stock = apps.get_model("logistics", "Stock")
+    keep = {}
+    merged_keys = set()
+    duplicate_ids = []
+    stocks = Stock.objects.order_by("pk").values_list(
+        "pk", "place_id", "fish_id", "fish_variant_id", "is_SP", "weight_unit", "weight"
+    )
+    for pk, place_id, fish_id, fish_variant_id, is_SP, weight_unit, weight in stocks.iterator():
+        key = (place_id, fish_id, fish_variant_id, is_SP, weight_unit)
+        if key in keep:
+            keep[key][1] += weight
+            merged_keys.add(key)
+            duplicate_ids.append(pk)
+        else:
+            keep[key] = [pk, weight]
+    if not duplicate_ids:
+        return
+    merged = [Stock(pk=keep[key][0], weight=keep[key][1]) for key in merged_keys]
+    Stock.objects.bulk_update(merged, ["weight"], batch_size=500)
+    Stock.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0010_expense_is_active"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_stocks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="stock",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.comparison.Coalesce(
+                    "place", models.Value(0)
+                ),
+                django.db.models.functions.comparison.Coalesce(
+                    "fish", models.Value(0)
+                ),
+                django.db.models.functions.comparison.Coalesce(
+                    "fish_variant", models.Value(0)
+                ),
+                models.F("is_SP"),
+                models.F("weight_unit"),
+                name="unique_stock_key",
+            ),
+        ),
+    ]
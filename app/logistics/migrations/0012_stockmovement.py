@@ -0,0 +1,84 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_opening_movements(apps, schema_editor):
+    """Seed the ledger with one opening movement per stock so movements always sum to the snapshot."""
+    Stock = apps.get_model("logistics", "Stock")
+    StockMovement = apps.get_model("logistics", "StockMovement")
+    movements = (
+        StockMovement(stock_id=pk, weight=weight)
+        for pk, weight in Stock.objects.exclude(weight=0).values_list("pk", "weight").iterator()
+    )
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0011_stock_unique_stock_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "weight",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Signed change applied to the stock weight",
+                        max_digits=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "bill_item",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_movements",
+                        to="logistics.billitem",
+                    ),
+                ),
+                (
+                    "record",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_movements",
+                        to="logistics.record",
+                    ),
+                ),
+                (
+                    "stock",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="logistics.stock",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["stock", "created_at"],
+                        name="logistics_s_stock_i_700130_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_opening_movements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:32
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Case, F, When
+from django.db.models.functions import Round
+
+# Frozen copy of app.fish.enums.GRAMS_PER_UNIT as of this migration
+GRAMS_PER_UNIT = {
+    "kg": Decimal("1000"),
+    "g": Decimal("1"),
+    "lb": Decimal("453.59237"),
+    "t": Decimal("1000000"),
+    "kt": Decimal("1000000000"),
+}
+
+
+def backfill_weight_in_grams(apps, schema_editor):
+    """Convert the existing weights in the database, one UPDATE per table."""
+    weight_in_grams = Case(
+        *[
+            When(weight_unit=unit, then=Round(F("weight") * factor))
+            for unit, factor in GRAMS_PER_UNIT.items()
+        ],
+        default=0,
+        output_field=BigIntegerField(),
+    )
+    for model_name in ("Record", "BillItem", "Stock"):
+        model = apps.get_model("logistics", model_name)
+        model.objects.update(weight_in_grams=weight_in_grams)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0012_stockmovement"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="billitem",
+            name="weight_in_grams",
+            field=models.BigIntegerField(
+                default=0, help_text="Weight converted to grams, kept in sync on save"
+            ),
+        ),
+        migrations.AddField(
+            model_name="record",
+            name="weight_in_grams",
+            field=models.BigIntegerField(
+                default=0, help_text="Weight converted to grams, kept in sync on save"
+            ),
+        ),
+        migrations.AddField(
+            model_name="stock",
+            name="weight_in_grams",
+            field=models.BigIntegerField(
+                default=0, help_text="Weight converted to grams, kept in sync on save"
+            ),
+        ),
+        migrations.RunPython(backfill_weight_in_grams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:37
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0014_landingingestion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockShard",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("shard", models.PositiveSmallIntegerField()),
+                (
+                    "weight",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0"), max_digits=10
+                    ),
+                ),
+                ("weight_in_grams", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="stock",
+            name="shard_count",
+            field=models.PositiveSmallIntegerField(
+                default=0,
+                help_text="Spread weight updates over this many StockShard rows to avoid lock contention on hot stocks, 0 or 1 writes to this row directly",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stock",
+            index=models.Index(
+                condition=models.Q(("shard_count__gt", 1)),
+                fields=["shard_count"],
+                name="stock_sharded_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="stockshard",
+            name="stock",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="shards",
+                to="logistics.stock",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="stockshard",
+            constraint=models.UniqueConstraint(
+                fields=("stock", "shard"), name="unique_stock_shard"
+            ),
+        ),
+    ]
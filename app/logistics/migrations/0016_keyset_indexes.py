@@ -0,0 +1,33 @@
+# Generated by Django 4.2.6 on 2026-10-18 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0015_stockshard"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="bill",
+            index=models.Index(
+                fields=["organization", "created_at", "id"],
+                name="logistics_b_organiz_af0391_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="expense",
+            index=models.Index(
+                fields=["organization", "created_at", "id"],
+                name="logistics_e_organiz_b0f12d_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="record",
+            index=models.Index(
+                fields=["organization", "created_at", "id"],
+                name="logistics_r_organiz_7135a7_idx",
+            ),
+        ),
+    ]
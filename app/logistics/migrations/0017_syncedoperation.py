@@ -0,0 +1,64 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("organizations", "0002_alter_place_mobile_no"),
+        ("logistics", "0016_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SyncedOperation",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "device_id",
+                    models.CharField(
+                        help_text="Device that sent the operation, or user-<id>",
+                        max_length=64,
+                    ),
+                ),
+                (
+                    "op_id",
+                    models.CharField(
+                        help_text="Client generated id of the operation", max_length=64
+                    ),
+                ),
+                (
+                    "result",
+                    models.JSONField(
+                        help_text="data of the operation in the sync response"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="synced_operations",
+                        to="organizations.organization",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="syncedoperation",
+            constraint=models.UniqueConstraint(
+                fields=("organization", "device_id", "op_id"),
+                name="unique_synced_operation",
+            ),
+        ),
+    ]
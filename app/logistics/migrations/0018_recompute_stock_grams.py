@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import BigIntegerField, F
+from django.db.models.functions import Cast, Round
+
+# Frozen copy of app.fish.enums.GRAMS_PER_UNIT['lb'] as of this migration, the only factor that isn't whole
+# grams per hundredth of a unit
+GRAMS_PER_POUND = Decimal("453.59237")
+
+
+def recompute_pound_grams(apps, schema_editor):
+    """Convert the grams of pound stocks again from their weight, dropping the rounding summed into them."""
+    weight_in_grams = Cast(Round(F("weight") * GRAMS_PER_POUND), BigIntegerField())
+    apps.get_model("logistics", "Stock").objects.filter(weight_unit="lb").update(weight_in_grams=weight_in_grams)
+    apps.get_model("logistics", "StockShard").objects.filter(stock__weight_unit="lb").update(
+        weight_in_grams=weight_in_grams
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("logistics", "0017_syncedoperation"),
+    ]
+
+    operations = [
+        migrations.RunPython(recompute_pound_grams, migrations.RunPython.noop),
+    ]
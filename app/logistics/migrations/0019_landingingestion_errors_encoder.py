@@ -0,0 +1,23 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:49
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("logistics", "0018_recompute_stock_grams"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="landingingestion",
+            name="errors",
+            field=models.JSONField(
+                blank=True,
+                encoder=django.core.serializers.json.DjangoJSONEncoder,
+                null=True,
+            ),
+        ),
+    ]
@@ -1,10 +1,14 @@
+import uuid
 from decimal import Decimal
 from django.core import validators
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models.functions import Coalesce
 from app.fish.enums import WeightUnit
-from app.logistics.enums import PayType, RecordType
+from app.logistics.enums import IngestionStatus, PayType, RecordType
 from app.organizations.enums import PlaceType
 from app.users.enums import Designation
+from app.utils.querysets import SignalingQuerySet
 
 
 class Record(models.Model):
@@ -36,12 +40,25 @@ class Record(models.Model):
         choices=WeightUnit.choices,
         default=WeightUnit.KILOGRAMS
     )
+    weight_in_grams = models.BigIntegerField(default=0, help_text="Weight converted to grams, kept in sync on save")
     is_SP = models.BooleanField(default=False, help_text="Whether this import/export is damaged")
     is_active = models.BooleanField(default=True)
     # Moderation Fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset (cursor) pagination of the organization's listing, see CustomPageNumberPagination
+            models.Index(fields=['organization', 'created_at', 'id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.weight_in_grams = WeightUnit(self.weight_unit).to_grams(self.weight)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"id: {self.id}. user: {self.user.name if self.user else ''} from: {self.import_from.name if self.import_from else ''} to: {self.export_to.name if self.export_to else ''}" \
                f" applied discount: {self.discount.name if self.discount else ''} fish variant: {self.fish_variant.name if self.fish_variant else ''} is_sp: {self.is_SP} " \
@@ -91,6 +108,13 @@ class Bill(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'created_at', 'id']),
+        ]
+
 
 class BillItem(models.Model):
     bill = models.ForeignKey('logistics.Bill', on_delete=models.SET_NULL,
@@ -107,6 +131,7 @@ class BillItem(models.Model):
         choices=WeightUnit.choices,
         default=WeightUnit.KILOGRAMS
     )
+    weight_in_grams = models.BigIntegerField(default=0, help_text="Weight converted to grams, kept in sync on save")
     price = models.DecimalField(
         max_digits=10,
         decimal_places=2,
@@ -121,6 +146,12 @@ class BillItem(models.Model):
     is_SP = models.BooleanField(default=False, help_text="Whether this import/export is damaged")
     is_active = models.BooleanField(default=True)
 
+    objects = SignalingQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.weight_in_grams = WeightUnit(self.weight_unit).to_grams(self.weight)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"id: {self.id}. bill: {self.bill} fish variant: {self.fish_variant} is_sp: {self.is_SP} " \
                f"weight: {self.weight} weight unit: {self.weight_unit}"
@@ -148,8 +179,151 @@ class Stock(models.Model):
         choices=WeightUnit.choices,
         default=WeightUnit.KILOGRAMS
     )
+    weight_in_grams = models.BigIntegerField(default=0, help_text="Weight converted to grams, kept in sync on save")
+    shard_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Spread weight updates over this many StockShard rows to avoid lock contention on hot stocks, "
+                  "0 or 1 writes to this row directly"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['shard_count'], condition=models.Q(shard_count__gt=1), name='stock_sharded_idx'),
+        ]
+        constraints = [
+            # Nullable keys are coalesced so that rows without a variant still collide with each other
+            models.UniqueConstraint(
+                Coalesce('place', models.Value(0)),
+                Coalesce('fish', models.Value(0)),
+                Coalesce('fish_variant', models.Value(0)),
+                'is_SP',
+                'weight_unit',
+                name='unique_stock_key',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.weight_in_grams = WeightUnit(self.weight_unit).to_grams(self.weight)
+        super().save(*args, **kwargs)
+
+    @property
+    def total_weight(self):
+        """Weight including shards not compacted yet, read from StockController.annotate_shard_weights"""
+        return self.weight + getattr(self, 'shard_weight', Decimal(0))
+
+    @property
+    def total_weight_in_grams(self):
+        return self.weight_in_grams + getattr(self, 'shard_weight_in_grams', 0)
+
+
+class StockShard(models.Model):
+    """
+    Counter row of a sharded Stock. Updates to a hot stock add to one of its shards instead of the stock
+    row, so concurrent bills don't queue on a single row lock. The stock weight is Stock.weight plus its
+    shards until the compact_stock_shards task folds them back in.
+    """
+    stock = models.ForeignKey('logistics.Stock', on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    weight = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal(0))
+    weight_in_grams = models.BigIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stock', 'shard'], name='unique_stock_shard'),
+        ]
+
+    def __str__(self):
+        return f"id: {self.id}. stock: {self.stock_id} shard: {self.shard} weight: {self.weight}"
+
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of every change applied to a Stock row. Stock.weight is the running snapshot of its
+    movements, so the weight at any past time is the snapshot minus the movements made since then.
+    """
+    stock = models.ForeignKey('logistics.Stock', on_delete=models.CASCADE, related_name='movements')
+    record = models.ForeignKey('logistics.Record', on_delete=models.SET_NULL,
+                               blank=True, null=True, related_name='stock_movements')
+    bill_item = models.ForeignKey('logistics.BillItem', on_delete=models.SET_NULL,
+                                  blank=True, null=True, related_name='stock_movements')
+    weight = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Signed change applied to the stock weight"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"id: {self.id}. stock: {self.stock_id} weight: {self.weight} record: {self.record_id} " \
+               f"bill item: {self.bill_item_id}"
+
+
+class LandingIngestion(models.Model):
+    """
+    A landing accepted by add_to_landings in async mode. The request only stores the payload; the
+    apply_landing_ingestions task turns pending rows into records and stock changes in micro-batches.
+    """
+    ticket = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE,
+                                     related_name='landing_ingestions')
+    user = models.ForeignKey('users.User', on_delete=models.SET_NULL, blank=True, null=True,
+                             related_name='landing_ingestions')
+    place = models.ForeignKey('organizations.Place', on_delete=models.SET_NULL, blank=True, null=True,
+                              related_name='landing_ingestions', help_text="Place of the user when enqueued")
+    payload = models.JSONField(help_text="add_to_landings request body")
+    status = models.IntegerField(choices=IngestionStatus.choices, default=IngestionStatus.PENDING)
+    result = models.JSONField(blank=True, null=True)
+    # Validation errors can carry the Decimal limits of the schema
+    errors = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"id: {self.id}. ticket: {self.ticket} status: {self.get_status_display()}"
+
+
+class SyncedOperation(models.Model):
+    """
+    An operation of /records/sync/ that was applied, with the result it got. A device replaying an op_id it
+    already synced gets that result back instead of applying the operation again.
+    """
+    organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE,
+                                     related_name='synced_operations')
+    device_id = models.CharField(max_length=64, help_text="Device that sent the operation, or user-<id>")
+    op_id = models.CharField(max_length=64, help_text="Client generated id of the operation")
+    result = models.JSONField(help_text="data of the operation in the sync response")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['organization', 'device_id', 'op_id'], name='unique_synced_operation'),
+        ]
+
+    def __str__(self):
+        return f"id: {self.id}. device: {self.device_id} op: {self.op_id}"
+
 
 class Expense(models.Model):
     organization = models.ForeignKey('organizations.Organization', on_delete=models.CASCADE, related_name="expenses")
@@ -171,3 +345,10 @@ class Expense(models.Model):
     # Moderation Fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SignalingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'created_at', 'id']),
+        ]
@@ -1,11 +1,12 @@
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, List
+from uuid import UUID
 
 from decimal import Decimal
-from pydantic import BaseModel, validator, condecimal, conint
+from pydantic import BaseModel, validator, condecimal, conint, constr
 
 from app.fish.enums import WeightUnit
-from app.logistics.enums import PayType, RecordType
+from app.logistics.enums import PayType, RecordType, SyncOperation
 from app.utils.helpers import convert_to_decimal, allow_string_rep_of_enum
 from app.utils.schemas import BaseSchemaCreationReqSchema, BaseSchemaEditReqSchema, BaseSchemaListingReqSchema
 
@@ -35,6 +36,18 @@ class AddToStockSchema(BaseModel):
     items: List[RecordCreationReqSchema]
 
 
+class RecordSyncOperationSchema(RecordCreationReqSchema):
+    op_id: constr(min_length=1, max_length=64)
+    operation: SyncOperation
+
+
+class RecordSyncSchema(BaseModel):
+    # op_ids already synced from this device are not applied again; devices without an id are told apart by user
+    device_id: Optional[constr(min_length=1, max_length=64)]
+    # Operations are validated one by one so that a single bad entry does not reject the whole batch
+    operations: List[dict]
+
+
 class RecordEditReqSchema(BaseSchemaEditReqSchema):
     organization_id: Optional[int]
     user_id: Optional[int]
@@ -184,6 +197,21 @@ class StockListingReqSchema(BaseSchemaListingReqSchema):
     is_SP: Optional[bool]
 
 
+class StockWeightAtReqSchema(BaseModel):
+    at: datetime
+
+    @validator('at', pre=True, allow_reuse=True)
+    def validate_time(cls, v):
+        try:
+            return datetime.strptime(v, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"time format is incorrect: {e}")
+
+
+class LandingIngestionStatusReqSchema(BaseModel):
+    ticket: UUID
+
+
 class ExpenseCreationReqSchema(BaseModel):
     organization_id: Optional[int]
     user_id: Optional[int]
@@ -5,11 +5,13 @@ from rest_framework import serializers
 from app.fish.enums import WeightUnit
 from app.fish.models import Fish, FishVariant, Discount, PriceHistory
 from app.fish.serializers import DiscountSerializer, FishVariantSerializer, FishSerializer
+from app.logistics.controllers import BillController
 from app.logistics.enums import PayType, RecordType
 from app.logistics.models import Record, BillItem, Bill, Stock, Expense
 from app.organizations.enums import PlaceType
 from app.organizations.serializers import OrganizationSerializer, PlaceSerializer, ExpenseTypeSerializer
 from app.users.serializers import UserSerializer
+from app.utils.exports import ExportColumn, enum_label, format_datetime
 from app.utils.helpers import get_serialized_enum
 
 
@@ -30,13 +32,15 @@ class RecordSerializer(serializers.ModelSerializer):
         return dict()
 
     def get_record_type(self, obj: Record):
-        if obj.weight_unit:
+        if obj.record_type:
             return get_serialized_enum(RecordType(obj.record_type))
         return dict()
 
     class Meta:
         model = Record
         fields = '__all__'
+        # Method fields rendering an enum, precomputed by the compiled serializer
+        enum_fields = {'weight_unit': WeightUnit, 'record_type': RecordType}
 
 
 class BillSerializer(serializers.ModelSerializer):
@@ -45,12 +49,22 @@ class BillSerializer(serializers.ModelSerializer):
     discount = DiscountSerializer()
     pay_type = serializers.SerializerMethodField()
     weight = serializers.SerializerMethodField()
+    item_count = serializers.SerializerMethodField()
 
     def get_weight(self, obj: Bill):
-        total_weight = obj.bill_items.aggregate(total=models.Sum('weight'))['total'] or Decimal('0.00')
+        # total_weight is annotated by BillController.annotate_bill_totals, aggregate only when it is missing
+        total_weight = getattr(obj, 'total_weight', None)
+        if total_weight is None:
+            total_weight = obj.bill_items.aggregate(total=models.Sum('weight'))['total'] or Decimal('0.00')
         # Return the total weight as a string formatted to two decimal places
         return f"{total_weight:.2f}"
 
+    def get_item_count(self, obj: Bill):
+        item_count = getattr(obj, 'item_count', None)
+        if item_count is None:
+            item_count = obj.bill_items.count()
+        return item_count
+
     def get_pay_type(self, obj: Bill):
         if obj.pay_type:
             return get_serialized_enum(PayType(obj.pay_type))
@@ -59,6 +73,9 @@ class BillSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bill
         fields = '__all__'
+        enum_fields = {'pay_type': PayType}
+        # Nested bills (e.g. in BillItemSerializer) are loaded with their weight annotations
+        prefetch_queryset = BillController().get_valid_bills
 
 
 class BillItemSerializer(serializers.ModelSerializer):
@@ -75,12 +92,15 @@ class BillItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = BillItem
         fields = '__all__'
+        enum_fields = {'weight_unit': WeightUnit}
 
 
 class StockSerializer(serializers.ModelSerializer):
     place = PlaceSerializer()
     fish = FishSerializer()
     fish_variant = FishVariantSerializer()
+    weight = serializers.DecimalField(source='total_weight', max_digits=10, decimal_places=2, read_only=True)
+    weight_in_grams = serializers.IntegerField(source='total_weight_in_grams', read_only=True)
     weight_unit = serializers.SerializerMethodField()
 
     def get_weight_unit(self, obj: Stock):
@@ -91,6 +111,7 @@ class StockSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stock
         fields = '__all__'
+        enum_fields = {'weight_unit': WeightUnit}
 
 
 class ExpenseSerializer(serializers.ModelSerializer):
@@ -100,3 +121,51 @@ class ExpenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Expense
         fields = '__all__'
+
+
+# Flat columns of the streaming exports (RecordViewSet.export, BillViewSet.export, ExpenseViewSet.export)
+RECORD_EXPORT_COLUMNS = [
+    ExportColumn('id', 'id'),
+    ExportColumn('created_at', 'created_at', format_datetime),
+    ExportColumn('record_type', 'record_type', enum_label(RecordType)),
+    ExportColumn('user', 'user__name'),
+    ExportColumn('import_from', 'import_from__name'),
+    ExportColumn('export_to', 'export_to__name'),
+    ExportColumn('weigh_place', 'weigh_place__name'),
+    ExportColumn('fish', 'fish__name'),
+    ExportColumn('fish_variant', 'fish_variant__name'),
+    ExportColumn('is_SP', 'is_SP'),
+    ExportColumn('weight', 'weight'),
+    ExportColumn('weight_unit', 'weight_unit', enum_label(WeightUnit)),
+    ExportColumn('weight_in_grams', 'weight_in_grams'),
+    ExportColumn('discount', 'discount__name'),
+    ExportColumn('is_active', 'is_active'),
+]
+
+BILL_EXPORT_COLUMNS = [
+    ExportColumn('id', 'id'),
+    ExportColumn('created_at', 'created_at', format_datetime),
+    ExportColumn('user', 'user__name'),
+    ExportColumn('bill_place', 'bill_place__name'),
+    ExportColumn('pay_type', 'pay_type', enum_label(PayType)),
+    ExportColumn('discount', 'discount__name'),
+    # Annotated by BillController.annotate_bill_totals
+    ExportColumn('weight', 'total_weight'),
+    ExportColumn('item_count', 'item_count'),
+    ExportColumn('price', 'price'),
+    ExportColumn('total_amount', 'total_amount'),
+    ExportColumn('discounted_price', 'discounted_price'),
+    ExportColumn('billed_amount', 'billed_amount'),
+    ExportColumn('is_active', 'is_active'),
+]
+
+EXPENSE_EXPORT_COLUMNS = [
+    ExportColumn('id', 'id'),
+    ExportColumn('expense_date', 'expense_date', format_datetime),
+    ExportColumn('type', 'type__name'),
+    ExportColumn('desc', 'desc'),
+    ExportColumn('amount', 'amount'),
+    ExportColumn('user', 'user__name'),
+    ExportColumn('created_at', 'created_at', format_datetime),
+    ExportColumn('is_active', 'is_active'),
+]
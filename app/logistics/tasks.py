@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from app.logistics.controllers import LandingIngestionController, StockController, SyncedOperationController
+from FARMS.celery_app import app
+
+
+@app.task(name="apply_landing_ingestions", ignore_result=True)
+def apply_landing_ingestions(batch_size=None):
+    """Drain pending async landings in micro-batches until the queue is empty."""
+    batch_size = batch_size or settings.LANDING_INGESTION_BATCH_SIZE
+    controller = LandingIngestionController()
+    while True:
+        errors, processed = controller.apply_pending_landings(batch_size)
+        if errors:
+            raise Exception(errors)
+        if processed < batch_size:
+            return
+
+
+@app.task(name="compact_stock_shards", ignore_result=True)
+def compact_stock_shards():
+    """Fold the shards of hot stocks back into their stock rows; scheduled in CELERY_BEAT_SCHEDULE."""
+    StockController().compact_stock_shards()
+
+
+@app.task(name="purge_synced_operations", ignore_result=True)
+def purge_synced_operations():
+    """Forget sync op_ids older than SYNCED_OPERATION_RETENTION_DAYS; scheduled in CELERY_BEAT_SCHEDULE."""
+    SyncedOperationController().purge_synced_operations(
+        timezone.now() - timedelta(days=settings.SYNCED_OPERATION_RETENTION_DAYS)
+    )
@@ -1,3 +1,703 @@
-from django.test import TestCase
+import csv
+import json
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from app.fish.enums import WeightUnit
+from app.fish.models import Fish, FishVariant
+from app.logistics.controllers import StockController
+from app.logistics.enums import RecordType
+from app.logistics.models import Bill, BillItem, Expense, LandingIngestion, Record, Stock, StockMovement, StockShard
+from app.logistics.serializers import BillSerializer
+from app.logistics.tasks import apply_landing_ingestions
+from app.organizations.models import ExpenseType, Organization, Place
+from app.utils.constants import CacheKeys
+from app.utils.local_cache import local_cache
+from app.utils.tests import CacheTestCase, create_user
+
+
+class BillCreationTests(CacheTestCase):
+    amounts = {'price': 100, 'total_amount': 100, 'billed_amount': 100, 'discounted_price': 100, 'pay_type': 1}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.place = Place.objects.create(name='retail', organization=cls.organization, type=3)
+        cls.user = create_user(cls.organization, cls.place, designation=2)
+        cls.fish = [Fish.objects.create(name=f'fish {i}', organization=cls.organization) for i in range(10)]
+        cls.variant = FishVariant.objects.create(name='variant', fish=cls.fish[0])
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_bill(self, items):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/farms/api/bills/', {'bill_items': items, **self.amounts}, format='json',
+                                        secure=True)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json(), len(queries)
+
+    def item(self, fish, weight, **fields):
+        return {'fish_id': fish.pk, 'weight': weight, 'price': 10, **fields}
+
+    def test_items_are_deducted_from_their_stocks(self):
+        Stock.objects.create(place=self.place, fish=self.fish[0], fish_variant=self.variant, weight=Decimal(20))
+        data, _ = self.create_bill([
+            self.item(self.fish[0], '2.5', fish_variant_id=self.variant.pk),
+            self.item(self.fish[0], '1.5', fish_variant_id=self.variant.pk),
+            self.item(self.fish[1], '3'),
+        ])
+        self.assertEqual(BillItem.objects.filter(bill_id=data['bill_id']).count(), 3)
+        self.assertEqual(len(data['bill_items']), 3)
+        self.assertEqual(Stock.objects.get(fish=self.fish[0]).weight, Decimal('16.00'))
+        # Items without a stock yet start one below zero
+        self.assertEqual(Stock.objects.get(fish=self.fish[1]).weight, Decimal('-3.00'))
+        self.assertEqual(data['stock_id'], Stock.objects.get(fish=self.fish[1]).pk)
+
+    def test_query_count_does_not_grow_with_the_items(self):
+        # The first bill fills what later ones read from the cache
+        self.create_bill([self.item(self.fish[0], '1')])
+        _, few = self.create_bill([self.item(fish, '1') for fish in self.fish[:2]])
+        _, many = self.create_bill([self.item(fish, '1') for fish in self.fish])
+        self.assertEqual(few, many)
+
+
+
+class StockWeightTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.place = Place.objects.create(name='center', organization=cls.organization, type=1)
+        cls.fish = Fish.objects.create(name='fish', organization=cls.organization)
+        cls.variant = FishVariant.objects.create(name='variant', fish=cls.fish)
+
+    def setUp(self):
+        super().setUp()
+        self.controller = StockController()
+        self.key = (self.place.pk, self.fish.pk, self.variant.pk, False, 'kg')
+
+    def test_upsert_creates_then_adds_to_one_row(self):
+        errors, stocks = self.controller.update_stock_weights([self.key + (Decimal('2.50'),)])
+        self.assertIsNone(errors)
+        created = stocks[self.key]
+        errors, stocks = self.controller.update_stock_weights([
+            self.key + (Decimal('1.25'),),
+            self.key + (Decimal('-0.75'),),
+        ])
+        self.assertIsNone(errors)
+        self.assertEqual(stocks[self.key].pk, created.pk)
+        self.assertEqual(Stock.objects.get().weight, Decimal('3.00'))
+
+    def test_upsert_treats_missing_variant_as_one_key(self):
+        key = (self.place.pk, self.fish.pk, None, False, 'kg')
+        self.controller.update_stock_weights([key + (Decimal('1'),)])
+        self.controller.update_stock_weights([key + (Decimal('2'),)])
+        self.assertEqual(Stock.objects.get(fish_variant=None).weight, Decimal('3.00'))
+
+    def test_keys_differing_in_unit_or_sp_are_separate_rows(self):
+        self.controller.update_stock_weights([
+            self.key + (Decimal('1'),),
+            self.key[:3] + (True, 'kg', Decimal('2')),
+            self.key[:4] + ('lb', Decimal('3')),
+        ])
+        self.assertEqual(Stock.objects.count(), 3)
+
+    def test_every_delta_is_recorded_in_the_ledger(self):
+        self.controller.update_stock_weights([self.key + (Decimal('2.50'),)])
+        self.controller.update_stock_weights([self.key + (Decimal('1.25'),), self.key + (Decimal('-0.75'),)])
+        stock = Stock.objects.get()
+        # Merged into one row update, the deltas are still one movement each
+        self.assertEqual(sorted(StockMovement.objects.filter(stock=stock).values_list('weight', flat=True)),
+                         [Decimal('-0.75'), Decimal('1.25'), Decimal('2.50')])
+        self.assertEqual(sum(StockMovement.objects.values_list('weight', flat=True)), stock.weight)
+
+    def test_movements_record_their_source(self):
+        record = Record.objects.create(organization=self.organization, record_type=RecordType.IMPORT,
+                                       fish=self.fish, weight=Decimal('4'))
+        self.controller.update_stock_weights([self.key + (Decimal('4'),)], sources=[{'record_id': record.pk}])
+        self.assertEqual(StockMovement.objects.get().record_id, record.pk)
+
+    def test_grams_follow_the_total(self):
+        self.controller.update_stock_weights([self.key + (Decimal('2.50'),), self.key + (Decimal('0.75'),)])
+        self.assertEqual(Stock.objects.get().weight_in_grams, 3250)
+
+    def test_pound_grams_do_not_drift_with_small_deltas(self):
+        key = self.key[:4] + ('lb',)
+        for _ in range(100):
+            self.controller.update_stock_weights([key + (Decimal('0.01'),)])
+        stock = Stock.objects.get(weight_unit='lb')
+        self.assertEqual(stock.weight, Decimal('1.00'))
+        # 453.59 g rounded once; rounding each 4.54 g delta to whole grams would add up to 500
+        self.assertEqual(stock.weight_in_grams, 454)
+
+    def test_sharded_stock_sums_shards_until_compacted(self):
+        errors, stocks = self.controller.update_stock_weights([self.key + (Decimal('10'),)])
+        stock = stocks[self.key]
+        Stock.objects.filter(pk=stock.pk).update(shard_count=4)
+        cache.delete(CacheKeys.SHARDED_STOCKS.value)
+
+        for _ in range(8):
+            errors, stocks = self.controller.update_stock_weights([self.key + (Decimal('0.5'),)])
+            self.assertIsNone(errors)
+            self.assertEqual(stocks[self.key].pk, stock.pk)
+        # Deltas went to the shards, not the hot row
+        self.assertEqual(Stock.objects.get(pk=stock.pk).weight, Decimal('10.00'))
+        self.assertTrue(StockShard.objects.filter(stock=stock).exists())
+        self.assertLessEqual(StockShard.objects.filter(stock=stock).count(), 4)
+        stock = self.controller.get_instance_by_pk(stock.pk)
+        self.assertEqual(stock.total_weight, Decimal('14.00'))
+        self.assertEqual(stock.total_weight_in_grams, 14000)
+
+        self.assertEqual(self.controller.compact_stock_shards(), 1)
+        self.assertFalse(StockShard.objects.exists())
+        stock = Stock.objects.get(pk=stock.pk)
+        self.assertEqual((stock.weight, stock.weight_in_grams), (Decimal('14.00'), 14000))
+        self.assertEqual(sum(StockMovement.objects.filter(stock=stock).values_list('weight', flat=True)),
+                         Decimal('14.00'))
+
+
+class RecordListingPaginationTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='organization')
+        place = Place.objects.create(name='center', organization=organization, type=1)
+        cls.user = create_user(organization, place, designation=2)
+        Record.objects.bulk_create([
+            Record(organization=organization, record_type=RecordType.IMPORT, export_to=place, weight=Decimal(i))
+            for i in range(12)
+        ])
+        # Ties on created_at are broken by pk
+        now = timezone.now()
+        for i, pk in enumerate(Record.objects.order_by('pk').values_list('pk', flat=True)):
+            Record.objects.filter(pk=pk).update(created_at=now - timedelta(minutes=i // 3))
+        cls.expected = list(Record.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url):
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_pages_walk_every_record_once_both_ways(self):
+        pages = []
+        page = self.get('/farms/api/records/?cursor=')
+        self.assertIsNone(page['previous'])
+        while True:
+            pages.append([record['id'] for record in page['results']])
+            if not page['next']:
+                break
+            page = self.get(page['next'])
+        self.assertEqual([pk for ids in pages for pk in ids], self.expected)
+        self.assertTrue(all(len(ids) == page['page_size'] for ids in pages[:-1]))
+
+        backwards = []
+        while page['previous']:
+            page = self.get(page['previous'])
+            backwards.append([record['id'] for record in page['results']])
+        self.assertEqual(backwards, pages[-2::-1])
+
+    def test_cursor_ascending(self):
+        page = self.get('/farms/api/records/?cursor=&ordering=created_at')
+        self.assertEqual([record['id'] for record in page['results']], self.expected[::-1][:page['page_size']])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/farms/api/records/?cursor=not-a-cursor', secure=True)
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_rejects_other_orderings(self):
+        response = self.client.get('/farms/api/records/?cursor=&ordering=-weight', secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cursor', response.json())
+
+    def test_expense_cursor_needs_created_at_ordering(self):
+        expense_type = ExpenseType.objects.create(name='ice', organization=self.user.organization)
+        Expense.objects.bulk_create([
+            Expense(organization=self.user.organization, user=self.user, type=expense_type, desc=f'expense {i}',
+                    expense_date=timezone.now() - timedelta(days=i), amount=Decimal(i))
+            for i in range(3)
+        ])
+        # Expenses list by expense_date by default, which cursor pages can't follow
+        response = self.client.get('/farms/api/expenses/?cursor=', secure=True)
+        self.assertEqual(response.status_code, 400)
+        page = self.get('/farms/api/expenses/?cursor=&ordering=-created_at')
+        self.assertEqual([expense['id'] for expense in page['results']],
+                         list(Expense.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
+
+    @override_settings(PAGE_ALL_MAX_ROWS=5)
+    def test_page_all_is_capped(self):
+        page = self.get('/farms/api/records/?page=all')
+        self.assertEqual([record['id'] for record in page['results']], self.expected[:5])
+        self.assertEqual(page['count'], 12)
+        self.assertTrue(page['truncated'])
+
+    @override_settings(PAGE_ALL_MAX_ROWS=20)
+    def test_page_all_under_the_cap(self):
+        page = self.get('/farms/api/records/?page=all')
+        self.assertEqual(len(page['results']), 12)
+        self.assertEqual(page['count'], 12)
+        self.assertFalse(page['truncated'])
+
+
+class RecordSyncTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.place = Place.objects.create(name='center', organization=cls.organization, type=1)
+        cls.retail = Place.objects.create(name='retail', organization=cls.organization, type=3, center=cls.place)
+        cls.user = create_user(cls.organization, cls.place, designation=2)
+        cls.fish = Fish.objects.create(name='fish', organization=cls.organization)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, *operations, device_id='weigher-1'):
+        response = self.client.post('/farms/api/records/sync/', {'device_id': device_id, 'operations': operations},
+                                    format='json', secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['results']
+
+    def operation(self, op_id, operation='add_to_landings', weight='10', **fields):
+        return {'op_id': op_id, 'operation': operation, 'fish_id': self.fish.pk, 'weight': weight, **fields}
+
+    def get_stock_weight(self):
+        return Stock.objects.get(place=self.place, fish=self.fish).weight
+
+    def test_landing_adds_to_stock_and_sending_takes_from_it(self):
+        results = self.sync(self.operation('a', weight='10'),
+                            self.operation('b', 'send_stock', weight='4', export_to_id=self.retail.pk))
+        self.assertEqual([result['status'] for result in results], [201, 201])
+        self.assertEqual(self.get_stock_weight(), Decimal('6.00'))
+        self.assertEqual(results[0]['data']['stock_id'], results[1]['data']['stock_id'])
+        export = Record.objects.get(pk=results[1]['data']['record_id'])
+        self.assertEqual((export.record_type, export.export_to_id), (RecordType.EXPORT, self.retail.pk))
+
+    def test_landing_forwarded_to_a_place_leaves_stock_alone(self):
+        [result] = self.sync(self.operation('a', export_to_id=self.retail.pk))
+        self.assertEqual(result['status'], 201)
+        imported = Record.objects.get(pk=result['data']['import_id'])
+        exported = Record.objects.get(pk=result['data']['export_id'])
+        self.assertEqual((imported.record_type, imported.export_to_id), (RecordType.IMPORT, self.place.pk))
+        self.assertEqual((exported.import_from_id, exported.export_to_id), (self.place.pk, self.retail.pk))
+        self.assertFalse(Stock.objects.exists())
+
+    def test_replayed_op_id_returns_its_result_without_applying_again(self):
+        [first] = self.sync(self.operation('a'))
+        [replayed, new] = self.sync(self.operation('a'), self.operation('b', weight='1'))
+        self.assertEqual(replayed, {'op_id': 'a', 'status': 200, 'data': first['data']})
+        self.assertEqual(new['status'], 201)
+        self.assertEqual(Record.objects.count(), 2)
+        self.assertEqual(StockMovement.objects.count(), 2)
+        self.assertEqual(self.get_stock_weight(), Decimal('11.00'))
+
+    def test_op_ids_are_per_device(self):
+        self.sync(self.operation('a'))
+        [result] = self.sync(self.operation('a'), device_id='weigher-2')
+        self.assertEqual(result['status'], 201)
+        self.assertEqual(self.get_stock_weight(), Decimal('20.00'))
+
+    def test_duplicate_op_id_in_a_batch_is_rejected(self):
+        first, duplicate = self.sync(self.operation('a'), self.operation('a', weight='5'))
+        self.assertEqual((first['status'], duplicate['status']), (201, 400))
+        self.assertEqual(self.get_stock_weight(), Decimal('10.00'))
+
+    def test_bad_operation_fails_alone(self):
+        results = self.sync(self.operation('a', weight='3'),
+                            self.operation('b', fish_id=0),
+                            self.operation('c', weight='4'),
+                            {'op_id': 'd', 'operation': 'unknown'})
+        self.assertEqual([result['status'] for result in results], [201, 400, 201, 400])
+        self.assertNotIn('data', results[1])
+        self.assertEqual(Record.objects.count(), 2)
+        self.assertEqual(self.get_stock_weight(), Decimal('7.00'))
+        # The failed operation was not remembered, so it can be synced again once fixed
+        [retried] = self.sync(self.operation('b', weight='1'))
+        self.assertEqual(retried['status'], 201)
+
+
+class LandingIngestionTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.place = Place.objects.create(name='center', organization=cls.organization, type=1)
+        cls.user = create_user(cls.organization, cls.place, designation=2)
+        cls.fish = Fish.objects.create(name='fish', organization=cls.organization)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # The broker isn't needed: the tests run the task themselves
+        patcher = patch('app.logistics.views.apply_landing_ingestions.delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue(self, **payload):
+        response = self.client.post('/farms/api/records/add_to_landings/?async=true',
+                                    {'fish_id': self.fish.pk, 'weight': '10', **payload}, format='json', secure=True)
+        self.assertEqual(response.status_code, 202, response.content)
+        return response.json()['ticket']
+
+    def get_status(self, ticket):
+        response = self.client.get(f'/farms/api/records/landing_status/?ticket={ticket}', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_async_landing_is_queued_then_applied(self):
+        ticket = self.enqueue()
+        self.delay.assert_called_once_with()
+        self.assertFalse(Record.objects.exists())
+        self.assertEqual(self.get_status(ticket)['status'], 'Pending')
+        self.assertIsNone(self.get_status(ticket)['processed_at'])
+
+        apply_landing_ingestions()
+        landing = self.get_status(ticket)
+        self.assertEqual(landing['status'], 'Applied')
+        self.assertIsNotNone(landing['processed_at'])
+        stock = Stock.objects.get(pk=landing['result']['stock_id'])
+        self.assertEqual((stock.place_id, stock.weight), (self.place.pk, Decimal('10.00')))
+        record = Record.objects.get(pk=landing['result']['record_id'])
+        self.assertEqual((record.record_type, record.export_to_id), (RecordType.IMPORT, self.place.pk))
+
+    def test_failing_landings_fail_alone(self):
+        good = self.enqueue(weight='3')
+        bad_fish = self.enqueue(fish_id=0)
+        # Queued payloads are validated, but not against the schema of the worker applying them
+        invalid = str(LandingIngestion.objects.create(organization=self.organization, user=self.user, place=self.place,
+                                                      payload={'fish_id': self.fish.pk, 'weight': '-1'}).ticket)
+        also_good = self.enqueue(weight='4')
+        apply_landing_ingestions(batch_size=10)
+
+        self.assertEqual([self.get_status(ticket)['status'] for ticket in (good, bad_fish, invalid, also_good)],
+                         ['Applied', 'Failed', 'Failed', 'Applied'])
+        self.assertTrue(self.get_status(bad_fish)['errors'])
+        self.assertIsNone(self.get_status(bad_fish)['result'])
+        self.assertIn('weight', json.dumps(self.get_status(invalid)['errors']))
+        self.assertEqual(Stock.objects.get(fish=self.fish).weight, Decimal('7.00'))
+        self.assertEqual(Record.objects.count(), 2)
+
+    def test_task_drains_the_queue_in_batches(self):
+        tickets = [self.enqueue(weight='1') for _ in range(5)]
+        apply_landing_ingestions(batch_size=2)
+        self.assertTrue(all(self.get_status(ticket)['status'] == 'Applied' for ticket in tickets))
+        self.assertEqual(Stock.objects.get(fish=self.fish).weight, Decimal('5.00'))
+
+    def test_unknown_or_missing_ticket(self):
+        response = self.client.get(f'/farms/api/records/landing_status/?ticket={uuid.uuid4()}', secure=True)
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/farms/api/records/landing_status/', secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    def test_tickets_of_other_organizations_are_not_found(self):
+        ticket = self.enqueue()
+        organization = Organization.objects.create(name='other organization')
+        self.client.force_authenticate(create_user(organization, Place.objects.create(
+            name='other', organization=organization, type=1), designation=2))
+        response = self.client.get(f'/farms/api/records/landing_status/?ticket={ticket}', secure=True)
+        self.assertEqual(response.status_code, 404)
+
+
+class ReconcileStockTests(TransactionTestCase):
+    """Transactions of their own: reconciling sets the isolation level, which a savepoint can't"""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.organization = Organization.objects.create(name='organization')
+        self.place = Place.objects.create(name='center', organization=self.organization, type=1)
+        self.retail = Place.objects.create(name='retail', organization=self.organization, type=3, center=self.place)
+        self.fish = Fish.objects.create(name='fish', organization=self.organization)
+        for record_type, import_from, export_to, weight in ((RecordType.IMPORT, None, self.place, '10'),
+                                                            (RecordType.IMPORT, None, self.place, '5'),
+                                                            (RecordType.EXPORT, self.place, self.retail, '4')):
+            Record.objects.create(organization=self.organization, record_type=record_type, import_from=import_from,
+                                  export_to=export_to, fish=self.fish, weight=Decimal(weight))
+        self.key = (self.place.pk, self.fish.pk, None, False, 'kg')
+
+    def reconcile(self, *args):
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('reconcile_stock', '--organization', str(self.organization.pk), *args, stdout=out)
+        self.assertIn('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ', [query['sql'] for query in queries])
+        return out.getvalue()
+
+    def test_drift_is_reported_then_corrected(self):
+        StockController().update_stock_weights([self.key + (Decimal('9'),)])
+        report = self.reconcile()
+        self.assertIn('stock: 9.00 expected: 11.00 diff: 2.00', report)
+        self.assertIn('1 stock difference(s) found', report)
+        self.assertEqual(Stock.objects.get().weight, Decimal('9.00'))
+
+        report = self.reconcile('--apply')
+        self.assertIn('1 stock difference(s) corrected', report)
+        stock = Stock.objects.get()
+        self.assertEqual(stock.weight, Decimal('11.00'))
+        self.assertEqual(StockMovement.objects.filter(stock=stock).latest('pk').weight, Decimal('2.00'))
+        self.assertIn('0 stock difference(s) found', self.reconcile())
+
+    def test_missing_stock_is_created(self):
+        self.reconcile('--apply')
+        self.assertEqual(Stock.objects.get(place=self.place).weight, Decimal('11.00'))
+
+    def test_apply_reverts_manual_edits_and_warns(self):
+        errors, stock = StockController().create_stock(*self.key[:4], weight=Decimal('11'), weight_unit='kg')
+        StockController().edit_stock(stock, *self.key[:4], weight=Decimal('20'), weight_unit='kg')
+        report = self.reconcile('--apply')
+        self.assertIn('manual stock edits', report)
+        self.assertEqual(Stock.objects.get().weight, Decimal('11.00'))
+
+
+class BillListingTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.place = Place.objects.create(name='retail', organization=cls.organization, type=3)
+        cls.user = create_user(cls.organization, cls.place, designation=2)
+        cls.fish = Fish.objects.create(name='fish', organization=cls.organization)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_bills(self, count):
+        for i in range(count):
+            bill = Bill.objects.create(organization=self.organization, user=self.user, bill_place=self.place,
+                                       price=Decimal(100), total_amount=Decimal(100), billed_amount=Decimal(100),
+                                       discounted_price=Decimal(100), pay_type=1)
+            # Bills of 0 to 3 items
+            for j in range(i % 4):
+                BillItem.objects.create(bill=bill, fish=self.fish, weight=Decimal('1.25') * (j + 1),
+                                        price=Decimal(10))
+
+    def list_bills(self):
+        # Every listing is a cache miss: the writes of the test are never committed, so generations don't move
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/farms/api/bills/?page=1', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'], len(queries)
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        self.create_bills(1)
+        self.list_bills()
+        results, few = self.list_bills()
+        self.assertEqual(len(results), 1)
+        self.create_bills(4)
+        with self.assertNumQueries(few):
+            results, _ = self.list_bills()
+        self.assertEqual(len(results), 5)
+
+    def test_annotated_totals_match_the_items(self):
+        self.create_bills(5)
+        results, _ = self.list_bills()
+        for data in results:
+            bill = Bill.objects.get(pk=data['id'])
+            items = BillItem.objects.filter(bill=bill)
+            self.assertEqual(data['item_count'], items.count())
+            self.assertEqual(Decimal(data['weight']), sum(items.values_list('weight', flat=True), Decimal(0)))
+            # Same as the serializer computes for a bill loaded without the annotations
+            self.assertEqual((data['weight'], data['item_count']),
+                             (BillSerializer(bill).data['weight'], BillSerializer(bill).data['item_count']))
+
+
+class RecordListingRepresentationTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.center = Place.objects.create(name='center', organization=cls.organization, type=1)
+        cls.retail = Place.objects.create(name='retail', organization=cls.organization, type=3, center=cls.center)
+        cls.user = create_user(cls.organization, cls.center, designation=2)
+        cls.fish = [Fish.objects.create(name=f'fish {i}', organization=cls.organization) for i in range(2)]
+        for i in range(4):
+            Record.objects.create(organization=cls.organization, user=cls.user, record_type=RecordType.EXPORT,
+                                  import_from=cls.center, export_to=cls.retail, weigh_place=cls.center,
+                                  fish=cls.fish[i % 2], weight=Decimal(i + 1))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, query):
+        response = self.client.get(f'/farms/api/records/?page=1&{query}', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_fields_keep_only_the_listed_fields(self):
+        results = self.get('fields=id,weight,unknown')['results']
+        self.assertEqual(len(results), 4)
+        self.assertEqual([set(record) for record in results], [{'id', 'weight'}] * 4)
+
+    def test_default_representation_nests_every_relation(self):
+        record = self.get('')['results'][0]
+        self.assertEqual(record['user']['place']['id'], self.center.pk)
+        self.assertEqual(record['export_to']['center']['id'], self.center.pk)
+        self.assertEqual(record['fish']['organization']['id'], self.organization.pk)
+
+    def test_expand_nests_only_the_listed_relations(self):
+        results = self.get('fields=id,fish,user,export_to&expand=fish')['results']
+        self.assertEqual([set(record) for record in results], [{'id', 'fish', 'user', 'export_to'}] * 4)
+        record = results[0]
+        self.assertEqual(record['fish']['id'], self.fish[1].pk)
+        # Relations of an expanded relation that are not expanded themselves are primary keys too
+        self.assertEqual(record['fish']['organization'], self.organization.pk)
+        self.assertEqual((record['user'], record['export_to']), (self.user.pk, self.retail.pk))
+
+    def test_dotted_expand_nests_deeper_levels(self):
+        record = self.get('fields=user,export_to&expand=user.place,export_to.center')['results'][0]
+        self.assertEqual(record['user']['place']['id'], self.center.pk)
+        self.assertEqual(record['user']['place']['organization'], self.organization.pk)
+        self.assertEqual(record['user']['organization'], self.organization.pk)
+        self.assertEqual(record['export_to']['center']['id'], self.center.pk)
+
+    def test_empty_expand_renders_every_relation_as_its_pk(self):
+        record = self.get('expand=')['results'][0]
+        self.assertEqual(
+            {name: record[name] for name in ('organization', 'user', 'import_from', 'export_to', 'weigh_place',
+                                             'fish', 'fish_variant', 'discount')},
+            {'organization': self.organization.pk, 'user': self.user.pk, 'import_from': self.center.pk,
+             'export_to': self.retail.pk, 'weigh_place': self.center.pk, 'fish': self.fish[1].pk,
+             'fish_variant': None, 'discount': None})
+        # Enum method fields are not relations
+        self.assertEqual(record['record_type']['id'], RecordType.EXPORT)
+
+    def test_fieldsets_are_cached_apart(self):
+        self.assertEqual(set(self.get('fields=id')['results'][0]), {'id'})
+        self.assertEqual(set(self.get('fields=weight')['results'][0]), {'weight'})
+        self.assertIsInstance(self.get('fields=fish')['results'][0]['fish'], dict)
+        self.assertIsInstance(self.get('fields=fish&expand=')['results'][0]['fish'], int)
+
+    def test_normalize_side_loads_relations_once(self):
+        response = self.get('normalize=true')
+        self.assertEqual(set(response) - {'count', 'next', 'previous', 'page_size'}, {'results', 'included'})
+        results, included = response['results'], response['included']
+        self.assertEqual(len(results), 4)
+        self.assertEqual(
+            [(record['fish'], record['user'], record['import_from'], record['export_to']) for record in results],
+            [(self.fish[i % 2].pk, self.user.pk, self.center.pk, self.retail.pk) for i in reversed(range(4))])
+        # Four records reference two fish, one user and two places: each is included once
+        self.assertEqual(set(included['fish']), {str(fish.pk) for fish in self.fish})
+        self.assertEqual(set(included['user']), {str(self.user.pk)})
+        self.assertEqual(set(included['place']), {str(self.center.pk), str(self.retail.pk)})
+        self.assertEqual(set(included['organization']), {str(self.organization.pk)})
+        # Included objects are normalized too
+        retail = included['place'][str(self.retail.pk)]
+        self.assertEqual((retail['id'], retail['center'], retail['organization']),
+                         (self.retail.pk, self.center.pk, self.organization.pk))
+        self.assertEqual(included['user'][str(self.user.pk)]['place'], self.center.pk)
+
+    def test_normalize_follows_the_fieldset(self):
+        response = self.get('normalize=true&fields=id,fish')
+        self.assertEqual([set(record) for record in response['results']], [{'id', 'fish'}] * 4)
+        self.assertEqual(set(response['included']), {'fish', 'organization'})
+
+    def test_listing_is_not_normalized_by_default(self):
+        response = self.get('normalize=false')
+        self.assertNotIn('included', response)
+        self.assertIsInstance(response['results'][0]['fish'], dict)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.center = Place.objects.create(name='center', organization=cls.organization, type=1)
+        cls.retail = Place.objects.create(name='retail', organization=cls.organization, type=3, center=cls.center)
+        cls.user = create_user(cls.organization, cls.center, designation=2)
+        cls.fish = Fish.objects.create(name='rohu', organization=cls.organization)
+        # Five rows, three chunks of EXPORT_CHUNK_SIZE
+        cls.records = [
+            Record.objects.create(organization=cls.organization, user=cls.user, record_type=RecordType.EXPORT,
+                                  import_from=cls.center, export_to=cls.retail, weigh_place=cls.center,
+                                  fish=cls.fish, weight=Decimal(i + 1),
+                                  weight_unit=WeightUnit.POUNDS if i else WeightUnit.KILOGRAMS)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, path, export_format):
+        response = self.client.get(f'/farms/api/{path}/export/?export_format={export_format}', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{path}.{export_format}"')
+        chunks = list(response.streaming_content)
+        return chunks, b''.join(chunks).decode()
+
+    def test_csv_streams_a_header_then_rows_in_chunks(self):
+        chunks, content = self.export('records', 'csv')
+        self.assertEqual(len(chunks), 4)
+        header, *rows = csv.reader(StringIO(content))
+        self.assertEqual(header, ['id', 'created_at', 'record_type', 'user', 'import_from', 'export_to',
+                                  'weigh_place', 'fish', 'fish_variant', 'is_SP', 'weight', 'weight_unit',
+                                  'weight_in_grams', 'discount', 'is_active'])
+        self.assertEqual(sorted(int(row[0]) for row in rows), [record.pk for record in self.records])
+        row = dict(zip(header, next(row for row in rows if int(row[0]) == self.records[0].pk)))
+        # Enums are written as their labels, relations as their names and missing relations as blanks
+        self.assertEqual(
+            {name: row[name] for name in ('record_type', 'user', 'import_from', 'export_to', 'weigh_place', 'fish',
+                                          'fish_variant', 'discount', 'weight_unit', 'weight_in_grams')},
+            {'record_type': 'Export', 'user': 'user', 'import_from': 'center', 'export_to': 'retail',
+             'weigh_place': 'center', 'fish': 'rohu', 'fish_variant': '', 'discount': '',
+             'weight_unit': 'Kilograms', 'weight_in_grams': '1000'})
+
+    def test_ndjson_streams_one_object_per_row(self):
+        chunks, content = self.export('records', 'ndjson')
+        self.assertEqual(len(chunks), 3)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(sorted(row['id'] for row in rows), [record.pk for record in self.records])
+        row = next(row for row in rows if row['id'] == self.records[1].pk)
+        self.assertEqual((row['record_type'], row['export_to'], row['fish_variant'], row['weight_unit']),
+                         ('Export', 'retail', None, 'Pounds'))
+        self.assertEqual(Decimal(row['weight']), Decimal(2))
+        self.assertEqual(row['weight_in_grams'], 907)
+
+    def test_bill_export_carries_the_item_totals(self):
+        bill = Bill.objects.create(organization=self.organization, user=self.user, bill_place=self.retail,
+                                   price=Decimal(100), total_amount=Decimal(100), billed_amount=Decimal(100),
+                                   discounted_price=Decimal(100), pay_type=1)
+        for weight in ('1.25', '2.50'):
+            BillItem.objects.create(bill=bill, fish=self.fish, weight=Decimal(weight), price=Decimal(10))
+        _, content = self.export('bills', 'csv')
+        header, row = csv.reader(StringIO(content))
+        row = dict(zip(header, row))
+        self.assertEqual((row['id'], row['bill_place'], row['pay_type'], row['discount']),
+                         (str(bill.pk), 'retail', 'Cash', ''))
+        self.assertEqual((Decimal(row['weight']), row['item_count']), (Decimal('3.75'), '2'))
+
+    def test_expense_export(self):
+        expense_type = ExpenseType.objects.create(name='ice', organization=self.organization)
+        expense = Expense.objects.create(organization=self.organization, user=self.user, type=expense_type,
+                                         desc='crushed, 2 blocks', amount=Decimal('40.50'))
+        _, content = self.export('expenses', 'ndjson')
+        [row] = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual((row['id'], row['type'], row['desc'], row['user'], row['expense_date']),
+                         (expense.pk, 'ice', 'crushed, 2 blocks', 'user', None))
+        self.assertEqual(Decimal(row['amount']), Decimal('40.50'))
+
+    def test_unknown_format_is_rejected(self):
+        response = self.client.get('/farms/api/records/export/?export_format=xlsx', secure=True)
+        self.assertEqual(response.status_code, 400)
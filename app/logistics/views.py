@@ -1,31 +1,39 @@
 from django.core.cache import cache
-from django.db import transaction
-from django.http import JsonResponse
+from django.db import connection, transaction
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
+from kombu.exceptions import OperationalError
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 
 from app.logistics.controllers import RecordController, ExpenseController, BillController, BillItemController, \
-    StockController
-from app.logistics.enums import RecordType
+    StockController, LandingIngestionController, SyncedOperationController
+from app.logistics.enums import RecordType, SyncOperation
 from app.logistics.schemas import RecordCreationReqSchema, RecordEditReqSchema, RecordListingReqSchema, \
     ExpenseCreationReqSchema, ExpenseEditReqSchema, ExpenseListingReqSchema, BillListingReqSchema, BillEditReqSchema, \
     BillCreationReqSchema, BillItemCreationReqSchema, BillItemEditReqSchema, BillItemListingReqSchema, \
-    StockCreationReqSchema, StockEditReqSchema, StockListingReqSchema, AddToStockSchema
+    StockCreationReqSchema, StockEditReqSchema, StockListingReqSchema, AddToStockSchema, RecordSyncSchema, RecordSyncOperationSchema, \
+    StockWeightAtReqSchema, LandingIngestionStatusReqSchema
 from app.logistics.serializers import RecordSerializer, ExpenseSerializer, BillSerializer, BillItemSerializer, \
-    StockSerializer
+    StockSerializer, RECORD_EXPORT_COLUMNS, BILL_EXPORT_COLUMNS, EXPENSE_EXPORT_COLUMNS
+from app.logistics.tasks import apply_landing_ingestions
 from app.utils.authentication import IsOrganizationUser
 from app.utils.constants import Timeouts, CacheKeys
-from app.utils.helpers import get_serialized_exception, build_cache_key, qdict_to_dict
-from app.utils.pagination import CustomPageNumberPagination
+from app.utils.exports import EXPORT_FORMAT_PARAMETER, get_export_format, stream_export
+from app.utils.helpers import get_serialized_exception, qdict_to_dict, idempotent, \
+    get_sparse_fieldset, SPARSE_FIELDSET_PARAMETERS, is_normalized
+from app.utils.pagination import CustomPageNumberPagination, CURSOR_PAGINATION_PARAMETER
+from app.utils.renderers import JsonResponse
+from app.utils.response_cache import cache_detail, cached_listing, conditional_detail, get_evictions
 
 
 class RecordViewSet(viewsets.ViewSet):
     permission_classes = (IsOrganizationUser,)
     controller = RecordController()
     stock_controller = StockController()
+    landing_ingestion_controller = LandingIngestionController()
+    synced_operation_controller = SyncedOperationController()
 
     serializer = RecordSerializer
     stock_serializer = StockSerializer
@@ -51,6 +59,7 @@ class RecordViewSet(viewsets.ViewSet):
             })
         ]
     )
+    @idempotent
     def create(self, request, *args, **kwargs):
         errors, data = self.controller.parse_request(RecordCreationReqSchema, request.data)
         if errors:
@@ -80,8 +89,14 @@ class RecordViewSet(viewsets.ViewSet):
         return JsonResponse(data=data, status=status.HTTP_201_CREATED)
 
     @extend_schema(
-        description="Add to Landings",
+        description="Add to Landings. With ?async=true the landing is only validated and queued: the response is "
+                    "202 with a ticket, and the records are written by a background worker. Poll landing_status "
+                    "with the ticket for the outcome.",
         request=RecordCreationReqSchema,
+        parameters=[
+            OpenApiParameter(name='async', location=OpenApiParameter.QUERY, required=False, type=bool,
+                             description='Queue the landing instead of applying it in the request'),
+        ],
         examples=[
             OpenApiExample('Add To Landings Request JSON', value={
                 "organization_id": 1,
@@ -101,11 +116,14 @@ class RecordViewSet(viewsets.ViewSet):
         ]
     )
     @action(methods=['POST'], detail=False)
+    @idempotent
     def add_to_landings(self, request, *args, **kwargs):
         errors, data = self.controller.parse_request(RecordCreationReqSchema, request.data)
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
         user = request.user
+        if request.query_params.get('async') in ('1', 'true', 'True'):
+            return self._enqueue_landing(request)
         try:
             with transaction.atomic():
                 errors, record_import = self.controller.create_record(
@@ -157,6 +175,7 @@ class RecordViewSet(viewsets.ViewSet):
                         is_SP=data.is_SP,
                         weight=data.weight,
                         weight_unit=data.weight_unit,
+                        record_id=record_import.pk,
                     )
                     if errors:
                         raise Exception(errors)
@@ -191,6 +210,7 @@ class RecordViewSet(viewsets.ViewSet):
         ]
     )
     @action(methods=['POST'], detail=False)
+    @idempotent
     def add_to_sales(self, request, *args, **kwargs):
         errors, data = self.controller.parse_request(RecordCreationReqSchema, request.data)
         if errors:
@@ -222,6 +242,7 @@ class RecordViewSet(viewsets.ViewSet):
                     is_SP=data.is_SP,
                     weight=-abs(data.weight),
                     weight_unit=data.weight_unit,
+                    record_id=record.pk,
                 )
                 if errors:
                     raise Exception(errors)
@@ -256,6 +277,7 @@ class RecordViewSet(viewsets.ViewSet):
         ]
     )
     @action(methods=['POST'], detail=False)
+    @idempotent
     def send_stock(self, request, *args, **kwargs):
         errors, data = self.controller.parse_request(RecordCreationReqSchema, request.data)
         if errors:
@@ -287,6 +309,7 @@ class RecordViewSet(viewsets.ViewSet):
                     is_SP=data.is_SP,
                     weight=-abs(data.weight),
                     weight_unit=data.weight_unit,
+                    record_id=record.pk,
                 )
                 if errors:
                     raise Exception(errors)
@@ -321,16 +344,16 @@ class RecordViewSet(viewsets.ViewSet):
         ]
     )
     @action(methods=['POST'], detail=False)
+    @idempotent
     def add_to_stock(self, request, *args, **kwargs):
         errors, data_all = self.controller.parse_request(AddToStockSchema, request.data)
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
         user = request.user
         try:
-            result = []
-            for data in data_all.items:
-                with transaction.atomic():
-                    errors, record = self.controller.create_record(
+            with transaction.atomic():
+                errors, records = self.controller.create_bulk_records([
+                    dict(
                         organization_id=user.organization.id,
                         user_id=user.id,
                         import_from_id=data.import_from_id,
@@ -345,28 +368,258 @@ class RecordViewSet(viewsets.ViewSet):
                         is_SP=data.is_SP,
                         is_active=data.is_active
                     )
-                    if errors:
-                        return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-                    errors, stock = self.stock_controller.update_stock_weight(
-                        place_id=user.place.id,
-                        fish_id=data.fish_id,
-                        fish_variant_id=data.fish_variant_id,
-                        is_SP=data.is_SP,
-                        weight=data.weight,
-                        weight_unit=data.weight_unit,
-                    )
-                    if errors:
-                        raise Exception(errors)
+                    for data in data_all.items
+                ])
+                if errors:
+                    return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
-                    item_result = {
+                stock_keys = [(user.place.id, data.fish_id, data.fish_variant_id, data.is_SP, data.weight_unit)
+                              for data in data_all.items]
+                errors, stocks = self.stock_controller.update_stock_weights(
+                    (key + (data.weight,) for key, data in zip(stock_keys, data_all.items)),
+                    sources=[{'record_id': record.pk} for record in records]
+                )
+                if errors:
+                    raise Exception(errors)
+
+                result = [
+                    {
                         "record_id": record.pk,
-                        "stock_id": stock.pk,
+                        "stock_id": stocks[key].pk,
                     }
-                    result.append(item_result)
+                    for record, key in zip(records, stock_keys)
+                ]
             return JsonResponse(data={"result": result}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return JsonResponse(data=get_serialized_exception(e)[0], status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        description="Replay an ordered batch of offline record operations (add_to_landings, add_to_sales, "
+                    "send_stock) in a single transaction. Each operation carries a client generated op_id and "
+                    "gets its own entry in the response: 201 when applied, 400 when rejected (without affecting "
+                    "the others) and 200 with its original data when the device already synced that op_id.",
+        request=RecordSyncSchema,
+        examples=[
+            OpenApiExample('Sync Request JSON', value={
+                "device_id": "weigher-07",
+                "operations": [
+                    {
+                        "op_id": "a1b2c3",
+                        "operation": "add_to_landings",
+                        "import_from_id": 1,
+                        "fish_id": 1,
+                        "fish_variant_id": 1,
+                        "weight": 10.5,
+                        "weight_unit": "kg",
+                        "is_SP": False
+                    },
+                    {
+                        "op_id": "d4e5f6",
+                        "operation": "send_stock",
+                        "export_to_id": 2,
+                        "fish_id": 1,
+                        "fish_variant_id": 1,
+                        "weight": 4.0,
+                        "weight_unit": "kg",
+                        "is_SP": False
+                    }
+                ]
+            })
+        ]
+    )
+    @action(methods=['POST'], detail=False)
+    @idempotent
+    def sync(self, request, *args, **kwargs):
+        errors, data_all = self.controller.parse_request(RecordSyncSchema, request.data)
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        user = request.user
+        device_id = data_all.device_id or f"user-{user.id}"
+        results = []
+        operations = []
+        seen_op_ids = set()
+        for op in data_all.operations:
+            errors, data = self.controller.parse_request(RecordSyncOperationSchema, op)
+            if not errors and data.op_id in seen_op_ids:
+                errors = {"errors": f"duplicate op_id {data.op_id}"}
+            if errors:
+                results.append({"op_id": op.get("op_id"), "status": status.HTTP_400_BAD_REQUEST, "errors": errors})
+                continue
+            seen_op_ids.add(data.op_id)
+            result = {"op_id": data.op_id, "status": status.HTTP_201_CREATED}
+            results.append(result)
+            operations.append((result, data))
+
+        # Operations synced by an earlier request get the result they got then
+        synced = self.synced_operation_controller.get_synced_results(user.organization.id, device_id, seen_op_ids)
+        pending = []
+        for result, data in operations:
+            if data.op_id in synced:
+                result.update(status=status.HTTP_200_OK, data=synced[data.op_id])
+            else:
+                pending.append((result, data))
+
+        try:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        self._apply_sync_operations(user, device_id, pending)
+                        # Foreign keys are deferred until commit; check them now so the savepoint catches it
+                        connection.check_constraints()
+                except Exception:
+                    # Apply them one by one, each in its own savepoint, so a bad one only fails itself
+                    for result, data in pending:
+                        try:
+                            with transaction.atomic():
+                                self._apply_sync_operations(user, device_id, [(result, data)])
+                                connection.check_constraints()
+                        except Exception as e:
+                            result.pop("data", None)
+                            result.update(status=status.HTTP_400_BAD_REQUEST, errors=get_serialized_exception(e)[0])
+        except Exception as e:
+            return JsonResponse(data=get_serialized_exception(e)[0], status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse(data={"results": results}, status=status.HTTP_200_OK)
+
+    def _apply_sync_operations(self, user, device_id, operations):
+        """
+        Create the records and stock changes of parsed sync operations with one bulk insert and one stock upsert,
+        set the data of their results and record them as synced. Raises if the database rejects any of them.
+        :param operations: list of (result dict, RecordSyncOperationSchema)
+        """
+        if not operations:
+            return
+        records = []
+        stock_deltas = []
+        stock_delta_records = []
+        applied = []
+        for result, data in operations:
+            applied.append((result, data, len(records)))
+            stock_key = (user.place.id, data.fish_id, data.fish_variant_id, data.is_SP, data.weight_unit)
+            if data.operation == SyncOperation.ADD_TO_LANDINGS:
+                records.append(self._get_sync_record_fields(
+                    data,
+                    organization_id=data.organization_id or user.organization.id,
+                    user_id=data.user_id or user.id,
+                    import_from_id=data.import_from_id,
+                    export_to_id=user.place.id,
+                    record_type=RecordType.IMPORT,
+                    weigh_place_id=user.place.id,
+                ))
+                if data.export_to_id is not None:
+                    records.append(self._get_sync_record_fields(
+                        data,
+                        organization_id=user.organization.id,
+                        user_id=user.id,
+                        import_from_id=user.place.id,
+                        export_to_id=data.export_to_id,
+                        record_type=RecordType.EXPORT,
+                        weigh_place_id=user.place.id,
+                    ))
+                else:
+                    stock_deltas.append(stock_key + (data.weight,))
+                    stock_delta_records.append(len(records) - 1)
+            else:
+                records.append(self._get_sync_record_fields(
+                    data,
+                    organization_id=user.organization.id,
+                    user_id=user.id,
+                    import_from_id=user.place.id,
+                    export_to_id=data.export_to_id,
+                    record_type=RecordType.EXPORT,
+                    weigh_place_id=user.place.id,
+                ))
+                stock_deltas.append(stock_key + (-abs(data.weight),))
+                stock_delta_records.append(len(records) - 1)
+
+        errors, records = self.controller.create_bulk_records(records)
+        if errors:
+            raise Exception(errors)
+        errors, stocks = self.stock_controller.update_stock_weights(
+            stock_deltas,
+            sources=[{'record_id': records[index].pk} for index in stock_delta_records]
+        )
+        if errors:
+            raise Exception(errors)
+
+        for result, data, index in applied:
+            stock_key = (user.place.id, data.fish_id, data.fish_variant_id, data.is_SP, data.weight_unit)
+            if data.operation == SyncOperation.ADD_TO_LANDINGS and data.export_to_id is not None:
+                result["data"] = {
+                    "import_id": records[index].pk,
+                    "export_id": records[index + 1].pk,
+                }
+            else:
+                result["data"] = {
+                    "record_id": records[index].pk,
+                    "stock_id": stocks[stock_key].pk,
+                }
+        self.synced_operation_controller.create_synced_operations(
+            user.organization.id, device_id, [(result["op_id"], result["data"]) for result, _ in operations]
+        )
+
+    def _enqueue_landing(self, request):
+        user = request.user
+        errors, ingestion = self.landing_ingestion_controller.enqueue_landing(
+            organization_id=user.organization.id,
+            user_id=user.id,
+            place_id=user.place.id,
+            payload=request.data
+        )
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            apply_landing_ingestions.delay()
+        except OperationalError:
+            # Broker unreachable: the ticket stays pending and is picked up by the next scheduled run
+            pass
+        data = {
+            "ticket": str(ingestion.ticket),
+            "status": ingestion.get_status_display(),
+        }
+        return JsonResponse(data=data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(
+        description="Outcome of a landing queued with add_to_landings?async=true",
+        parameters=[
+            OpenApiParameter(name='ticket', location=OpenApiParameter.QUERY, required=True, type=str,
+                             description='ticket returned by add_to_landings'),
+        ],
+    )
+    @action(methods=['GET'], detail=False)
+    def landing_status(self, request, *args, **kwargs):
+        errors, data = self.controller.parse_request(LandingIngestionStatusReqSchema,
+                                                     qdict_to_dict(request.query_params))
+        if errors:
+            return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        ingestion = self.landing_ingestion_controller.get_ingestion_by_ticket(
+            organization_id=request.user.organization.id,
+            ticket=data.ticket
+        )
+        if not ingestion:
+            return Response({"error": "Landing with this ticket does not exist"},
+                            status=status.HTTP_404_NOT_FOUND)
+        data = {
+            "ticket": str(ingestion.ticket),
+            "status": ingestion.get_status_display(),
+            "result": ingestion.result,
+            "errors": ingestion.errors,
+            "created_at": ingestion.created_at,
+            "processed_at": ingestion.processed_at,
+        }
+        return Response(data=data, status=status.HTTP_200_OK)
+
+    def _get_sync_record_fields(self, data, **fields):
+        return dict(
+            discount_id=data.discount_id,
+            fish_id=data.fish_id,
+            fish_variant_id=data.fish_variant_id,
+            weight=data.weight,
+            weight_unit=data.weight_unit,
+            is_SP=data.is_SP,
+            is_active=data.is_active,
+            **fields
+        )
+
     @extend_schema(
         description="Edit an existing record",
         request=RecordEditReqSchema,
@@ -450,20 +703,23 @@ class RecordViewSet(viewsets.ViewSet):
             OpenApiParameter(name='start_time', location=OpenApiParameter.QUERY, required=False, type=str,
                              description='Start time for filtering'),
             OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
-                             description='End Time for filtering')
+                             description='End Time for filtering'),
+            *SPARSE_FIELDSET_PARAMETERS,
+            CURSOR_PAGINATION_PARAMETER,
         ]
     )
+    @cached_listing(CacheKeys.RECORD_LIST, RecordListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(RecordListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
-        paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        paginator = CustomPageNumberPagination(keyset_field='created_at')
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-        cache_key = build_cache_key(
-            CacheKeys.RECORD_LIST,
+
+        errors, records = self.controller.filter_records(
             organization_id=data.organization_id or user.organization.id,
             user_id=data.user_id,
             import_from_id=data.import_from_id,
@@ -478,59 +734,94 @@ class RecordViewSet(viewsets.ViewSet):
             start_time=data.get_start_time(),
             end_time=data.get_end_time(),
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
 
-        if instance:
-            res = instance
-        else:
-            errors, records = self.controller.filter_records(
-                organization_id=data.organization_id or user.organization.id,
-                user_id=data.user_id,
-                import_from_id=data.import_from_id,
-                export_to_id=data.export_to_id,
-                record_type=data.record_type,
-                discount_id=data.discount_id,
-                fish_id=data.fish_id,
-                fish_variant_id=data.fish_variant_id,
-                weigh_place_id=data.weigh_place_id,
-                is_SP=data.is_SP,
-                is_active=data.is_active,
-                start_time=data.get_start_time(),
-                end_time=data.get_end_time(),
-                ordering=data.ordering,
-            )
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(records, request)
+        if page is None:
+            page = records
 
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(records, request)
-            if page is None:
-                page = records
-
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
+
+    @extend_schema(
+        description="Stream the records matching the list filters as CSV or NDJSON, without pagination",
+        parameters=[
+            EXPORT_FORMAT_PARAMETER,
+            OpenApiParameter(name='organization_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Organization ID'),
+            OpenApiParameter(name='user_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='User ID'),
+            OpenApiParameter(name='import_from_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Import From ID'),
+            OpenApiParameter(name='export_to_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Export To ID'),
+            OpenApiParameter(name='record_type', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Record Type(Import/Eport)'),
+            OpenApiParameter(name='discount_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Discount ID'),
+            OpenApiParameter(name='fish_variant_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Fish Variant ID'),
+            OpenApiParameter(name='weigh_place_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='Weigh Place ID'),
+            OpenApiParameter(name='is_SP', location=OpenApiParameter.QUERY, required=False, type=bool,
+                             description='Is SP'),
+            OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=False, type=bool,
+                             description='Is Active'),
+            OpenApiParameter(name='start_time', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='Start time for filtering'),
+            OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='End Time for filtering'),
+        ]
+    )
+    @action(methods=['GET'], detail=False)
+    def export(self, request, **kwargs):
+        export_format = get_export_format(request.query_params)
+        if not export_format:
+            return JsonResponse({"error": "export_format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        errors, data = self.controller.parse_request(RecordListingReqSchema, qdict_to_dict(request.query_params))
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        errors, records = self.controller.filter_records(
+            organization_id=data.organization_id or user.organization.id,
+            user_id=data.user_id,
+            import_from_id=data.import_from_id,
+            export_to_id=data.export_to_id,
+            record_type=data.record_type,
+            discount_id=data.discount_id,
+            fish_id=data.fish_id,
+            fish_variant_id=data.fish_variant_id,
+            weigh_place_id=data.weigh_place_id,
+            is_SP=data.is_SP,
+            is_active=data.is_active,
+            start_time=data.get_start_time(),
+            end_time=data.get_end_time(),
+            ordering=data.ordering,
+        )
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        return stream_export(records, RECORD_EXPORT_COLUMNS, export_format, 'records')
 
+    @conditional_detail(CacheKeys.RECORD_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.RECORD_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
 
             if not obj:
                 return JsonResponse({"error": "Record with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -599,6 +890,7 @@ class BillViewSet(viewsets.ViewSet):
             })
         ]
     )
+    @idempotent
     def create(self, request, *args, **kwargs):
         errors, data = self.controller.parse_request(BillCreationReqSchema, request.data)
         if errors:
@@ -627,21 +919,19 @@ class BillViewSet(viewsets.ViewSet):
                 if errors:
                     raise Exception(errors)
 
-                for item in data.bill_items:
-                    errors, stock = self.stock_controller.update_stock_weight(
-                        place_id=data.bill_place_id or user.place.id,
-                        fish_id=item.fish_id,
-                        fish_variant_id=item.fish_variant_id,
-                        is_SP=item.is_SP,
-                        weight=-abs(item.weight),
-                        weight_unit=item.weight_unit,
-                    )
-                    if errors:
-                        raise Exception(errors)
+                place_id = data.bill_place_id or user.place.id
+                stock_keys = [(place_id, item.fish_id, item.fish_variant_id, item.is_SP, item.weight_unit)
+                              for item in data.bill_items]
+                errors, stocks = self.stock_controller.update_stock_weights(
+                    (key + (-abs(item.weight),) for key, item in zip(stock_keys, data.bill_items)),
+                    sources=[{'bill_item_id': bill_item.pk} for bill_item in bill_items]
+                )
+                if errors:
+                    raise Exception(errors)
 
                 data = {
                     "bill_id": bill.pk,
-                    "stock_id": stock.pk,
+                    "stock_id": stocks[stock_keys[-1]].pk if stock_keys else None,
                     "bill_items": self.bill_item_controller.serialize_queryset(bill_items, self.bill_item_serializer)
                 }
                 return JsonResponse(data=data, status=status.HTTP_201_CREATED)
@@ -714,59 +1004,88 @@ class BillViewSet(viewsets.ViewSet):
             OpenApiParameter(name='start_time', location=OpenApiParameter.QUERY, required=False, type=str,
                              description='Start time for filtering'),
             OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
-                             description='End Time for filtering')
+                             description='End Time for filtering'),
+            *SPARSE_FIELDSET_PARAMETERS,
+            CURSOR_PAGINATION_PARAMETER,
         ],
     )
+    @cached_listing(CacheKeys.BILL_LIST, BillListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(BillListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
-        paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        paginator = CustomPageNumberPagination(keyset_field='created_at')
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-        cache_key = build_cache_key(
-            CacheKeys.BILL_LIST,
+        errors, data = self.controller.filter_bills(
             organization_id=data.organization_id or user.organization.id,
             user_id=data.user_id,
             bill_place_id=data.bill_place_id,
             discount_id=data.discount_id,
             pay_type=data.pay_type,
             is_active=data.is_active,
-            start_time=data.start_time,
-            end_time=data.end_time,
+            start_time=data.get_start_time(),
+            end_time=data.get_end_time(),
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None  # Remove this line to enable caching
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_bills(
-                organization_id=data.organization_id or user.organization.id,
-                user_id=data.user_id,
-                bill_place_id=data.bill_place_id,
-                discount_id=data.discount_id,
-                pay_type=data.pay_type,
-                is_active=data.is_active,
-                start_time=data.get_start_time(),
-                end_time=data.get_end_time(),
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
+
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
+
+    @extend_schema(
+        description="Stream the bills matching the list filters as CSV or NDJSON, without pagination",
+        parameters=[
+            EXPORT_FORMAT_PARAMETER,
+            OpenApiParameter(name='organization_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='organization_id'),
+            OpenApiParameter(name='user_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='user_id'),
+            OpenApiParameter(name='bill_place_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='bill_place_id'),
+            OpenApiParameter(name='discount_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='discount_id'),
+            OpenApiParameter(name='pay_type', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='pay_type'),
+            OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=False, type=bool,
+                             description='Is Active'),
+            OpenApiParameter(name='start_time', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='Start time for filtering'),
+            OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='End Time for filtering'),
+        ],
+    )
+    @action(methods=['GET'], detail=False)
+    def export(self, request, **kwargs):
+        export_format = get_export_format(request.query_params)
+        if not export_format:
+            return JsonResponse({"error": "export_format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        errors, data = self.controller.parse_request(BillListingReqSchema, qdict_to_dict(request.query_params))
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        errors, bills = self.controller.filter_bills(
+            organization_id=data.organization_id or user.organization.id,
+            user_id=data.user_id,
+            bill_place_id=data.bill_place_id,
+            discount_id=data.discount_id,
+            pay_type=data.pay_type,
+            is_active=data.is_active,
+            start_time=data.get_start_time(),
+            end_time=data.get_end_time(),
+            ordering=data.ordering,
+        )
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        return stream_export(bills, BILL_EXPORT_COLUMNS, export_format, 'bills')
 
     @extend_schema(
         description="Retrieve a specific Bill by ID.",
@@ -775,21 +1094,22 @@ class BillViewSet(viewsets.ViewSet):
                              description='Bill ID'),
         ],
     )
+    @conditional_detail(CacheKeys.BILL_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.BILL_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
 
             if not obj:
                 return JsonResponse({"error": "BILL with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -823,12 +1143,15 @@ class BillViewSet(viewsets.ViewSet):
         parameters=[
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int,
                              description='pk'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
     @action(methods=['GET'], detail=True)
     def bill_items(self, request, pk, *args, **kwargs):
         # Paginate queryset
         paginator = CustomPageNumberPagination()
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         page_key = request.query_params.get('page')
         locale = request.LANGUAGE_CODE
 
@@ -846,7 +1169,8 @@ class BillViewSet(viewsets.ViewSet):
             page = data
 
         # Serialize data
-        data = self.bill_item_controller.serialize_queryset(page, self.bill_item_serializer)
+        data = self.bill_item_controller.serialize_queryset(page, self.bill_item_serializer,
+                                                            fields=fields, expand=expand, normalize=normalize)
         result = paginator.get_paginated_response(data)
         return result
 
@@ -952,54 +1276,36 @@ class BillItemViewSet(viewsets.ViewSet):
                              description='SP status of the bill item'),
             OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=False, type=bool,
                              description='Active status of the bill item'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.BILL_ITEM_LIST, BillItemListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(BillItemListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-
-        cache_key = build_cache_key(
-            CacheKeys.BILL_ITEM_LIST,
+        errors, data = self.controller.filter_bill_items(
             bill_id=data.bill_id,
             fish_id=data.fish_id,
             fish_variant_id=data.fish_variant_id,
             is_SP=data.is_SP,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_bill_items(
-                bill_id=data.bill_id,
-                fish_id=data.fish_id,
-                fish_variant_id=data.fish_variant_id,
-                is_SP=data.is_SP,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=600)  # 10 minutes cache timeout
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
 
-        result = paginator.get_paginated_response(res)
-        return result
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="""
@@ -1014,6 +1320,7 @@ class BillItemViewSet(viewsets.ViewSet):
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.BILL_ITEM_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         """
         Serves GET requests for a particular Bill Item by ID.
@@ -1026,16 +1333,16 @@ class BillItemViewSet(viewsets.ViewSet):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.BILL_ITEM_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None  # Comment or remove this line if you want to use caching
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
                 return JsonResponse({"error": "Bill Item with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=600)  # 10 minutes cache timeout
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=600)  # 10 minutes cache timeout
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @action(methods=['POST'], detail=True)
@@ -1165,54 +1472,36 @@ class StockViewSet(viewsets.ViewSet):
                              description='fish_variant_id'),
             OpenApiParameter(name='is_SP', location=OpenApiParameter.QUERY, required=False, type=bool,
                              description='is_SP'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.STOCK_LIST, StockListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(StockListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
             return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-
-        cache_key = build_cache_key(
-            CacheKeys.STOCK_LIST,
+        errors, data = self.controller.filter_stocks(
             organization_id=data.organization_id or user.organization.id,
             place_id=data.place_id,
             fish_id=data.fish_id,
             fish_variant_id=data.fish_variant_id,
             is_SP=data.is_SP,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_stocks(
-                organization_id=data.organization_id or user.organization.id,
-                place_id=data.place_id,
-                fish_id=data.fish_id,
-                fish_variant_id=data.fish_variant_id,
-                is_SP=data.is_SP,
-                ordering=data.ordering,
-            )
-            if errors:
-                return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
+        if errors:
+            return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
 
-        result = paginator.get_paginated_response(res)
-        return result
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="Retrieve a particular stock entry by ID.",
@@ -1220,21 +1509,76 @@ class StockViewSet(viewsets.ViewSet):
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.STOCK_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.STOCK_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
-                return Response({"error": "Stock entry with this ID does not exist"},
-                                status=status.HTTP_404_NOT_FOUND)
+                return JsonResponse({"error": "Stock entry with this ID does not exist"},
+                                    status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
-        return Response(data=data, status=status.HTTP_200_OK)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
+        return JsonResponse(data=data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        description="Weight of a stock entry at a past point in time, rebuilt from the stock movement ledger.",
+        parameters=[
+            OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='pk'),
+            OpenApiParameter(name='at', location=OpenApiParameter.QUERY, required=True, type=str,
+                             description='Point in time, e.g. 2024-03-01T00:00:00Z'),
+        ],
+    )
+    @action(methods=['GET'], detail=True)
+    def weight_at(self, request, pk, *args, **kwargs):
+        errors, data = self.controller.parse_request(StockWeightAtReqSchema, qdict_to_dict(request.query_params))
+        if errors:
+            return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        stock = self.controller.get_instance_by_pk(pk=pk)
+        if not stock:
+            return Response({"error": "Stock entry with this ID does not exist"},
+                            status=status.HTTP_404_NOT_FOUND)
+        errors, weight = self.controller.get_stock_weight_at(stock, data.at)
+        if errors:
+            return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data={"id": stock.pk, "at": request.query_params.get('at'), "weight": f"{weight:.2f}"},
+                        status=status.HTTP_200_OK)
+
+    @extend_schema(
+        description="Stock totals in grams per place/fish/variant, summed across every weight unit.",
+        parameters=[
+            OpenApiParameter(name='organization_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='organization_id'),
+            OpenApiParameter(name='place_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='place_id'),
+            OpenApiParameter(name='fish_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='fish_id'),
+            OpenApiParameter(name='fish_variant_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='fish_variant_id'),
+            OpenApiParameter(name='is_SP', location=OpenApiParameter.QUERY, required=False, type=bool,
+                             description='is_SP'),
+        ],
+    )
+    @action(methods=['GET'], detail=False)
+    def totals(self, request, *args, **kwargs):
+        errors, data = self.controller.parse_request(StockListingReqSchema, qdict_to_dict(request.query_params))
+        if errors:
+            return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        errors, totals = self.controller.get_total_stock_weights(
+            organization_id=data.organization_id or request.user.organization.id,
+            place_id=data.place_id,
+            fish_id=data.fish_id,
+            fish_variant_id=data.fish_variant_id,
+            is_SP=data.is_SP,
+        )
+        if errors:
+            return Response(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data={"results": list(totals)}, status=status.HTTP_200_OK)
 
     @extend_schema(
         description="Serves POST requests to mark a particular stock as inactive.",
@@ -1350,59 +1694,82 @@ class ExpenseViewSet(viewsets.ViewSet):
             OpenApiParameter(name='start_time', location=OpenApiParameter.QUERY, required=False, type=str,
                              description='Start time for filtering'),
             OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
-                             description='End Time for filtering')
+                             description='End Time for filtering'),
+            *SPARSE_FIELDSET_PARAMETERS,
+            CURSOR_PAGINATION_PARAMETER,
         ],
     )
+    @cached_listing(CacheKeys.EXPENSE_LIST, ExpenseListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(ExpenseListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
-        paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        paginator = CustomPageNumberPagination(keyset_field='created_at')
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-
-        cache_key = build_cache_key(
-            CacheKeys.EXPENSE_LIST,
+        errors, data = self.controller.filter_expenses(
             organization_id=data.organization_id or user.organization.id,
             user_id=data.user_id,
             type_id=data.type_id,
             desc=data.desc,
-            start_time=data.start_time,
-            end_time=data.end_time,
+            start_time=data.get_start_time(),
+            end_time=data.get_end_time(),
             ordering=data.ordering,
-            is_active=data.is_active,
-            page=page_key,
-            locale=locale,
+            is_active=data.is_active
         )
-        instance = cache.get(cache_key)
-        instance = None
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_expenses(
-                organization_id=data.organization_id or user.organization.id,
-                user_id=data.user_id,
-                type_id=data.type_id,
-                desc=data.desc,
-                start_time=data.get_start_time(),
-                end_time=data.get_end_time(),
-                ordering=data.ordering,
-                is_active=data.is_active
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
 
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=600)  # 10 minutes cache timeout
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
-        result = paginator.get_paginated_response(res)
-        return result
+    @extend_schema(
+        description="Stream the expenses matching the list filters as CSV or NDJSON, without pagination",
+        parameters=[
+            EXPORT_FORMAT_PARAMETER,
+            OpenApiParameter(name='organization_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='organization_id'),
+            OpenApiParameter(name='user_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='user_id'),
+            OpenApiParameter(name='type_id', location=OpenApiParameter.QUERY, required=False, type=int,
+                             description='type_id'),
+            OpenApiParameter(name='desc', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='desc'),
+            OpenApiParameter(name='start_time', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='Start time for filtering'),
+            OpenApiParameter(name='end_time', location=OpenApiParameter.QUERY, required=False, type=str,
+                             description='End Time for filtering'),
+        ],
+    )
+    @action(methods=['GET'], detail=False)
+    def export(self, request, **kwargs):
+        export_format = get_export_format(request.query_params)
+        if not export_format:
+            return JsonResponse({"error": "export_format must be csv or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+        errors, data = self.controller.parse_request(ExpenseListingReqSchema, qdict_to_dict(request.query_params))
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        errors, expenses = self.controller.filter_expenses(
+            organization_id=data.organization_id or user.organization.id,
+            user_id=data.user_id,
+            type_id=data.type_id,
+            desc=data.desc,
+            start_time=data.get_start_time(),
+            end_time=data.get_end_time(),
+            ordering=data.ordering,
+            is_active=data.is_active
+        )
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        return stream_export(expenses, EXPENSE_EXPORT_COLUMNS, export_format, 'expenses')
 
     @extend_schema(
         description="""
@@ -1417,6 +1784,7 @@ class ExpenseViewSet(viewsets.ViewSet):
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.EXPENSE_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         """
         Serves GET requests for a particular expense by ID.
@@ -1429,16 +1797,16 @@ class ExpenseViewSet(viewsets.ViewSet):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.EXPENSE_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None  # Comment or remove this line if you want to use caching
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
                 return JsonResponse({"error": "Expense with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=600)  # 10 minutes cache timeout
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=600)  # 10 minutes cache timeout
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @action(methods=['POST'], detail=True)
@@ -2,6 +2,7 @@ from django.core.validators import RegexValidator
 from django.db import models
 
 from app.organizations.enums import PlaceType
+from app.utils.querysets import SignalingQuerySet
 
 
 class Organization(models.Model):
@@ -13,6 +14,8 @@ class Organization(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"id: {self.id}. {self.name}"
 
@@ -32,6 +35,8 @@ class Place(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"id: {self.id}. {self.name} [{self.mobile_no}]"
 
@@ -44,3 +49,5 @@ class ExpenseType(models.Model):
     # Moderation Fields
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = SignalingQuerySet.as_manager()
@@ -3,9 +3,10 @@ from rest_framework import serializers
 from app.organizations.enums import PlaceType
 from app.organizations.models import Organization, Place, ExpenseType
 from app.utils.helpers import get_serialized_enum
+from app.utils.serializers import IdentityMapSerializerMixin
 
 
-class OrganizationSerializer(serializers.ModelSerializer):
+class OrganizationSerializer(IdentityMapSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Organization
         fields = '__all__'
@@ -28,7 +29,7 @@ class OrganizationSerializer(serializers.ModelSerializer):
 #         fields = '__all__'
 
 
-class PlaceSerializer(serializers.ModelSerializer):
+class PlaceSerializer(IdentityMapSerializerMixin, serializers.ModelSerializer):
     type = serializers.SerializerMethodField()
     organization = OrganizationSerializer()
     center = serializers.SerializerMethodField()
@@ -36,8 +37,8 @@ class PlaceSerializer(serializers.ModelSerializer):
     def get_center(self, obj: Place):
         # Check if the 'center' field is not None
         if obj.center:
-            # Serialize the 'center' field using the same serializer (PlaceSerializer)
-            return PlaceSerializer(obj.center, context=self.context).data
+            # Serialize the 'center' field using the same serializer (PlaceSerializer), sharing the identity map
+            return PlaceSerializer(context=self.context).to_representation(obj.center)
         return None
 
     def get_type(self, obj: Place):
@@ -48,6 +49,10 @@ class PlaceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Place
         fields = '__all__'
+        # get_center renders the center with this serializer, let Controller.serialize_queryset load it
+        related_method_fields = {'center': 'self'}
+        # Method fields rendering an enum, precomputed by the compiled serializer
+        enum_fields = {'type': PlaceType}
 
 
 class ExpenseTypeSerializer(serializers.ModelSerializer):
@@ -1,5 +1,4 @@
 from django.core.cache import cache
-from django.http import JsonResponse
 from rest_framework import viewsets, status
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
 from rest_framework.decorators import action
@@ -13,8 +12,11 @@ from app.organizations.schemas import OrganizationCreationReqSchema, Organizatio
 from app.organizations.serializers import OrganizationSerializer, PlaceSerializer, ExpenseTypeSerializer
 from app.utils.authentication import IsOrganizationUser
 from app.utils.constants import Timeouts, CacheKeys
-from app.utils.helpers import build_cache_key, qdict_to_dict
+from app.utils.helpers import qdict_to_dict, get_sparse_fieldset, \
+    SPARSE_FIELDSET_PARAMETERS, is_normalized
 from app.utils.pagination import CustomPageNumberPagination
+from app.utils.renderers import JsonResponse
+from app.utils.response_cache import cache_detail, cached_listing, conditional_detail, get_evictions
 
 
 class OrganizationViewSet(viewsets.ViewSet):
@@ -100,8 +102,10 @@ class OrganizationViewSet(viewsets.ViewSet):
                              description='Name of the organization'),
             OpenApiParameter(name='is_active', location=OpenApiParameter.QUERY, required=False, type=bool,
                              description='Active status of the organization'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.ORGANIZATION_LIST, OrganizationListingReqSchema)
     def list(self, request, **kwargs):
         """
        Serves GET requests given on the entity API root path.
@@ -115,41 +119,25 @@ class OrganizationViewSet(viewsets.ViewSet):
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
-
-        cache_key = build_cache_key(
-            CacheKeys.ORGANIZATION_LIST,
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
+        # Get and Filter
+        errors, organizations = self.controller.filter_organization(
             name=data.name,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            errors, organizations = self.controller.filter_organization(
-                name=data.name,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(organizations, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(organizations, request)
+        if page is None:
+            page = data
+
+        # Serialize data
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="Retrieve a specific organization by ID",
@@ -158,6 +146,7 @@ class OrganizationViewSet(viewsets.ViewSet):
                              description='ID of the organization'),
         ],
     )
+    @conditional_detail(CacheKeys.ORGANIZATION_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         """
        Serves GET requests coming for a particular entity by id `pk`
@@ -168,19 +157,19 @@ class OrganizationViewSet(viewsets.ViewSet):
        :return:
        """
         locale = request.LANGUAGE_CODE
-        cache_key = CacheKeys.FISH_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
+        cache_key = CacheKeys.ORGANIZATION_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
 
             if not obj:
                 return JsonResponse({"error": "Organization with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -319,6 +308,7 @@ class PlaceViewSet(viewsets.ViewSet):
                              description='Center ID'),
         ]
     )
+    @cached_listing(CacheKeys.PLACE_LIST, PlaceListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(PlaceListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
@@ -326,47 +316,29 @@ class PlaceViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
         # organization_id = None  # You can set organization_id if required
-        cache_key = build_cache_key(
-            CacheKeys.PLACE_LIST,
+        # Get and Filter
+        errors, place_qs = self.controller.filter_places(
             organization_id=data.organization_id or user.organization.id,
             name=data.name,
             type=data.type,
             is_active=data.is_active,
             center_id=data.center_id,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            errors, place_qs = self.controller.filter_places(
-                organization_id=data.organization_id or user.organization.id,
-                name=data.name,
-                type=data.type,
-                is_active=data.is_active,
-                center_id=data.center_id,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(place_qs, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(place_qs, request)
+        if page is None:
+            page = data
+
+        # Serialize data
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
         # Implement filtering and pagination logic as needed
 
@@ -376,20 +348,21 @@ class PlaceViewSet(viewsets.ViewSet):
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='Place ID')
         ]
     )
+    @conditional_detail(CacheKeys.PLACE_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.PLACE_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
 
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             place_obj = self.controller.get_instance_by_pk(pk=pk)
             if not place_obj:
                 return JsonResponse({"error": "Place with this ID does not exist"}, status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(place_obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
 
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
@@ -405,6 +378,7 @@ class PlaceViewSet(viewsets.ViewSet):
         parameters=[
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int,
                              description='pk'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
     @action(methods=['POST'], detail=True)
@@ -438,6 +412,7 @@ class PlaceViewSet(viewsets.ViewSet):
         parameters=[
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int,
                              description='pk'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
     @action(methods=['GET'], detail=True)
@@ -453,6 +428,8 @@ class PlaceViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         page_key = request.query_params.get('page')
         locale = request.LANGUAGE_CODE
 
@@ -470,7 +447,8 @@ class PlaceViewSet(viewsets.ViewSet):
             page = data
 
         # Serialize data
-        data = self.controller.serialize_queryset(page, self.serializer)
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
         result = paginator.get_paginated_response(data)
         return result
 
@@ -559,50 +537,34 @@ class ExpenseTypeViewSet(viewsets.ViewSet):
                              description='is_active'),
             OpenApiParameter(name='organization_id', location=OpenApiParameter.QUERY, required=False, type=int,
                              description='organization_id'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.EXPENSE_TYPE_LIST, ExpenseTypeListingReqSchema)
     def list(self, request, **kwargs):
         errors, data = self.controller.parse_request(ExpenseTypeListingReqSchema, qdict_to_dict(request.query_params))
         if errors:
             return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
 
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-
-        cache_key = build_cache_key(
-            CacheKeys.EXPENSE_TYPE_LIST,
+        errors, data = self.controller.filter_expense_types(
             name=data.name,
             organization_id=data.organization_id or user.organization.id,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None  # Comment or remove this line if you want to use caching
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_expense_types(
-                name=data.name,
-                organization_id=data.organization_id or user.organization.id,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=600)  # 10 minutes cache timeout
-
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
+
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="Serves GET requests for a particular expense type by ID.",
@@ -610,20 +572,21 @@ class ExpenseTypeViewSet(viewsets.ViewSet):
             OpenApiParameter(name='pk', location=OpenApiParameter.PATH, required=True, type=int, description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.EXPENSE_TYPE_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.EXPENSE_TYPE_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None  # Comment or remove this line if you want to use caching
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
                 return JsonResponse({"error": "Expense type with this ID does not exist"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=600)  # 10 minutes cache timeout
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=600)  # 10 minutes cache timeout
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.6 on 2026-10-18 03:03
+
+import app.users.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0002_alter_user_designation_alter_user_email_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name="user",
+            managers=[
+                ("objects", app.users.models.UserManager()),
+            ],
+        ),
+    ]
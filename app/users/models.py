@@ -1,10 +1,15 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as AuthUserManager
 from django.core.validators import RegexValidator
 from django.db import models
 from django.urls import reverse
 
 from app.organizations.enums import PlaceType
 from app.users.enums import Designation
+from app.utils.querysets import SignalingQuerySet
+
+
+class UserManager(AuthUserManager.from_queryset(SignalingQuerySet)):
+    pass
 
 
 # Create your models here.
@@ -23,6 +28,8 @@ class User(AbstractUser):
                               on_delete=models.SET_NULL, related_name="users", blank=True, null=True)
     app_version_code = models.IntegerField(null=True, blank=True)
 
+    objects = UserManager()
+
     REQUIRED_FIELDS = []
 
     def __str__(self):
@@ -46,5 +53,7 @@ class Bluetooth(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = SignalingQuerySet.as_manager()
+
     def __str__(self):
         return f"id: {self.id}. name: {self.name} mac: {self.mac_address}] use: {self.user}"
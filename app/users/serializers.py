@@ -24,3 +24,5 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'mobile_no', 'email', 'designation',
                   'organization', 'place', 'is_active', 'last_login',
                   'date_joined')
+        # Method fields rendering an enum, precomputed by the compiled serializer
+        enum_fields = {'designation': Designation}
@@ -3,7 +3,6 @@ import random
 from django.conf import settings
 from django.contrib.auth import login, logout, get_user_model
 from django.core.cache import cache
-from django.http import JsonResponse
 from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter
@@ -22,8 +21,11 @@ from app.users.serializers import UserSerializer
 from app.utils.authentication import IsOrganizationAdminUser, IsOrganizationUser
 from app.utils.constants import Timeouts, CacheKeys, SMS
 from app.utils.helpers import mobile_number_validation_check, qdict_to_dict, \
-    generate_random_username, build_cache_key
+    generate_random_username, get_sparse_fieldset, SPARSE_FIELDSET_PARAMETERS, \
+    is_normalized
 from app.utils.pagination import CustomPageNumberPagination
+from app.utils.renderers import JsonResponse
+from app.utils.response_cache import cache_detail, cached_listing, conditional_detail, get_evictions
 
 User = get_user_model()
 
@@ -352,8 +354,10 @@ class UserViewSet(viewsets.ViewSet):
                              description='place_id'),
             OpenApiParameter(name='organization_id', location=OpenApiParameter.QUERY, required=False, type=int,
                              description='organization_id'),
+            *SPARSE_FIELDSET_PARAMETERS,
         ],
     )
+    @cached_listing(CacheKeys.USER_LIST, UserListingReqSchema)
     def list(self, request, **kwargs):
         """
         Serves GET requests given on the entity API root path.
@@ -369,46 +373,28 @@ class UserViewSet(viewsets.ViewSet):
 
         # Paginate queryset
         paginator = CustomPageNumberPagination()
-        page_key = request.query_params.get('page')
-        locale = request.LANGUAGE_CODE
+        fields, expand = get_sparse_fieldset(request.query_params)
+        normalize = is_normalized(request.query_params)
         user = request.user
-        cache_key = build_cache_key(
-            CacheKeys.USER_LIST,
+        # Get and Filter
+        errors, data = self.controller.filter_user(
             search_queries=data.search_query,
-            organization_id=data.organization_id or user.organization.id,
             designation=data.designation,
             place_id=data.place_id,
+            organization_id=data.organization_id or user.organization.id,
             is_active=data.is_active,
             ordering=data.ordering,
-            page=page_key,
-            locale=locale
         )
-        instance = cache.get(cache_key)
-        instance = None
-        # Get and Filter
-        if instance:
-            res = instance
-        else:
-            errors, data = self.controller.filter_user(
-                search_queries=data.search_query,
-                designation=data.designation,
-                place_id=data.place_id,
-                organization_id=data.organization_id or user.organization.id,
-                is_active=data.is_active,
-                ordering=data.ordering,
-            )
-            if errors:
-                return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
-            page = paginator.paginate_queryset(data, request)
-            if page is None:
-                page = data
-
-            # Serialize data
-            data = self.controller.serialize_queryset(page, self.serializer)
-            res = data
-            cache.set(cache_key, res, timeout=Timeouts.MINUTES_10)
-        result = paginator.get_paginated_response(res)
-        return result
+        if errors:
+            return JsonResponse(data=errors, status=status.HTTP_400_BAD_REQUEST)
+        page = paginator.paginate_queryset(data, request)
+        if page is None:
+            page = data
+
+        # Serialize data
+        data = self.controller.serialize_queryset(page, self.serializer, fields=fields, expand=expand,
+                                                  normalize=normalize)
+        return paginator.get_paginated_response(data)
 
     @extend_schema(
         description="""
@@ -424,6 +410,7 @@ class UserViewSet(viewsets.ViewSet):
                              description='pk'),
         ],
     )
+    @conditional_detail(CacheKeys.USER_DETAILS_BY_PK)
     def retrieve(self, request, pk, *args, **kwargs):
         """
         Serves GET requests coming for a particular entity by id `pk`
@@ -436,16 +423,16 @@ class UserViewSet(viewsets.ViewSet):
         locale = request.LANGUAGE_CODE
         cache_key = CacheKeys.USER_DETAILS_BY_PK.value.format(pk=pk, locale=locale)
         instance = cache.get(cache_key)
-        instance = None
-        if instance:
+        if instance is not None:
             data = instance
         else:
+            evictions = get_evictions()
             obj = self.controller.get_instance_by_pk(pk=pk)
             if not obj:
                 return JsonResponse({"error": "user with this id does not exists"},
                                     status=status.HTTP_404_NOT_FOUND)
             data = self.controller.serialize_one(obj, self.serializer)
-            cache.set(cache_key, data, timeout=Timeouts.MINUTES_10)
+            cache_detail(cache_key, self.serializer, data, evictions, timeout=Timeouts.MINUTES_10)
         return JsonResponse(data=data, status=status.HTTP_200_OK)
 
     @extend_schema(
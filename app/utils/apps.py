@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UtilsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app.utils'
+
+    def ready(self):
+        from app.utils.response_cache import connect_signals
+        connect_signals()
@@ -1,7 +1,20 @@
+from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission, IsAdminUser, IsAuthenticated
 
 from app.users.enums import Designation
+from app.utils.local_cache import prime_references
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication taking the organization and place of the user from the reference cache, so permission
+    checks and views reading them cost no query
+    """
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        return prime_references(user), token
 
 
 class IsOrganizationAdminUser(IsAuthenticated, IsAdminUser):
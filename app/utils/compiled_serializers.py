@@ -0,0 +1,210 @@
+"""
+Compiled serializers, the fast read path of Controller.serialize_queryset.
+
+A ModelSerializer's field map is compiled once into a list of columns and a plan to assemble them. Rows are
+then fetched with one values_list() query, nested to-one serializers becoming joins, and turned into dicts
+directly instead of binding a serializer to every object. Method fields listed in Meta.enum_fields are read
+from tables precomputed per language, Meta.related_method_fields cost one extra query per level. The output
+is the serializer's own; serializers rendering anything else (other method fields, properties, to-many
+relations) are not compiled and keep going through DRF.
+"""
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.utils import translation
+from rest_framework import serializers
+
+# Fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField, serializers.CharField, serializers.EmailField, serializers.IntegerField,
+)
+
+VALUE, NESTED, ENUM, LOOKUP = range(4)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class EnumTable:
+    """Representations of an enum method field for every value of the enum, computed once per language"""
+
+    def __init__(self, method, field_name, enum_class):
+        self.method = method
+        self.field_name = field_name
+        self.values = [None, *enum_class.values]
+        self.tables = {}
+
+    def render(self, value):
+        return self.method(SimpleNamespace(**{self.field_name: value}))
+
+    def get_table(self):
+        language = translation.get_language()
+        if language not in self.tables:
+            self.tables[language] = {value: self.render(value) for value in self.values}
+        return self.tables[language]
+
+
+class Node:
+    """Assembly plan of one serializer level: the index of its pk column and a step per rendered field"""
+    __slots__ = ('serializer_class', 'pk_index', 'steps')
+
+    def __init__(self, serializer_class, pk_index, steps):
+        self.serializer_class = serializer_class
+        self.pk_index = pk_index
+        self.steps = steps
+
+
+class CompiledSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+        self.columns = []
+
+    def compile(self):
+        self.root = self.compile_node(self.serializer_class(), '', self.model)
+
+    def add_column(self, path):
+        self.columns.append(path)
+        return len(self.columns) - 1
+
+    def compile_node(self, serializer, prefix, model):
+        serializer_class = type(serializer)
+        meta = serializer_class.Meta
+        if getattr(meta, 'model', None) is not model:
+            raise NotCompilable(f"{serializer_class.__name__} does not render {model.__name__}")
+        related_method_fields = getattr(meta, 'related_method_fields', {})
+        enum_fields = getattr(meta, 'enum_fields', {})
+
+        pk_index = self.add_column(prefix + model._meta.pk.name)
+        steps = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name in related_method_fields:
+                    child_class = related_method_fields[name]
+                    child_class = serializer_class if child_class == 'self' else child_class
+                    model_field = self.get_model_field(model, name)
+                    steps.append((name, LOOKUP, (self.add_column(prefix + model_field.attname),
+                                                 get_compiled_serializer(child_class))))
+                elif name in enum_fields:
+                    self.get_model_field(model, name)
+                    method = getattr(serializer, field.method_name)
+                    steps.append((name, ENUM, (self.add_column(prefix + name),
+                                               EnumTable(method, name, enum_fields[name]))))
+                else:
+                    raise NotCompilable(f"{serializer_class.__name__}.{name} is a method field")
+                continue
+
+            if isinstance(field, serializers.ListSerializer) or isinstance(field, serializers.ManyRelatedField):
+                raise NotCompilable(f"{serializer_class.__name__}.{name} is a to-many relation")
+            model_field = self.get_model_field(model, field.source)
+            if isinstance(field, serializers.BaseSerializer):
+                if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                    raise NotCompilable(f"{serializer_class.__name__}.{name} is not a forward relation")
+                child = self.compile_node(field, f"{prefix}{field.source}__", model_field.related_model)
+                steps.append((name, NESTED, child))
+            elif isinstance(field, serializers.RelatedField):
+                steps.append((name, VALUE, (self.add_column(prefix + model_field.attname), None)))
+            else:
+                if not model_field.concrete or model_field.is_relation:
+                    raise NotCompilable(f"{serializer_class.__name__}.{name} does not read a column")
+                convert = None if type(field) in PASSTHROUGH_FIELDS else field.to_representation
+                steps.append((name, VALUE, (self.add_column(prefix + field.source), convert)))
+        return Node(serializer_class, pk_index, steps)
+
+    def get_model_field(self, model, source):
+        try:
+            return model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise NotCompilable(f"{model.__name__}.{source} is not a model field")
+
+    def build(self, node, row, memo, pending):
+        pk = row[node.pk_index]
+        if pk is None:
+            return None
+        key = (node.serializer_class, pk)
+        if key in memo:
+            return memo[key]
+        data = memo[key] = {}
+        for name, kind, step in node.steps:
+            if kind == VALUE:
+                index, convert = step
+                value = row[index]
+                data[name] = value if convert is None or value is None else convert(value)
+            elif kind == NESTED:
+                data[name] = self.build(step, row, memo, pending)
+            elif kind == ENUM:
+                index, table = step
+                value = row[index]
+                rendered = table.get_table().get(value)
+                data[name] = rendered if rendered is not None else table.render(value)
+            else:
+                index, child = step
+                value = row[index]
+                data[name] = None
+                if value is not None:
+                    pending.append((data, name, child, value))
+        return data
+
+    def serialize(self, queryset):
+        """Serialize a queryset the way serializer_class(obj).data would for each object"""
+        memo = {}
+        pending = []
+        rows = queryset.select_related(None).prefetch_related(None).values_list(*self.columns)
+        data = [self.build(self.root, row, memo, pending)
+                for row in rows.iterator(chunk_size=settings.SERIALIZATION_CHUNK_SIZE)]
+        resolve_lookups(pending, memo)
+        return data
+
+
+def resolve_lookups(pending, memo):
+    """Fill in Meta.related_method_fields, one query per serializer and level"""
+    while pending:
+        missing = {}
+        for _, _, child, pk in pending:
+            if (child.serializer_class, pk) not in memo:
+                missing.setdefault(child, set()).add(pk)
+        next_pending = []
+        for child, pks in missing.items():
+            rows = child.model._base_manager.filter(pk__in=pks).values_list(*child.columns)
+            for row in rows:
+                child.build(child.root, row, memo, next_pending)
+        for data, name, child, pk in pending:
+            data[name] = memo.get((child.serializer_class, pk))
+        pending = next_pending
+
+
+_compiled = {}
+
+
+def get_compiled_serializer(serializer_class):
+    """
+    The CompiledSerializer of a serializer class, None when it can't be compiled. Compiled once per class;
+    a class referencing itself (Meta.related_method_fields = {...: 'self'}) gets the instance being compiled.
+    """
+    if serializer_class not in _compiled:
+        compiled = _compiled[serializer_class] = CompiledSerializer(serializer_class)
+        try:
+            compiled.compile()
+        except NotCompilable:
+            _compiled[serializer_class] = None
+            raise
+    compiled = _compiled[serializer_class]
+    if compiled is None:
+        raise NotCompilable(f"{serializer_class.__name__} is not compilable")
+    return compiled
+
+
+def serialize_compiled(obj_list, serializer_class):
+    """Serialize obj_list through the compiled path, None when it doesn't apply (not a queryset, not compilable)"""
+    if not isinstance(obj_list, QuerySet):
+        return None
+    try:
+        compiled = get_compiled_serializer(serializer_class)
+    except NotCompilable:
+        return None
+    return compiled.serialize(obj_list)
@@ -13,26 +13,24 @@ class Timeouts:
 
 
 class CacheKeys(Enum):
-    # LIST
-    USER_LIST = "user_list:{is_active}:{organization_id}:{place_id}:{designation}:{ordering}:{search_queries}:{page}:{locale}"
-    FISH_LIST = "fish_list:{organization_id}:{ordering}:{is_active}:{name}:{page}:{locale}"
-    FISH_VARIANT_LIST = "fish_variant_list:{fish_id}:{ordering}:{organization_id}:{is_active}:{name}:{page}:{locale}"
-    DISCOUNT_LIST = "discount_list:{organization_id}:{ordering}:{is_active}:{type}:{name}:{page}:{locale}"
-    PRICE_HISTORY_LIST = "price_history_list:{fish_id}:{fish_variant}:{user_id}:{ordering}:{page}:{locale}"
-    ORGANIZATION_LIST = "organization_list:{is_active}:{name}:{ordering}:{page}:{locale}"
-    PLACE_LIST = "place_list:{organization_id}:{ordering}:{is_active}:{type}:{center_id}:{name}:{page}:{locale}"
-    RECORD_LIST = "record_list:{organization_id}:{ordering}:{is_active}:{is_SP}:{start_time}:{end_time}:{user_id}:" \
-                  "{import_from_id}:{export_to_id}:{record_type}:{discount_id}:{fish_variant_id}" \
-                  ":{weigh_place_id}:{page}:{locale}"
-    EXPENSE_TYPE_LIST = "expense_type_list:{organization_id}:{ordering}:{is_active}:{page}:{name}:{locale}"
-    EXPENSE_LIST = "expense_list:{organization_id}:{is_active}:{ordering}:{type_id}:{start_time}:{end_time}:{user_id}:{desc}:{page}:{locale}"
-    BILL_LIST = "bill_list:{organization_id}:{ordering}:{is_active}:{user_id}:{bill_place_id}:" \
-                "{start_time}:{end_time}:{discount_id}:{pay_type}:{page}:{locale}"
-    BILL_ITEM_LIST = "bill_item_list:{bill_id}:{ordering}:{is_active}:{is_SP}:{fish_variant_id}:{page}:{locale}"
-    STOCK_LIST = "stock_list:{organization_id}:{ordering}:{place_id}:{fish_variant_id}:{is_SP}:{page}:{locale}"
+    # LIST, keyed on a digest of the parsed listing schema, see app.utils.response_cache.cached_listing
+    USER_LIST = "user_list:{digest}:{locale}"
+    FISH_LIST = "fish_list:{digest}:{locale}"
+    FISH_VARIANT_LIST = "fish_variant_list:{digest}:{locale}"
+    DISCOUNT_LIST = "discount_list:{digest}:{locale}"
+    PRICE_HISTORY_LIST = "price_history_list:{digest}:{locale}"
+    ORGANIZATION_LIST = "organization_list:{digest}:{locale}"
+    PLACE_LIST = "place_list:{digest}:{locale}"
+    RECORD_LIST = "record_list:{digest}:{locale}"
+    EXPENSE_TYPE_LIST = "expense_type_list:{digest}:{locale}"
+    EXPENSE_LIST = "expense_list:{digest}:{locale}"
+    BILL_LIST = "bill_list:{digest}:{locale}"
+    BILL_ITEM_LIST = "bill_item_list:{digest}:{locale}"
+    STOCK_LIST = "stock_list:{digest}:{locale}"
 
     # DETAILS
     USER_DETAILS_BY_PK = "user_details_by_pk:{pk}:{locale}"
+    ORGANIZATION_DETAILS_BY_PK = "organization_details_by_pk:{pk}:{locale}"
     FISH_DETAILS_BY_PK = "fish_details_by_pk:{pk}:{locale}"
     FISH_VARIANT_DETAILS_BY_PK = "fish_variant_details_by_pk:{pk}:{locale}"
     DISCOUNT_DETAILS_BY_PK = "discount_details_by_pk:{pk}:{locale}"
@@ -44,6 +42,25 @@ class CacheKeys(Enum):
     BILL_ITEM_DETAILS_BY_PK = "bill_item_details_by_pk:{pk}:{locale}"
     STOCK_DETAILS_BY_PK = "stock_details_by_pk:{pk}:{locale}"
 
+    # STOCK
+    SHARDED_STOCKS = "sharded_stocks:v2"
+
+    # RESPONSE CACHE INVALIDATION, see app.utils.response_cache
+    CACHE_GENERATION = "cache_generation:{family}:{scope}"
+    CACHE_DEPENDENTS = "cache_dependents:{family}:{pk}"
+    CACHE_EVICTIONS = "cache_evictions"
+    CACHE_EVICTED = "cache_evicted:{family}:{pk}"
+    CACHE_HIT_RATIOS = "cache_hit_ratios"
+    CACHE_VALIDATORS = "cache_validators:{key}"
+
+    # REFERENCE DATA, see app.utils.local_cache
+    REFERENCE_BY_PK = "reference_by_pk:{family}:{pk}"
+    REFERENCE_INVALIDATION = "reference_invalidation"
+
+    # IDEMPOTENCY
+    IDEMPOTENT_RESPONSE = "idempotent_response:{user_id}:{path}:{key}"
+    IDEMPOTENT_LOCK = "idempotent_lock:{user_id}:{path}:{key}"
+
 
 class SMS:
     OTP_LOGIN = "otp-{otp}"
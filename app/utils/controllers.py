@@ -1,9 +1,118 @@
+from functools import lru_cache
+
 from django.conf import settings
-from django.db import IntegrityError
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, models
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
 from django.utils import translation
 from pydantic import ValidationError
+from rest_framework import serializers
+from app.utils.compiled_serializers import serialize_compiled
 from app.utils.helpers import get_serialized_exception
+from app.utils.local_cache import prime_references
 from app.utils.schemas import BaseSchemaListingReqSchema
+from app.utils.serializers import IDENTITY_MAP, apply_sparse_fieldset, fields_are_default, normalize_representation
+
+
+@lru_cache(maxsize=None)
+def get_serializer_class_relations(serializer_class, followed=frozenset()):
+    """get_serializer_relations of a serializer class with its default fields, computed once per class"""
+    return get_serializer_relations(serializer_class(), followed)
+
+
+def get_serializer_relations(serializer, followed=frozenset()):
+    """
+    Relations rendered by a ModelSerializer instance, as a tree of {field: (related model, many, subtree,
+    queryset)}. Nested serializers are followed. A SerializerMethodField is followed only when the serializer
+    lists it in Meta.related_method_fields ({field: serializer class or 'self'}), and only once per path so
+    self-referencing serializers terminate. Relations rendered as primary keys only need prefetching when
+    they are to-many. queryset is the nested serializer's Meta.prefetch_queryset, a callable returning the
+    queryset its objects must be loaded with (e.g. to carry annotations), or None.
+    """
+    serializer_class = type(serializer)
+    meta = getattr(serializer_class, 'Meta', None)
+    model = getattr(meta, 'model', None)
+    if model is None:
+        return {}
+    related_method_fields = getattr(meta, 'related_method_fields', {})
+
+    relations = {}
+    for name, field in serializer.fields.items():
+        child = subtree = None
+        if isinstance(field, serializers.ListSerializer):
+            source, child = field.source, field.child
+        elif isinstance(field, serializers.BaseSerializer):
+            source, child = field.source, field
+        elif isinstance(field, serializers.SerializerMethodField) and name in related_method_fields:
+            if (serializer_class, name) in followed:
+                continue
+            source, child_class = name, related_method_fields[name]
+            child_class = serializer_class if child_class == 'self' else child_class
+            subtree = get_serializer_class_relations(child_class, followed | {(serializer_class, name)})
+        elif isinstance(field, serializers.ManyRelatedField):
+            source = field.source
+        else:
+            continue
+        if source == '*' or '.' in source:
+            continue
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+        many = model_field.one_to_many or model_field.many_to_many
+        if child is not None:
+            subtree = get_serializer_relations(child, followed)
+        queryset = getattr(getattr(child, 'Meta', None), 'prefetch_queryset', None)
+        relations[source] = (model_field.related_model, many, subtree or {}, queryset)
+    return relations
+
+
+def get_serializer_columns(serializer):
+    """
+    Model fields a serializer instance reads, for QuerySet.only(). None when some field reads anything other
+    than a model field of the same name (a property, an annotation), in which case nothing may be deferred.
+    """
+    model = type(serializer).Meta.model
+    columns = {model._meta.pk.name}
+    for name, field in serializer.fields.items():
+        source = name if isinstance(field, serializers.SerializerMethodField) else field.source
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return None
+        if model_field.concrete:
+            columns.add(model_field.name)
+    return columns
+
+
+def get_relation_lookups(relations, prefix=''):
+    """Flatten a relation tree into prefetch_related lookups, e.g. ['user', 'user__place', ...]"""
+    lookups = []
+    for name, (_, _, subtree, queryset) in relations.items():
+        if queryset is not None:
+            lookups.append(Prefetch(prefix + name, queryset=apply_relations(queryset(), subtree)))
+            continue
+        lookups.append(prefix + name)
+        lookups.extend(get_relation_lookups(subtree, prefix + name + '__'))
+    return lookups
+
+
+def apply_relations(queryset, relations, prefix=''):
+    """
+    select_related every to-one relation of the tree (one join chain per path). To-many relations, and
+    relations whose serializer asks for its own queryset, are prefetched with a queryset planned the same way.
+    """
+    for name, (related_model, many, subtree, related_queryset) in relations.items():
+        if many or related_queryset is not None:
+            related_queryset = related_queryset() if related_queryset else related_model._default_manager.all()
+            queryset = queryset.prefetch_related(
+                Prefetch(prefix + name, queryset=apply_relations(related_queryset, subtree))
+            )
+        else:
+            queryset = apply_relations(queryset.select_related(prefix + name), subtree, prefix + name + '__')
+    return queryset
 
 
 class Controller:
@@ -25,17 +134,60 @@ class Controller:
         except self.model.DoesNotExist as e:
             return None
 
-    def serialize_one(self, obj, serializer_override=None):
+    def serialize_one(self, obj, serializer_override=None, context=None):
         serializer_class = serializer_override
+        if context is None:
+            context = {IDENTITY_MAP: {}}
 
-        data = serializer_class(obj).data
+        if isinstance(obj, models.Model):
+            # Nested reference objects come from the local cache instead of a query each
+            prime_references(obj)
+        data = serializer_class(obj, context=context).data
         return data
 
-    def serialize_queryset(self, obj_list, serializer_override=None):
-        data = []
-        for obj in obj_list:
-            data.append(self.serialize_one(obj, serializer_override))
-        return data
+    def serialize_queryset(self, obj_list, serializer_override=None, fields=None, expand=None, normalize=False):
+        """
+        Serialize a list or queryset with one serializer instance, trimmed to the requested sparse fieldset
+        (see apply_sparse_fieldset), after loading everything it renders. With normalize the relations it
+        would nest are side-loaded instead and a NormalizedList is returned (see normalize_representation).
+        Querysets rendered in full go through the compiled serializer when it can render them. Querysets are
+        fetched settings.SERIALIZATION_CHUNK_SIZE rows at a time, so objects don't outlive their serialization.
+        """
+        if settings.COMPILED_SERIALIZERS and fields is None and expand is None and not normalize:
+            data = serialize_compiled(obj_list, serializer_override)
+            if data is not None:
+                return data
+        # One identity map for the whole list, so shared places/organizations are serialized once
+        serializer = serializer_override(context={IDENTITY_MAP: {}})
+        apply_sparse_fieldset(serializer, fields, expand)
+        obj_list = self.load_relations(obj_list, serializer, defer=fields is not None)
+        if normalize:
+            return normalize_representation(serializer, obj_list)
+        if isinstance(obj_list, QuerySet):
+            obj_list = obj_list.iterator(chunk_size=settings.SERIALIZATION_CHUNK_SIZE)
+        return [serializer.to_representation(obj) for obj in obj_list]
+
+    def load_relations(self, obj_list, serializer, defer=False):
+        """
+        Load everything the serializer will render up front, so serializing a page costs a fixed number of
+        queries instead of one per nested object. Querysets get select_related/prefetch_related (and only()
+        with the columns in use when defer is set); already evaluated lists get one prefetch query per
+        relation path.
+        """
+        if fields_are_default(serializer):
+            relations = get_serializer_class_relations(type(serializer))
+        else:
+            relations = get_serializer_relations(serializer)
+        if isinstance(obj_list, QuerySet):
+            columns = get_serializer_columns(serializer) if defer else None
+            if columns:
+                # Joins the listing queryset came with may traverse deferred columns; apply_relations
+                # re-adds the ones the trimmed serializer renders
+                obj_list = obj_list.select_related(None).prefetch_related(None).only(*columns)
+            return apply_relations(obj_list, relations)
+        if relations:
+            prefetch_related_objects(list(obj_list), *get_relation_lookups(relations))
+        return obj_list
 
     def make_inactive(self, obj):
         try:
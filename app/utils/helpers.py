@@ -1,15 +1,23 @@
+import functools
+import hashlib
 import re
 import uuid
 
 from decimal import Decimal
 
+from django.core.cache import cache
+from django.http import HttpResponse
 from django.utils import translation
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.response import Response
 
 from app.fish.enums import WeightUnit
 from app.logistics.enums import PayType, RecordType
 from app.organizations.enums import PlaceType
 from app.users.enums import Designation
 from app.utils.constants import CacheKeys, SMS
+from app.utils.renderers import JsonResponse
 
 import urllib.request
 import urllib.parse
@@ -20,7 +28,7 @@ import uuid
 from decimal import Decimal
 from urllib import request, parse
 from django.conf import settings
-from app.utils.constants import CacheKeys, SMS
+from app.utils.constants import CacheKeys, SMS, Timeouts
 from app.utils.serializers import EnumValueSerializer
 
 
@@ -81,6 +89,36 @@ def qdict_to_dict(qdict):
     return {k: v[0] if len(v) == 1 else v for k, v in qdict.lists()}
 
 
+SPARSE_FIELDSET_PARAMETERS = [
+    OpenApiParameter(name='fields', location=OpenApiParameter.QUERY, required=False, type=str,
+                     description='Comma separated fields to return, e.g. id,weight,created_at. All by default'),
+    OpenApiParameter(name='expand', location=OpenApiParameter.QUERY, required=False, type=str,
+                     description='Comma separated relations to return nested, dotted for deeper levels '
+                                 '(e.g. user,user.place). When given, other relations are returned as ids'),
+    OpenApiParameter(name='normalize', location=OpenApiParameter.QUERY, required=False, type=bool,
+                     description='Return relations as ids and every distinct related object once, '
+                                 'under included'),
+]
+
+
+def get_sparse_fieldset(query_params):
+    """
+    Parse ?fields=weight,created_at and ?expand=user,user.place into sorted lists, None when absent.
+    See app.utils.serializers.apply_sparse_fieldset.
+    """
+    def split(value):
+        if value is None:
+            return None
+        return sorted({part.strip() for part in value.split(',') if part.strip()})
+
+    return split(query_params.get('fields')), split(query_params.get('expand'))
+
+
+def is_normalized(query_params):
+    """?normalize=true, see Controller.serialize_queryset"""
+    return query_params.get('normalize') in ('1', 'true', 'True')
+
+
 def get_serialized_exception(e):
     """Serialize exception data into a dictionary."""
     return {
@@ -132,321 +170,57 @@ def build_cache_key(template_type: CacheKeys, **kwargs) -> str:
     return template_type.value.format(**formatted_args)
 
 
-def build_user_filter_cache_key(
-        search_queries: list[str] or None,
-        organization_id: int or None,
-        designation: list[int] or None,
-        place_id: list[int] or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "search_queries": "~".join(search_queries) if search_queries else "None",
-        "organization_id": organization_id if organization_id else "None",
-        "designation": "/".join(map(str, sorted(designation))) if designation else "None",
-        "place_id": "_".join(map(str, sorted(place_id))) if place_id else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.USER_LIST.format(**args)
-    return cache_key
-
-
-def build_fish_filter_cache_key(
-        name: str or None,
-        organization_id: int or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "name": name if name else "None",
-        "organization_id": organization_id if organization_id else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.FISH_LIST.format(**args)
-    return cache_key
-
-
-def build_fish_variant_filter_cache_key(
-        fish_id: int or None,
-        name: str or None,
-        organization_id: int or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "fish_id": fish_id if fish_id else "None",
-        "name": name if name else "None",
-        "organization_id": organization_id if organization_id else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.FISH_VARIANT_LIST.format(**args)
-    return cache_key
-
-
-def build_discount_filter_cache_key(
-        organization_id: int or None,
-        name: str or None,
-        type: int or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "type": type if type else "None",
-        "name": name if name else "None",
-        "organization_id": organization_id if organization_id else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.DISCOUNT_LIST.format(**args)
-    return cache_key
-
-
-def build_price_history_cache_key(
-        fish_id: int or None,
-        fish_variant_id: int or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "fish_id": fish_id if fish_id else "None",
-        "fish_variant_id": fish_variant_id if fish_variant_id else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.PRICE_HISTORY_LIST.format(**args)
-    return cache_key
-
-
-def build_place_filter_cache_key(
-        organization_id: int or None,
-        name: str or None,
-        type: int or None,
-        is_active: bool or None,
-        center_id: int or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "organization_id": organization_id if organization_id else "None",
-        "name": name if name else "None",
-        "type": type if type else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "center_id": center_id if center_id else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.PLACE_LIST.format(**args)
-    return cache_key
-
-
-def build_organization_filter_cache_key(
-        name: str or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "name": name if name else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.ORGANIZATION_LIST.format(**args)
-    return cache_key
-
-
-def build_record_filter_cache_key(
-        organization_id: int or None,
-        user_id: int or None,
-        import_from_id: int or None,
-        export_to_id: int or None,
-        record_type: int or None,
-        discount_id: int or None,
-        fish_variant_id: int or None,
-        weigh_place_id: int or None,
-        is_SP: bool or None,
-        is_active: bool or None,
-        start_time: str or None,
-        end_time: str or None,
-        ordering: str or None,
-        page: int or None,
-        locale: str,
-):
-    args = {
-        "organization_id": str(organization_id) if organization_id is not None else "None",
-        "user_id": str(user_id) if user_id is not None else "None",
-        "import_from_id": str(import_from_id) if import_from_id is not None else "None",
-        "export_to_id": str(export_to_id) if export_to_id is not None else "None",
-        "record_type": str(record_type) if record_type is not None else "None",
-        "discount_id": str(discount_id) if discount_id is not None else "None",
-        "fish_variant_id": str(fish_variant_id) if fish_variant_id is not None else "None",
-        "weigh_place_id": str(weigh_place_id) if weigh_place_id is not None else "None",
-        "is_SP": str(is_SP) if is_SP is not None else "None",
-        "is_active": str(is_active) if is_active is not None else "None",
-        "start_time": start_time if start_time is not None else "None",
-        "end_time": end_time if end_time is not None else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page is not None else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.RECORD_LIST.format(**args)
-    return cache_key
-
-
-def build_expense_filter_cache_key(
-        organization_id: int or None,
-        user_id: int or None,
-        type_id: int or None,
-        desc: str or None,
-        start_time: str or None,
-        end_time: str or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "organization_id": organization_id if organization_id else "None",
-        "user_id": user_id if user_id else "None",
-        "type_id": type_id if type_id else "None",
-        "desc": desc if desc else "None",
-        "start_time": start_time if start_time else "None",
-        "end_time": end_time if end_time else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.EXPENSE_LIST.format(**args)
-    return cache_key
-
-
-def build_expense_type_filter_cache_key(
-        name: str or None,
-        organization_id: int or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "name": name if name else "None",
-        "organization_id": organization_id if organization_id else "None",
-        "is_active": str(is_active) if is_active else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
 
-    cache_key = CacheKeys.EXPENSE_TYPE_LIST.format(**args)
-    return cache_key
-
-
-def build_bill_filter_cache_key(
-        organization_id: int or None,
-        user_id: int or None,
-        bill_place_id: int or None,
-        discount_id: int or None,
-        pay_type: int or None,
-        is_active: bool or None,
-        start_time: str or None,
-        end_time: str or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "organization_id": organization_id if organization_id else "None",
-        "user_id": user_id if user_id else "None",
-        "bill_place_id": bill_place_id if bill_place_id else "None",
-        "discount_id": discount_id if discount_id else "None",
-        "pay_type": str(pay_type) if pay_type else "None",
-        "is_active": str(is_active) if is_active is not None else "None",
-        "start_time": start_time if start_time else "None",
-        "end_time": end_time if end_time else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.BILL_LIST.format(**args)
-    return cache_key
-
-
-def build_bill_item_filter_cache_key(
-        bill_id: int or None,
-        fish_variant_id: int or None,
-        is_SP: bool or None,
-        is_active: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "bill_id": bill_id if bill_id else "None",
-        "fish_variant_id": fish_variant_id if fish_variant_id else "None",
-        "is_SP": str(is_SP) if is_SP is not None else "None",
-        "is_active": str(is_active) if is_active is not None else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
 
-    cache_key = CacheKeys.BILL_ITEM_LIST.format(**args)
-    return cache_key
-
-
-def build_stock_filter_cache_key(
-        organization_id: int or None,
-        place_id: int or None,
-        fish_variant_id: int or None,
-        is_SP: bool or None,
-        ordering: str or None,
-        page: int or None,
-        locale,
-):
-    args = {
-        "organization_id": organization_id if organization_id else "None",
-        "place_id": place_id if place_id else "None",
-        "fish_variant_id": fish_variant_id if fish_variant_id else "None",
-        "is_SP": str(is_SP) if is_SP is not None else "None",
-        "ordering": ordering if ordering else "None",
-        "page": str(page) if page else "None",
-        "locale": locale,
-    }
-
-    cache_key = CacheKeys.STOCK_LIST.value.format(**args)
-    return cache_key
+def idempotent(view_method):
+    """
+    Make a ViewSet write method safe to retry. When the request carries an Idempotency-Key header the first
+    successful response is stored in the cache, and replays of the same key get that stored response back
+    without the view (and the database) being touched again. Requests without the header are unaffected.
+    """
 
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        key_args = {"user_id": request.user.pk, "path": request.path, "key": key}
+        response_key = build_cache_key(CacheKeys.IDEMPOTENT_RESPONSE, **key_args)
+        lock_key = build_cache_key(CacheKeys.IDEMPOTENT_LOCK, **key_args)
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+
+        stored = cache.get(response_key)
+        if stored:
+            if stored['fingerprint'] != fingerprint:
+                return JsonResponse({"error": f"{IDEMPOTENCY_HEADER} was already used with a different payload"},
+                                    status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if 'data' in stored:
+                response = Response(data=stored['data'], status=stored['status'])
+            else:
+                response = HttpResponse(stored['content'], status=stored['status'],
+                                        content_type=stored['content_type'])
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        # add() only returns False when another request holds the lock; it returns None if redis is down
+        if cache.add(lock_key, fingerprint, timeout=Timeouts.MINUTES_2) is False:
+            return JsonResponse({"error": f"A request with this {IDEMPOTENCY_HEADER} is still in progress"},
+                                status=status.HTTP_409_CONFLICT)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                stored = {"fingerprint": fingerprint, "status": response.status_code}
+                if isinstance(response, Response):
+                    # DRF responses are only rendered after the view returns, so keep the data instead
+                    stored["data"] = response.data
+                else:
+                    stored["content"] = response.content
+                    stored["content_type"] = response['Content-Type']
+                cache.set(response_key, stored, timeout=Timeouts.HOUR_24)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
@@ -0,0 +1,194 @@
+"""
+In-process cache of reference data: the fish, fish variants, discounts, places, expense types and organizations
+read on nearly every request (the organization of the user in permission checks, the nested objects of a
+serialized detail) but written a few times a day.
+
+get_reference reads them from an LRU/TTL cache local to the process, then from redis, then from the database.
+Writes are seen by app.utils.response_cache, which deletes the redis entries of the objects a transaction wrote
+and publishes their keys once it commits; every process listens on that channel from a daemon thread and drops
+them. The local cache is only used while the listener is subscribed, and is cleared whenever it (re)subscribes,
+so invalidations missed while disconnected can't leave anything behind. Entries also expire after
+settings.LOCAL_CACHE_TIMEOUT, which bounds how stale a silently dropped subscription can leave them.
+"""
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from app.utils.constants import CacheKeys, Timeouts
+
+REFERENCE_FAMILIES = frozenset({
+    'fish.fish',
+    'fish.fishvariant',
+    'fish.discount',
+    'organizations.place',
+    'organizations.expensetype',
+    'organizations.organization',
+})
+
+# Seconds between attempts to resubscribe to the invalidation channel
+RESUBSCRIBE_DELAY = 1
+
+
+def is_reference_family(family):
+    return family in REFERENCE_FAMILIES
+
+
+def get_reference_key(family, pk):
+    return CacheKeys.REFERENCE_BY_PK.value.format(family=family, pk=pk)
+
+
+def get_invalidation_channel():
+    return cache.make_key(CacheKeys.REFERENCE_INVALIDATION.value)
+
+
+class LocalCache:
+    """
+    Thread-safe LRU cache with a TTL. Values are stored pickled so every reader gets its own copy. The epoch moves
+    on every deletion: a value read from redis or the database before a deletion is not stored after it.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.epoch = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, epoch):
+        value = pickle.dumps(value)
+        with self.lock:
+            if epoch != self.epoch:
+                return
+            self.entries[key] = (time.monotonic() + settings.LOCAL_CACHE_TIMEOUT, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.LOCAL_CACHE_MAX_ENTRIES:
+                self.entries.popitem(last=False)
+
+    def delete(self, keys):
+        with self.lock:
+            self.epoch += 1
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+
+
+local_cache = LocalCache()
+
+
+class InvalidationListener:
+    """Daemon thread dropping the keys published on the invalidation channel from local_cache, one per process"""
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+        self.subscribed = threading.Event()
+
+    def ensure_started(self):
+        # Threads don't survive a fork, so a forked worker starts its own
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.subscribed.clear()
+            local_cache.clear()
+            threading.Thread(target=self.listen, name='local-cache-invalidation', daemon=True).start()
+
+    def listen(self):
+        while True:
+            try:
+                pubsub = get_redis_connection('default').pubsub()
+                pubsub.subscribe(get_invalidation_channel())
+                for message in pubsub.listen():
+                    if message['type'] == 'subscribe':
+                        local_cache.clear()
+                        self.subscribed.set()
+                    elif message['type'] == 'message':
+                        local_cache.delete(json.loads(message['data']))
+            except RedisError:
+                pass
+            self.subscribed.clear()
+            local_cache.clear()
+            time.sleep(RESUBSCRIBE_DELAY)
+
+
+invalidation_listener = InvalidationListener()
+
+
+def get_reference(model, pk):
+    """
+    Instance of a reference model by pk, None when it doesn't exist. Every call returns a new instance. Inside
+    a transaction the caches are read but not filled, since what it reads may be rolled back.
+    """
+    key = get_reference_key(model._meta.label_lower, pk)
+    invalidation_listener.ensure_started()
+    use_local = invalidation_listener.subscribed.is_set()
+    if use_local:
+        instance = local_cache.get(key)
+        if instance is not None:
+            return instance
+        epoch = local_cache.epoch
+
+    fill = not transaction.get_connection().in_atomic_block
+    instance = cache.get(key)
+    if instance is None:
+        instance = model._base_manager.filter(pk=pk).first()
+        if instance is None:
+            return None
+        if fill:
+            cache.set(key, instance, timeout=Timeouts.MINUTES_10)
+    if use_local and fill:
+        local_cache.set(key, instance, epoch)
+    return instance
+
+
+def prime_references(instance, primed=None):
+    """
+    Fill the foreign keys of instance pointing to reference models, and theirs, with get_reference, so
+    accessing them costs no query. Relations already loaded are left alone.
+    """
+    primed = {} if primed is None else primed
+    for field in instance._meta.concrete_fields:
+        if not field.many_to_one and not field.one_to_one:
+            continue
+        family = field.related_model._meta.label_lower
+        pk = getattr(instance, field.attname)
+        if not is_reference_family(family) or pk is None or field.is_cached(instance):
+            continue
+        if (family, pk) not in primed:
+            related = primed[(family, pk)] = get_reference(field.related_model, pk)
+            if related is not None:
+                prime_references(related, primed)
+        if primed[(family, pk)] is not None:
+            field.set_cached_value(instance, primed[(family, pk)])
+    return instance
+
+
+def evict_references(keys, pipeline):
+    """Queue on pipeline the deletion of reference keys from redis, then from the local cache of every process"""
+    pipeline.delete(*(cache.make_key(key) for key in keys))
+    pipeline.publish(get_invalidation_channel(), json.dumps(keys))
@@ -0,0 +1,77 @@
+# description :- Times JSON encoding of list payloads with the configurable encoders against the stdlib path.
+# python manage.py benchmark_json
+# python manage.py benchmark_json --limit 2000 --repeat 20
+# --limit - records in the payloads (latest first)
+# --repeat - encodings per encoder, the best one is reported
+
+
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from app.logistics.controllers import RecordController
+from app.logistics.models import Record
+from app.logistics.serializers import RecordSerializer
+from app.utils.renderers import FastJSONRenderer, orjson_dumps, stdlib_dumps
+
+
+class Command(BaseCommand):
+    help = "Benchmark the JSON encoders of app.utils.renderers against django's JsonResponse and DRF's renderer"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='records in the payloads',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='encodings per encoder, the best one is reported',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Record.objects.order_by('-pk')[:options['limit']]
+        payloads = {
+            # What list endpoints render: strings, ints, nested dicts
+            'serialized records': RecordController().serialize_queryset(queryset.all(), RecordSerializer),
+            # Raw Decimal/datetime values, left to the encoder's default()
+            'record values': list(queryset.all().values()),
+        }
+        django_dumps = lambda data: json.dumps(data, cls=DjangoJSONEncoder).encode()
+        drf_render = JSONRenderer().render
+        # Each encoder is checked against the current encoder of its kind: JsonResponse or DRF Response
+        encoders = {
+            'django JsonResponse': (django_dumps, django_dumps),
+            'stdlib_dumps': (stdlib_dumps, django_dumps),
+            'orjson_dumps': (orjson_dumps, django_dumps),
+            'drf JSONRenderer': (drf_render, drf_render),
+            'FastJSONRenderer (settings)': (FastJSONRenderer().render, drf_render),
+        }
+
+        for payload_name, data in payloads.items():
+            baseline = None
+            self.stdout.write(f"{payload_name}: {len(data)} rows")
+            for encoder_name, (encode, reference) in encoders.items():
+                seconds, content = self.time_encoding(encode, data, options['repeat'])
+                baseline = baseline or seconds
+                same = json.loads(content) == json.loads(reference(data))
+                self.stdout.write(
+                    f"  {encoder_name}: {seconds * 1000:.2f}ms {len(content)} bytes "
+                    f"{baseline / seconds:.1f}x output: {'same' if same else 'DIFFERENT'}"
+                )
+
+    def time_encoding(self, encode, data, repeat):
+        """Best wall time of repeat encodings and the encoded content"""
+        best, content = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = encode(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, content
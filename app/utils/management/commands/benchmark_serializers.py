@@ -0,0 +1,98 @@
+# description :- Times list serialization through DRF and through the compiled serializers, checking both agree.
+# python manage.py benchmark_serializers
+# python manage.py benchmark_serializers --serializer app.logistics.serializers.RecordSerializer --limit 1000
+# --serializer - dotted path(s) of the serializer(s) to benchmark, every list serializer by default
+# --limit - objects serialized per run (latest first)
+# --repeat - runs per path, the best run is reported
+
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.module_loading import import_string
+
+from app.utils.compiled_serializers import NotCompilable, get_compiled_serializer
+from app.utils.controllers import Controller
+
+SERIALIZERS = [
+    'app.logistics.serializers.RecordSerializer',
+    'app.logistics.serializers.BillSerializer',
+    'app.logistics.serializers.BillItemSerializer',
+    'app.logistics.serializers.StockSerializer',
+    'app.logistics.serializers.ExpenseSerializer',
+    'app.fish.serializers.FishSerializer',
+    'app.fish.serializers.FishVariantSerializer',
+    'app.fish.serializers.DiscountSerializer',
+    'app.fish.serializers.PriceHistorySerializer',
+    'app.organizations.serializers.OrganizationSerializer',
+    'app.organizations.serializers.PlaceSerializer',
+    'app.organizations.serializers.ExpenseTypeSerializer',
+    'app.users.serializers.UserSerializer',
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark Controller.serialize_queryset with and without the compiled serializers"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--serializer',
+            nargs='+',
+            help='dotted path(s) of the serializer(s) to benchmark',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=500,
+            help='objects serialized per run',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='runs per path, the best one is reported',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for path in options['serializer'] or SERIALIZERS:
+            serializer_class = import_string(path)
+            try:
+                get_compiled_serializer(serializer_class)
+            except NotCompilable as e:
+                self.stdout.write(f"{serializer_class.__name__}: not compiled ({e})")
+                continue
+            queryset = serializer_class.Meta.model.objects.order_by('-pk')[:options['limit']]
+
+            with override_settings(COMPILED_SERIALIZERS=False):
+                drf_seconds, drf_data = self.time_serialization(queryset, serializer_class, options['repeat'])
+            with override_settings(COMPILED_SERIALIZERS=True):
+                compiled_seconds, compiled_data = self.time_serialization(queryset, serializer_class,
+                                                                          options['repeat'])
+
+            identical = json.dumps(drf_data, default=str) == json.dumps(compiled_data, default=str)
+            mismatches += not identical
+            speedup = drf_seconds / compiled_seconds if compiled_seconds else float('inf')
+            self.stdout.write(
+                f"{serializer_class.__name__}: {len(drf_data)} objects drf: {drf_seconds * 1000:.1f}ms "
+                f"compiled: {compiled_seconds * 1000:.1f}ms speedup: {speedup:.1f}x "
+                f"output: {'identical' if identical else 'DIFFERENT'}"
+            )
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"{mismatches} serializer(s) rendered different output"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Compiled output matches the serializers"))
+
+    def time_serialization(self, queryset, serializer_class, repeat):
+        """Best wall time of repeat runs, queries included, and the data of the last run"""
+        controller = Controller()
+        best, data = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = controller.serialize_queryset(queryset.all(), serializer_class)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
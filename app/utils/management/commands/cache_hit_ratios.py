@@ -0,0 +1,33 @@
+# description :- Prints the hit ratio of the list endpoint caches, counted by every process (see cached_listing).
+# python manage.py cache_hit_ratios
+# python manage.py cache_hit_ratios --reset
+# --reset - clear the counters after printing them
+
+
+from django.core.management.base import BaseCommand
+
+from app.utils.response_cache import get_hit_ratios, reset_hit_ratios
+
+
+class Command(BaseCommand):
+    help = "Print the hits, misses and hit ratio of every listing cache key template"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='clear the counters after printing them',
+        )
+
+    def handle(self, *args, **options):
+        ratios = get_hit_ratios()
+        if not ratios:
+            self.stdout.write("No listing cache lookups counted yet")
+        for name, (hits, misses) in sorted(ratios.items()):
+            total = hits + misses
+            self.stdout.write(f"{name}: {hits} hits {misses} misses {hits / total if total else 0:.1%}")
+        if options['reset']:
+            if reset_hit_ratios():
+                self.stdout.write("Counters reset")
+            else:
+                self.stderr.write("Could not reset the counters")
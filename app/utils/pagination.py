@@ -1,30 +1,148 @@
+import base64
+import binascii
+import json
 from collections import OrderedDict
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import exceptions
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+CURSOR_PAGINATION_PARAMETER = OpenApiParameter(
+    name='cursor', location=OpenApiParameter.QUERY, required=False, type=str,
+    description='Page by cursor instead of page number: empty for the first page, then the next/previous '
+                'links. Pages are ordered by created_at, descending unless ordering=created_at, and have no count. '
+                'Rejected when the listing is ordered by another field, as expenses are by default (expense_date): '
+                'pass ordering=-created_at or ordering=created_at there'
+)
 
 
 class CustomPageNumberPagination(PageNumberPagination):
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    invalid_cursor_ordering_message = 'Cursor pages are ordered by {field}; order by {field} or -{field} to use them'
+
+    def __init__(self, keyset_field=None):
+        # Listings passing the field they are created in order of can also be paged by ?cursor=
+        self.keyset_field = keyset_field
+        self.keyset = False
+
     def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_field and self.cursor_query_param in request.query_params:
+            return self.paginate_keyset(queryset, request)
         # Check if 'page' query parameter is set to 'all'
         if request.query_params.get('page', '').lower() == 'all':
-            # Indicate that all items should be returned
+            # Everything in one response, up to settings.PAGE_ALL_MAX_ROWS rows
             self.return_all = True
-            return list(queryset)  # Return a list to bypass further pagination processing
-        else:
-            self.return_all = False  # Normal pagination path
-            return super().paginate_queryset(queryset, request, view=view)
+            self.count = queryset.count()
+            return queryset[:settings.PAGE_ALL_MAX_ROWS]
+        self.return_all = False  # Normal pagination path
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        # Unlike PageNumberPagination, return the page unevaluated so that Controller.serialize_queryset
+        # can still add select_related/prefetch_related for the serializer before the query runs
+        return self.page.object_list
+
+    def paginate_keyset(self, queryset, request):
+        """
+        Keyset pagination on (keyset_field, pk). A page continues strictly after (or before) the row the cursor
+        points at, so deep pages cost the same as the first, rows inserted meanwhile don't shift pages and no
+        count query is made. The page is returned unevaluated, like the page number path.
+        """
+        self.keyset = True
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field = self.keyset_field
+        cursor = self.decode_cursor(request, queryset.model)
+
+        ordering = queryset.query.order_by
+        # Pages in another order than the same listing by page number would be a silent surprise
+        if ordering and ordering[0].lstrip('-') != field:
+            raise exceptions.ValidationError(
+                {self.cursor_query_param: self.invalid_cursor_ordering_message.format(field=field)})
+        descending = not (ordering and ordering[0] == field)
+        reverse = bool(cursor and cursor['reverse'])
+        sign = '-' if descending != reverse else ''
+        if cursor:
+            lookup = 'lt' if sign else 'gt'
+            queryset = queryset.filter(Q(**{f'{field}__{lookup}': cursor['value']}) |
+                                       Q(**{field: cursor['value'], f'pk__{lookup}': cursor['pk']}))
+        keys = list(queryset.order_by(f'{sign}{field}', f'{sign}pk').values_list(field, 'pk')[:self.page_size + 1])
+        has_more = len(keys) > self.page_size
+        keys = keys[:self.page_size]
+        if reverse:
+            keys.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if keys:
+            if has_more or reverse:
+                self.next_cursor = self.encode_cursor(*keys[-1], reverse=False)
+            if (has_more and reverse) or (cursor and not reverse):
+                self.previous_cursor = self.encode_cursor(*keys[0], reverse=True)
+        sign = '-' if descending else ''
+        return queryset.filter(pk__in=[pk for _, pk in keys]).order_by(f'{sign}{field}', f'{sign}pk')
+
+    def encode_cursor(self, value, pk, reverse):
+        position = {'value': value.isoformat(), 'pk': pk, 'reverse': reverse}
+        token = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request, model):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode()))
+            cursor['value'] = model._meta.get_field(self.keyset_field).to_python(cursor['value'])
+            cursor['pk'] = int(cursor['pk'])
+            cursor['reverse'] = bool(cursor['reverse'])
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
 
     def get_paginated_response(self, data):
+        if self.keyset:
+            response = Response(OrderedDict([
+                ('next', self.next_cursor),
+                ('previous', self.previous_cursor),
+                ('page_size', self.page_size),
+                ('results', data)
+            ]))
         # If all items are being returned, don't include pagination details
-        if getattr(self, 'return_all', False):
-            return Response(OrderedDict([
-                ('count', 1000),
+        elif getattr(self, 'return_all', False):
+            response = Response(OrderedDict([
+                ('count', self.count),
                 ('next', ''),
                 ('previous', ''),
-                ('page_size', self.page_size),
+                ('page_size', settings.PAGE_ALL_MAX_ROWS),
+                # More rows match than were returned, page (or export) to get them all
+                ('truncated', self.count > len(data)),
                 ('results', data)
             ]))
         else:
             # Normal paginated response
-            return super().get_paginated_response(data)
+            response = super().get_paginated_response(data)
+        # Normalized results (Controller.serialize_queryset(normalize=True)) side-load their related objects
+        included = getattr(data, 'included', None)
+        if included is not None:
+            response.data['included'] = included
+        return response
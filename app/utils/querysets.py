@@ -0,0 +1,65 @@
+"""
+QuerySet sending signals for the bulk writes Django sends none for, so the response cache can see every write
+(see app.utils.response_cache). Every model's manager is built from SignalingQuerySet.
+"""
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+from django.db.models import sql
+from django.dispatch import Signal
+
+# sender=model, pks=primary keys of the rows changed by update() or bulk_update() (which updates through
+# update()), using=database alias
+post_update = Signal()
+# sender=model, objs=objects inserted by bulk_create(), using=database alias
+post_bulk_create = Signal()
+
+
+class SignalingQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        connection = connections[self.db]
+        if (not post_update.has_listeners(self.model) or self.query.is_sliced or self.model._meta.parents
+                or not connection.features.can_return_columns_from_insert):
+            return self.select_and_update(**kwargs)
+        # UPDATE ... RETURNING reports the rows it changed without a separate SELECT of their pks
+        query = self.query.chain(sql.UpdateQuery)
+        query.add_update_values(kwargs)
+        # The backends supporting RETURNING don't order updates; annotations would end up in subqueries
+        query.order_by = ()
+        query.annotations = {}
+        try:
+            update_sql, params = query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return 0
+        if not update_sql:
+            return 0
+        update_sql = f"{update_sql} RETURNING {connection.ops.quote_name(self.model._meta.pk.column)}"
+        with transaction.mark_for_rollback_on_error(using=self.db), connection.cursor() as cursor:
+            cursor.execute(update_sql, params)
+            pks = [pk for pk, in cursor.fetchall()]
+        self._result_cache = None
+        if pks:
+            post_update.send(sender=self.model, pks=pks, using=self.db)
+        return len(pks)
+
+    update.alters_data = True
+
+    def select_and_update(self, **kwargs):
+        if not post_update.has_listeners(self.model):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Rows inserted concurrently between both statements are updated but not reported
+            pks = list(self.values_list('pk', flat=True))
+            rows = super().update(**kwargs)
+        if pks:
+            post_update.send(sender=self.model, pks=pks, using=self.db)
+        return rows
+
+    select_and_update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if objs:
+            post_bulk_create.send(sender=self.model, objs=objs, using=self.db)
+        return objs
+
+    bulk_create.alters_data = True
@@ -0,0 +1,66 @@
+"""
+JSON encoding of API responses. Both JsonResponse below and DRF responses (FastJSONRenderer) are encoded by
+the function settings.JSON_DUMPS points to, dumps(data, encoder_class) -> bytes:
+    orjson_dumps - orjson, handing the types it doesn't encode the same way to encoder_class.default
+    stdlib_dumps - json.dumps with encoder_class, compact
+encoder_class is DjangoJSONEncoder for JsonResponse and DRF's JSONEncoder for DRF responses, so Decimal,
+datetime and lazy translation strings render as they always have.
+"""
+import json
+from functools import lru_cache
+
+import orjson
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# datetimes go through encoder_class.default (millisecond precision, Z for UTC) like they did with json;
+# integer keys (NormalizedList.included) are allowed as json allows them
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+@lru_cache(maxsize=None)
+def get_encoder_default(encoder_class):
+    return encoder_class().default
+
+
+def orjson_dumps(data, encoder_class=DjangoJSONEncoder):
+    return orjson.dumps(data, default=get_encoder_default(encoder_class), option=ORJSON_OPTIONS)
+
+
+def stdlib_dumps(data, encoder_class=DjangoJSONEncoder):
+    return json.dumps(data, cls=encoder_class, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+@lru_cache(maxsize=None)
+def get_json_dumps(path):
+    return import_string(path)
+
+
+def json_dumps(data, encoder_class=DjangoJSONEncoder):
+    """Encode data with the function configured in settings.JSON_DUMPS"""
+    return get_json_dumps(settings.JSON_DUMPS)(data, encoder_class)
+
+
+class JsonResponse(HttpResponse):
+    """django.http.JsonResponse, encoded with json_dumps"""
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError("In order to allow non-dict objects to be serialized set the safe parameter to False.")
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=json_dumps(data, encoder), **kwargs)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """DRF's JSONRenderer encoding with json_dumps. Indented output (browsable API) is left to DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return json_dumps(data, self.encoder_class)
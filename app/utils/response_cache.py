@@ -0,0 +1,600 @@
+"""
+Invalidation-aware response cache.
+
+Listings are generation-versioned. Every model family (a model label, e.g. logistics.record) has generation
+counters in the cache: one per organization, '*' for writes whose organization can't be told, and 'any' which
+every write bumps. The key of a cached listing embeds the generations of every model its serializer renders,
+read in the scope of the organization it lists, so a write makes the listings it affects unreachable instead
+of having to find them; they expire with their timeout.
+
+Details are evicted precisely. A cached detail is registered in the dependents set of every object it renders
+(itself included, whatever the locale), and a write deletes the dependents of the objects it touched. Every
+such eviction is numbered and stamps the objects it evicted with its number; a detail read from the database
+before an eviction of anything it renders (see get_evictions) is not cached after it.
+
+Writes are seen through post_save/post_delete and the post_update/post_bulk_create signals of
+app.utils.querysets, for every model; raw SQL writers call invalidate_pks. The invalidations of a transaction
+are collected and sent to Redis in one pipeline once it commits, along with the eviction of the reference objects
+they wrote from every process (see app.utils.local_cache).
+
+List endpoints are cached by the cached_listing decorator, which also counts hits and misses per key template.
+
+Both answer conditional GETs without serializing anything. A listing's ETag is its versioned cache key and its
+Last-Modified the latest of its generations, which are the time of the last write they count. A detail's ETag
+is the hash of its JSON and its Last-Modified the time it was cached, kept next to the entry and evicted with it.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from functools import lru_cache, wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import IntegerField, Value
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from app.utils.constants import CacheKeys, Timeouts
+from app.utils.controllers import Controller, get_serializer_class_relations
+from app.utils.helpers import build_cache_key, qdict_to_dict
+from app.utils.local_cache import evict_references, get_reference, get_reference_key, is_reference_family, \
+    local_cache
+from app.utils.querysets import post_bulk_create, post_update
+from app.utils.renderers import json_dumps
+
+logger = logging.getLogger(__name__)
+
+ANY_ORGANIZATION = 'any'
+UNKNOWN_ORGANIZATION = '*'
+
+# Lookup of the organization id of models without an organization field
+ORGANIZATION_LOOKUPS = {
+    'organizations.organization': 'pk',
+    'fish.fishvariant': 'fish__organization_id',
+    'fish.pricehistory': 'fish_variant__fish__organization_id',
+    'logistics.billitem': 'bill__organization_id',
+    'logistics.stock': 'place__organization_id',
+}
+
+# Families computed from other models, as [(source family, foreign key of the source to it)], e.g. the weight
+# and item_count of bills are summed from their bill items
+DERIVED_FROM = {
+    'logistics.bill': [('logistics.billitem', 'bill')],
+}
+
+# Query parameters shaping a listing response besides the filters of its schema
+LISTING_RESPONSE_PARAMS = ('page', 'cursor', 'fields', 'expand', 'normalize')
+
+# Sets every generation in KEYS to the time ARGV[1], or one above its current value if that isn't lower
+BUMP_GENERATIONS_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    local generation = tonumber(redis.call('GET', key)) or 0
+    redis.call('SET', key, string.format('%d', math.max(generation + 1, tonumber(ARGV[1]))))
+end
+return #KEYS
+"""
+
+# Numbers an eviction with the counter KEYS[1], then for every (dependents set, eviction stamp) pair in the rest
+# of KEYS deletes the members of the set and the set, and stamps the object with the eviction for ARGV[1] seconds
+EVICT_DEPENDENTS_SCRIPT = """
+local eviction = redis.call('INCR', KEYS[1])
+for k = 2, #KEYS, 2 do
+    local members = redis.call('SMEMBERS', KEYS[k])
+    for i = 1, #members, 1000 do
+        redis.call('DEL', unpack(members, i, math.min(i + 999, #members)))
+    end
+    redis.call('DEL', KEYS[k])
+    redis.call('SET', KEYS[k + 1], eviction, 'EX', ARGV[1])
+end
+return eviction
+"""
+
+# Unless one of the eviction stamps in KEYS[3], KEYS[5]... is above the eviction ARGV[1], sets the entry KEYS[1]
+# to ARGV[3] and its validators KEYS[2] to ARGV[4], and adds both to the dependents sets KEYS[4], KEYS[6]...,
+# all for ARGV[2] seconds
+CACHE_DETAIL_SCRIPT = """
+for k = 3, #KEYS, 2 do
+    local evicted = tonumber(redis.call('GET', KEYS[k]))
+    if evicted and evicted > tonumber(ARGV[1]) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[3], 'EX', ARGV[2])
+redis.call('SET', KEYS[2], ARGV[4], 'EX', ARGV[2])
+for k = 4, #KEYS, 2 do
+    redis.call('SADD', KEYS[k], KEYS[1], KEYS[2])
+    redis.call('EXPIRE', KEYS[k], ARGV[2])
+end
+return 1
+"""
+
+
+def get_model_family(model):
+    return model._meta.label_lower
+
+
+@lru_cache(maxsize=None)
+def get_derived_families(family):
+    """Families derived from a family, as [(derived family, foreign key to it)]"""
+    return [(derived, foreign_key) for derived, sources in DERIVED_FROM.items()
+            for source, foreign_key in sources if source == family]
+
+
+@lru_cache(maxsize=None)
+def get_serializer_families(serializer_class):
+    """Model families a serializer class renders: its model, the models it nests and what those derive from"""
+    families = {get_model_family(serializer_class.Meta.model)}
+
+    def add_relations(relations):
+        for related_model, _, subtree, _ in relations.values():
+            families.add(get_model_family(related_model))
+            add_relations(subtree)
+
+    add_relations(get_serializer_class_relations(serializer_class))
+    for family in list(families):
+        families.update(source for source, _ in DERIVED_FROM.get(family, ()))
+    return tuple(sorted(families))
+
+
+def get_generation_key(family, scope):
+    return CacheKeys.CACHE_GENERATION.value.format(family=family, scope=scope)
+
+
+def get_dependents_key(family, pk):
+    return CacheKeys.CACHE_DEPENDENTS.value.format(family=family, pk=pk)
+
+
+def get_evicted_key(family, pk):
+    return CacheKeys.CACHE_EVICTED.value.format(family=family, pk=pk)
+
+
+def get_validators_key(cache_key):
+    return CacheKeys.CACHE_VALIDATORS.value.format(key=cache_key)
+
+
+def new_generation():
+    # Microseconds: a counter lost to eviction restarts above any value it reached, so entries keyed on it never
+    # come back, and a generation tells when it was last bumped
+    return time.time_ns() // 1000
+
+
+def get_generations(families, organization_id=None):
+    """
+    Current generations of model families, as seen by entries of one organization (every organization when
+    organization_id is None). Missing counters are started. None when the cache can't be reached (the cache
+    client ignores its errors): nothing versioned on them may then be read from or written to the cache.
+    """
+    scopes = (ANY_ORGANIZATION,) if organization_id is None else (organization_id, UNKNOWN_ORGANIZATION)
+    keys = [get_generation_key(family, scope) for family in families for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            generation = new_generation()
+            generations[key] = generation if cache.add(key, generation, timeout=None) else cache.get(key)
+            if generations[key] is None:
+                return None
+    return [generations[key] for key in keys]
+
+
+def versioned_cache_key(cache_key, generations):
+    return f"{cache_key}:{'.'.join(map(str, generations))}"
+
+
+def get_etag(content):
+    return quote_etag(hashlib.blake2b(content, digest_size=16).hexdigest())
+
+
+def set_validators(response, etag, last_modified=None):
+    """Set the ETag and Last-Modified (timestamp) of response, which clients must revalidate before reusing"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def get_not_modified(request, etag, last_modified):
+    """304 response when the conditional headers of request match the validators, else None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return None if response is None else set_validators(response, etag, last_modified)
+
+
+def is_conditional(request):
+    return 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+
+
+class HitCounter:
+    """
+    Listing cache hits and misses per key template, added to a redis hash every CACHE_STATS_FLUSH_INTERVAL.
+    Counts that can't be flushed are dropped: they must never fail the request that counted them.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def count(self, template, hit):
+        with self.lock:
+            self.counts[(template.name, 'hits' if hit else 'misses')] += 1
+            if time.monotonic() - self.flushed_at < settings.CACHE_STATS_FLUSH_INTERVAL:
+                return
+            counts, self.counts = self.counts, Counter()
+            self.flushed_at = time.monotonic()
+        self.flush(counts)
+
+    def flush(self, counts):
+        pipeline = get_redis_connection('default').pipeline(transaction=False)
+        stats_key = cache.make_key(CacheKeys.CACHE_HIT_RATIOS.value)
+        for (name, outcome), value in counts.items():
+            pipeline.hincrby(stats_key, f"{name}:{outcome}", value)
+        try:
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Could not flush listing cache hit counts", exc_info=True)
+
+
+hit_counter = HitCounter()
+
+
+def get_hit_ratios():
+    """{template name: (hits, misses)} counted by every process, as last flushed; empty when Redis is down"""
+    try:
+        stats = get_redis_connection('default').hgetall(cache.make_key(CacheKeys.CACHE_HIT_RATIOS.value))
+    except RedisError:
+        logger.warning("Could not read listing cache hit counts", exc_info=True)
+        return {}
+    ratios = {}
+    for field, value in stats.items():
+        name, outcome = field.decode().rsplit(':', 1)
+        hits, misses = ratios.get(name, (0, 0))
+        ratios[name] = (hits + int(value), misses) if outcome == 'hits' else (hits, misses + int(value))
+    return ratios
+
+
+def reset_hit_ratios():
+    """Clear the counts of every process, return whether it could"""
+    try:
+        get_redis_connection('default').delete(cache.make_key(CacheKeys.CACHE_HIT_RATIOS.value))
+    except RedisError:
+        logger.warning("Could not reset listing cache hit counts", exc_info=True)
+        return False
+    return True
+
+
+def get_listing_digest(request, data):
+    """Digest of what a listing response depends on: its parsed filters, page, representation and organization"""
+    params = {param: request.query_params.get(param) for param in LISTING_RESPONSE_PARAMS}
+    key_data = {'filters': data.dict(), 'params': params, 'organization_id': request.user.organization_id}
+    key_json = json.dumps(key_data, sort_keys=True, default=str)
+    return hashlib.blake2b(key_json.encode(), digest_size=16).hexdigest()
+
+
+def cached_listing(template, schema, timeout=Timeouts.MINUTES_10, serializer_attr='serializer'):
+    """
+    Cache the paginated responses of a ViewSet list method, keyed on a digest of the request parsed with schema
+    and versioned on the generations of what the serializer renders (in the listed organization when the schema
+    filters on one), and answer conditional GETs from the generations alone. Requests the schema rejects, and every
+    request while the cache can't be reached, are left to the view.
+    :param template: CacheKeys template with {digest} and {locale}
+    :param serializer_attr: ViewSet attribute holding the serializer class of the listing
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            errors, data = Controller().parse_request(schema, qdict_to_dict(request.query_params))
+            if errors:
+                return view_method(self, request, *args, **kwargs)
+
+            organization_id = None
+            if 'organization_id' in schema.__fields__:
+                organization_id = data.organization_id or request.user.organization_id
+            cache_key = build_cache_key(template, digest=get_listing_digest(request, data),
+                                        locale=request.LANGUAGE_CODE)
+            generations = get_generations(get_serializer_families(getattr(self, serializer_attr)), organization_id)
+            if generations is None:
+                # Served uncached and without validators until the cache is back
+                return view_method(self, request, *args, **kwargs)
+            cache_key = versioned_cache_key(cache_key, generations)
+            etag, last_modified = get_etag(cache_key.encode()), max(generations) // 10 ** 6
+            not_modified = get_not_modified(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            cached = cache.get(cache_key)
+            hit_counter.count(template, cached is not None)
+            if cached is not None:
+                return set_validators(Response(cached), etag, last_modified)
+            response = view_method(self, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, response.data, timeout=timeout)
+                set_validators(response, etag, last_modified)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def get_rendered_objects(data, serializer_class):
+    """(family, pk) of every object in the representation of a serializer_class: the object and what it nests"""
+    objects = set()
+    serializers_by_class = {}
+
+    def add_object(data, serializer):
+        model = type(serializer).Meta.model
+        pk = data.get(model._meta.pk.name) if isinstance(data, dict) else None
+        if pk is None or (get_model_family(model), pk) in objects:
+            return
+        objects.add((get_model_family(model), pk))
+        related_method_fields = getattr(type(serializer).Meta, 'related_method_fields', {})
+        for name, field in serializer.fields.items():
+            value = data.get(name)
+            if value is None:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                child = field.child
+            elif isinstance(field, serializers.BaseSerializer):
+                child = field
+            elif isinstance(field, serializers.SerializerMethodField) and name in related_method_fields:
+                child_class = related_method_fields[name]
+                child_class = type(serializer) if child_class == 'self' else child_class
+                if child_class not in serializers_by_class:
+                    serializers_by_class[child_class] = child_class()
+                child = serializers_by_class[child_class]
+            else:
+                continue
+            for item in (value if isinstance(value, list) else [value]):
+                add_object(item, child)
+
+    add_object(data, serializer_class())
+    return objects
+
+
+def get_evictions():
+    """Number of the last detail eviction, to read before querying what cache_detail is given"""
+    return cache.get(CacheKeys.CACHE_EVICTIONS.value, 0)
+
+
+def cache_detail(cache_key, serializer_class, data, evictions, timeout):
+    """
+    Cache the detail representation data of serializer_class, evicted as soon as the object or anything it
+    nests is written, with its validators (see conditional_detail). Nothing is cached when one of them was
+    evicted since evictions, the get_evictions() read before querying data: data may predate that write.
+    The entry is written and registered atomically. Like the cache API, it gives up (logging why) when Redis
+    can't be reached.
+    """
+    keys = [cache.make_key(cache_key), cache.make_key(get_validators_key(cache_key))]
+    for family, pk in get_rendered_objects(data, serializer_class):
+        keys.extend([cache.make_key(get_evicted_key(family, pk)), cache.make_key(get_dependents_key(family, pk))])
+    # The ETag of the JsonResponse of data
+    validators = {'etag': get_etag(json_dumps(data)), 'last_modified': int(time.time())}
+    # Detail timeouts are the same everywhere, so the sets outlive their members
+    args = [evictions, timeout, cache.client.encode(data), cache.client.encode(validators)]
+    try:
+        get_redis_connection('default').eval(CACHE_DETAIL_SCRIPT, len(keys), *keys, *args)
+    except RedisError:
+        logger.warning("Could not cache %s", cache_key, exc_info=True)
+
+
+def conditional_detail(template):
+    """
+    Answer conditional GETs of a ViewSet retrieve method caching its responses under template (with {pk} and
+    {locale}) from the validators of the cached entry, and set the validators of its responses
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            cache_key = build_cache_key(template, pk=kwargs['pk'], locale=request.LANGUAGE_CODE)
+            validators = None
+            if is_conditional(request):
+                validators = cache.get(get_validators_key(cache_key))
+                if validators is not None:
+                    not_modified = get_not_modified(request, validators['etag'], validators['last_modified'])
+                    if not_modified is not None:
+                        return not_modified
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK or isinstance(response, Response):
+                return response
+            if validators is None:
+                validators = cache.get(get_validators_key(cache_key))
+            last_modified = None if validators is None else validators['last_modified']
+            return set_validators(response, get_etag(response.content), last_modified)
+
+        return wrapper
+
+    return decorator
+
+
+class InvalidationBatch:
+    """Invalidations of one transaction, sent to Redis in a single pipeline when it commits"""
+
+    def __init__(self):
+        self.generation_keys = set()
+        self.objects = set()
+
+    def add(self, family, pk, organization_id):
+        scope = UNKNOWN_ORGANIZATION if organization_id is None else organization_id
+        self.generation_keys.add(get_generation_key(family, ANY_ORGANIZATION))
+        self.generation_keys.add(get_generation_key(family, scope))
+        self.objects.add((family, pk))
+
+    def is_registered(self, connection):
+        # Hooks are (savepoint ids, callable, robust); a rollback drops them
+        return any(hook[1] == self.flush for hook in connection.run_on_commit)
+
+    def flush(self):
+        client = get_redis_connection('default')
+        pipeline = client.pipeline(transaction=False)
+        if self.generation_keys:
+            keys = [cache.make_key(key) for key in self.generation_keys]
+            # EVAL rather than registered scripts, which would cost a SCRIPT EXISTS round trip
+            pipeline.eval(BUMP_GENERATIONS_SCRIPT, len(keys), *keys, new_generation())
+        if self.objects:
+            keys = [cache.make_key(CacheKeys.CACHE_EVICTIONS.value)]
+            for family, pk in self.objects:
+                keys.extend([cache.make_key(get_dependents_key(family, pk)),
+                             cache.make_key(get_evicted_key(family, pk))])
+            # Stamps outlive the longest a detail can take to be read and cached
+            pipeline.eval(EVICT_DEPENDENTS_SCRIPT, len(keys), *keys, Timeouts.MINUTES_10)
+        reference_keys = [get_reference_key(family, pk) for family, pk in self.objects
+                          if is_reference_family(family)]
+        if reference_keys:
+            evict_references(reference_keys, pipeline)
+        try:
+            pipeline.execute()
+        except RedisError:
+            # What was cached stays reachable until it expires
+            logger.error("Could not invalidate %s", sorted(self.objects), exc_info=True)
+        if reference_keys:
+            # Once redis no longer has them, so they can't be read back; the broadcast evicts them here too, later
+            local_cache.delete(reference_keys)
+
+
+def get_batch(using=None):
+    """Batch of the current transaction, None outside of one"""
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        return None
+    batch = getattr(connection, 'invalidation_batch', None)
+    if batch is None or not batch.is_registered(connection):
+        batch = connection.invalidation_batch = InvalidationBatch()
+        transaction.on_commit(batch.flush, using=using, robust=True)
+    return batch
+
+
+def invalidate(model, rows, using=None):
+    """
+    Invalidate the cached responses rendering the given rows of model, and those of the objects derived from
+    them, once the current transaction commits
+    :param rows: iterable of (pk, organization id or None, {foreign key attname: value})
+    """
+    batch = get_batch(using)
+    flush = batch is None
+    if flush:
+        batch = InvalidationBatch()
+    family = get_model_family(model)
+    derived = [(derived_family, model._meta.get_field(foreign_key).attname)
+               for derived_family, foreign_key in get_derived_families(family)]
+    for pk, organization_id, foreign_keys in rows:
+        batch.add(family, pk, organization_id)
+        for derived_family, attname in derived:
+            if foreign_keys.get(attname) is not None:
+                batch.add(derived_family, foreign_keys[attname], organization_id)
+    if flush:
+        batch.flush()
+
+
+@lru_cache(maxsize=None)
+def get_organization_lookup(model):
+    """Lookup of the organization id of model, None when it has none"""
+    family = get_model_family(model)
+    if family in ORGANIZATION_LOOKUPS:
+        return ORGANIZATION_LOOKUPS[family]
+    return 'organization_id' if any(field.name == 'organization' for field in model._meta.fields) else None
+
+
+def get_foreign_key_attnames(model):
+    return [model._meta.get_field(foreign_key).attname
+            for _, foreign_key in get_derived_families(get_model_family(model))]
+
+
+def get_organization_ids(model, instances):
+    """
+    Organization id of each instance of model, None when unknown. Relations already loaded on the instances are
+    read in memory, reference objects come from the reference cache and the rest takes one query per relation
+    hop for the whole batch, never one per instance.
+    """
+    lookup = get_organization_lookup(model)
+    if lookup is None:
+        return [None] * len(instances)
+    if lookup == 'pk':
+        return [instance.pk for instance in instances]
+    name, _, rest = lookup.partition('__')
+    field = model._meta.get_field(name)
+    if not field.is_relation or name == field.attname:
+        return [getattr(instance, field.attname) for instance in instances]
+
+    organization_ids = [None] * len(instances)
+    loaded, pending = [], []
+    for i, instance in enumerate(instances):
+        if field.is_cached(instance) and field.get_cached_value(instance) is not None:
+            loaded.append(i)
+        else:
+            pending.append(i)
+    loaded_ids = get_organization_ids(field.related_model, [field.get_cached_value(instances[i]) for i in loaded])
+    for i, organization_id in zip(loaded, loaded_ids):
+        organization_ids[i] = organization_id
+    related_ids = {getattr(instances[i], field.attname) for i in pending} - {None}
+    by_related_id = get_related_organization_ids(field.related_model, related_ids)
+    for i in pending:
+        organization_ids[i] = by_related_id.get(getattr(instances[i], field.attname))
+    return organization_ids
+
+
+def get_related_organization_ids(model, pks):
+    """{pk: organization id} of the rows of model with the given pks"""
+    if not pks:
+        return {}
+    if is_reference_family(get_model_family(model)):
+        instances = [instance for instance in (get_reference(model, pk) for pk in pks) if instance is not None]
+        return dict(zip((instance.pk for instance in instances), get_organization_ids(model, instances)))
+    lookup = get_organization_lookup(model)
+    if lookup is None:
+        return {}
+    return dict(model._base_manager.filter(pk__in=pks).values_list('pk', lookup))
+
+
+def invalidate_instances(model, instances, using=None):
+    instances = list(instances)
+    attnames = get_foreign_key_attnames(model)
+    organization_ids = get_organization_ids(model, instances)
+    invalidate(model, ((instance.pk, organization_id, {attname: getattr(instance, attname) for attname in attnames})
+                       for instance, organization_id in zip(instances, organization_ids)), using)
+
+
+def invalidate_pks(model, pks, using=None):
+    """Invalidate rows written without model signals (raw SQL), reading what invalidating them needs"""
+    attnames = get_foreign_key_attnames(model)
+    lookup = get_organization_lookup(model)
+    values = model._base_manager.using(using).filter(pk__in=pks).values_list(
+        'pk', lookup or Value(None, output_field=IntegerField()), *attnames)
+    invalidate(model, ((pk, organization_id, dict(zip(attnames, foreign_keys)))
+                       for pk, organization_id, *foreign_keys in values), using)
+
+
+def invalidate_saved_instance(sender, instance, using=None, **kwargs):
+    invalidate_instances(sender, [instance], using)
+
+
+def invalidate_updated_rows(sender, pks, using=None, **kwargs):
+    invalidate_pks(sender, pks, using)
+
+
+def invalidate_created_objects(sender, objs, using=None, **kwargs):
+    invalidate_instances(sender, objs, using)
+
+
+def connect_signals():
+    """Invalidate on every write of the project's models"""
+    for app_config in apps.get_app_configs():
+        if not app_config.name.startswith('app.'):
+            continue
+        for model in app_config.get_models():
+            post_save.connect(invalidate_saved_instance, sender=model)
+            post_delete.connect(invalidate_saved_instance, sender=model)
+            post_update.connect(invalidate_updated_rows, sender=model)
+            post_bulk_create.connect(invalidate_created_objects, sender=model)
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 
 
@@ -28,3 +29,167 @@ class EnumValueSerializer(serializers.Serializer):
         if self.field:
             return f"{settings.MEDIA_URL}icons/{self.field}/{enum.name.lower()}.svg"
         return None
+
+
+IDENTITY_MAP = 'identity_map'
+# Set on serializers trimmed by apply_sparse_fieldset, identifies the shape they render
+SPARSE_KEY = 'sparse_key'
+
+
+class IdentityMapSerializerMixin:
+    """
+    Serialize every distinct object only once per serialization run. Objects like places and organizations
+    repeat many times within one page; when the context carries an identity map (Controller.serialize_one /
+    serialize_queryset provide one), the first representation of each (serializer, pk) is reused.
+    """
+
+    def to_representation(self, instance):
+        identity_map = self.context.get(IDENTITY_MAP)
+        if identity_map is None or instance.pk is None:
+            return super().to_representation(instance)
+        key = (type(self), getattr(self, SPARSE_KEY, None), instance.pk)
+        if key not in identity_map:
+            identity_map[key] = super().to_representation(instance)
+        return identity_map[key]
+
+
+def split_expand(expand):
+    """{'user', 'user.place', 'fish'} -> {'user': {'place'}, 'fish': set()}"""
+    expanded = {}
+    for path in expand:
+        name, _, rest = path.partition('.')
+        expanded.setdefault(name, set())
+        if rest:
+            expanded[name].add(rest)
+    return expanded
+
+
+def apply_sparse_fieldset(serializer, fields=None, expand=None):
+    """
+    Trim a serializer instance in place for the ?fields= / ?expand= query parameters.
+    :param fields: top level field names to keep, None keeps every field
+    :param expand: relations to render nested, dotted for deeper levels (user, user.place). Any other
+                   relation is rendered as its primary key. None keeps every relation expanded.
+    """
+    if fields is None and expand is None:
+        return serializer
+    related_method_fields = getattr(type(serializer).Meta, 'related_method_fields', {})
+    expanded = split_expand(expand) if expand is not None else None
+    for name, field in list(serializer.fields.items()):
+        if fields is not None and name not in fields:
+            del serializer.fields[name]
+            continue
+        if expanded is None:
+            continue
+        is_nested = isinstance(field, serializers.BaseSerializer)
+        if not is_nested and not (isinstance(field, serializers.SerializerMethodField) and
+                                  name in related_method_fields):
+            continue
+        if name in expanded:
+            if is_nested:
+                child = field.child if isinstance(field, serializers.ListSerializer) else field
+                apply_sparse_fieldset(child, expand=expanded[name])
+            continue
+        source = field.source if is_nested else name
+        kwargs = {'source': source} if source != name else {}
+        serializer.fields[name] = serializers.PrimaryKeyRelatedField(
+            read_only=True, many=isinstance(field, serializers.ListSerializer), **kwargs
+        )
+    setattr(serializer, SPARSE_KEY, (tuple(serializer.fields), tuple(sorted(expand or ()))))
+    return serializer
+
+
+def fields_are_default(serializer):
+    return getattr(serializer, SPARSE_KEY, None) is None
+
+
+class NormalizedList(list):
+    """
+    Results serialized in normalized form: rows carry primary keys for their relations and every distinct
+    related object is in included, {model name: {pk: representation}}. Pagination adds included to the
+    response next to the results.
+    """
+
+    def __init__(self, rows=(), included=None):
+        super().__init__(rows)
+        self.included = included or {}
+
+
+def get_side_loads(serializer):
+    """
+    Rewrite a serializer instance in place so it renders every relation it would nest (nested serializers and
+    Meta.related_method_fields) as primary key(s). Returns those relations as [(field, source, child
+    serializer, many)], the child rendering the related objects that go to the included map.
+    """
+    related_method_fields = getattr(type(serializer).Meta, 'related_method_fields', {})
+    model = type(serializer).Meta.model
+    side_loads = []
+    for name, field in list(serializer.fields.items()):
+        if isinstance(field, serializers.BaseSerializer):
+            source = field.source
+            child = field.child if isinstance(field, serializers.ListSerializer) else field
+        elif isinstance(field, serializers.SerializerMethodField) and name in related_method_fields:
+            source = name
+            child_class = related_method_fields[name]
+            child_class = type(serializer) if child_class == 'self' else child_class
+            child = child_class(context=serializer.context)
+        else:
+            continue
+        if getattr(getattr(child, 'Meta', None), 'model', None) is None or '.' in source:
+            continue
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.is_relation:
+            continue
+        many = model_field.one_to_many or model_field.many_to_many
+        kwargs = {'source': source} if source != name else {}
+        serializer.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, **kwargs)
+        side_loads.append((name, source, child, many))
+    # Flat representations must not be mistaken for nested ones in the identity map
+    setattr(serializer, SPARSE_KEY, (getattr(serializer, SPARSE_KEY, None), 'normalized'))
+    return side_loads
+
+
+def normalize_representation(serializer, instances):
+    """
+    Serialize instances in normalized form, see NormalizedList. Related objects are taken from what is
+    already loaded on the instances, so load them up front (Controller.load_relations). Objects of one model
+    reached through differently trimmed serializers are included in the first shape met.
+    """
+    included = {}
+    # Serializer classes reached through Meta.related_method_fields are built fresh, flatten them once per shape
+    flattened = {}
+
+    def flatten(serializer):
+        key = (type(serializer), getattr(serializer, SPARSE_KEY, None))
+        if key in flattened:
+            return flattened[key]
+        flattened[key] = (serializer, get_side_loads(serializer))
+        return flattened[key]
+
+    def side_load(serializer, instances):
+        serializer, side_loads = flatten(serializer)
+        rows = [serializer.to_representation(instance) for instance in instances]
+        for name, source, child, many in side_loads:
+            model_name = type(child).Meta.model._meta.model_name
+            bucket = included.get(model_name, {})
+            pending = {}
+            for instance in instances:
+                value = getattr(instance, source, None)
+                if value is None:
+                    continue
+                for obj in (value.all() if many else [value]):
+                    if obj.pk not in bucket and obj.pk not in pending:
+                        pending[obj.pk] = obj
+            if not pending:
+                continue
+            # Claim the keys before recursing so self-referencing relations terminate
+            bucket = included.setdefault(model_name, bucket)
+            bucket.update(dict.fromkeys(pending))
+            for pk, row in zip(pending, side_load(child, list(pending.values()))):
+                bucket[pk] = row
+        return rows
+
+    return NormalizedList(side_load(serializer, list(instances)), included)
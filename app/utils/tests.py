@@ -0,0 +1,526 @@
+import datetime
+import json
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse, JsonResponse as DjangoJsonResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone, translation
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy
+from django_redis import get_redis_connection
+from rest_framework import status, viewsets
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from app.fish.models import Discount, Fish, FishVariant, PriceHistory
+from app.fish.serializers import PriceHistorySerializer
+from app.logistics.enums import RecordType
+from app.logistics.models import Bill, BillItem, Expense, Record, Stock
+from app.logistics.serializers import RecordSerializer
+from app.organizations.models import ExpenseType, Organization, Place
+from app.users.models import User
+from app.utils.compiled_serializers import NotCompilable, get_compiled_serializer
+from app.utils.constants import CacheKeys
+from app.utils.controllers import Controller
+from app.utils.helpers import build_cache_key, idempotent
+from app.utils.local_cache import get_invalidation_channel, get_reference_key, invalidation_listener, local_cache
+from app.utils.management.commands.benchmark_serializers import SERIALIZERS
+from app.utils.querysets import post_bulk_create, post_update
+from app.utils.renderers import FastJSONRenderer, JsonResponse, orjson_dumps, stdlib_dumps
+from app.utils.response_cache import cache_detail, get_evictions, get_generations, get_hit_ratios, \
+    get_validators_key, hit_counter, reset_hit_ratios
+
+
+# The default cache, pointed at a port nothing listens on
+UNREACHABLE_CACHES = {'default': {**settings.CACHES['default'], 'LOCATION': 'redis://127.0.0.1:1/0'}}
+
+
+def create_user(organization, place, **fields):
+    return User.objects.create(username=uuid.uuid4().hex, name='user', organization=organization, place=place,
+                               mobile_no=str(uuid.uuid4().int)[:10], **fields)
+
+
+class CacheTestCase(TestCase):
+    """Starts every test with empty caches; the response cache would otherwise outlive the test database"""
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        # setUpTestData registered an invalidation batch that never commits; writes of the test get their own, so
+        # captureOnCommitCallbacks() runs it
+        connection.invalidation_batch = None
+
+
+class CompiledSerializerTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='organization')
+        center = Place.objects.create(name='center', organization=organization, type=1)
+        retail = Place.objects.create(name='retail', organization=organization, type=3, center=center)
+        user = create_user(organization, center, designation=2)
+        discount = Discount.objects.create(name='discount', discount=10, organization=organization)
+        expense_type = ExpenseType.objects.create(name='ice', organization=organization)
+        for i in range(6):
+            fish = Fish.objects.create(name=f'fish {i}', organization=organization)
+            variant = FishVariant.objects.create(name=f'variant {i}', fish=fish, price=Decimal('12.50'))
+            PriceHistory.objects.create(price=Decimal('12.50'), user=user, fish_variant=variant)
+            Record.objects.create(organization=organization, user=user, import_from=retail, export_to=center,
+                                  record_type=RecordType.IMPORT, discount=discount if i % 2 else None, fish=fish,
+                                  fish_variant=variant, weigh_place=center, weight=Decimal('10.25') * i,
+                                  weight_unit='lb' if i % 3 == 0 else 'kg', is_SP=i % 2 == 0)
+            bill = Bill.objects.create(organization=organization, user=user, bill_place=retail, price=Decimal(100),
+                                       discount=discount, total_amount=Decimal(100), billed_amount=Decimal(90),
+                                       discounted_price=Decimal(90))
+            BillItem.objects.create(bill=bill, weight=Decimal('2.5'), price=Decimal(50), fish=fish,
+                                    fish_variant=variant)
+            BillItem.objects.create(bill=bill, weight=Decimal('1.5'), price=Decimal(50), fish=fish)
+            Stock.objects.create(place=center, fish=fish, fish_variant=variant, weight=Decimal('7.5') * i)
+            Expense.objects.create(organization=organization, user=user, expense_date=timezone.now(),
+                                   type=expense_type, desc=f'expense {i}', amount=Decimal('3.20') * i)
+
+    def serialize(self, serializer_class, queryset, compiled):
+        with override_settings(COMPILED_SERIALIZERS=compiled):
+            return Controller().serialize_queryset(queryset.all(), serializer_class)
+
+    def get_compiled_serializer_classes(self):
+        serializer_classes = []
+        for path in SERIALIZERS:
+            serializer_class = import_string(path)
+            try:
+                get_compiled_serializer(serializer_class)
+            except NotCompilable:
+                continue
+            serializer_classes.append(serializer_class)
+        return serializer_classes
+
+    def test_compiled_output_equals_drf_output(self):
+        serializer_classes = self.get_compiled_serializer_classes()
+        self.assertTrue(serializer_classes)
+        for serializer_class in serializer_classes:
+            queryset = serializer_class.Meta.model.objects.order_by('-pk')
+            for language in ('en', 'hi'):
+                with self.subTest(serializer=serializer_class.__name__, language=language), \
+                        translation.override(language):
+                    compiled = self.serialize(serializer_class, queryset, compiled=True)
+                    self.assertTrue(compiled)
+                    self.assertEqual(compiled, self.serialize(serializer_class, queryset, compiled=False))
+
+    def test_record_type_does_not_depend_on_weight_unit(self):
+        record = Record.objects.first()
+        Record.objects.filter(pk=record.pk).update(weight_unit='', record_type=RecordType.EXPORT)
+        queryset = Record.objects.filter(pk=record.pk)
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled):
+                [data] = self.serialize(RecordSerializer, queryset, compiled=compiled)
+                self.assertEqual(data['record_type']['id'], RecordType.EXPORT)
+                self.assertEqual(data['weight_unit'], {})
+
+    def test_compiled_query_count_does_not_grow_with_the_page(self):
+        for serializer_class in self.get_compiled_serializer_classes():
+            queryset = serializer_class.Meta.model.objects.order_by('-pk')
+            with self.subTest(serializer=serializer_class.__name__):
+                with CaptureQueriesContext(connection) as queries:
+                    self.serialize(serializer_class, queryset, compiled=True)
+                # One values_list() query, and one per level of Meta.related_method_fields, for at least six
+                # objects of every model
+                self.assertLessEqual(len(queries), 3)
+
+
+class RendererTests(SimpleTestCase):
+    """orjson responses decode to what the renderers they replaced produced"""
+
+    data = {
+        'decimals': [Decimal('12.50'), Decimal('-0.01'), Decimal('0'), Decimal('123456789.99')],
+        'aware': datetime.datetime(2024, 3, 9, 17, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'offset': datetime.datetime(2024, 3, 9, 17, 4, 5,
+                                    tzinfo=datetime.timezone(datetime.timedelta(hours=5, minutes=30))),
+        'naive': datetime.datetime(2024, 3, 9, 17, 4, 5, 120000),
+        'date': datetime.date(2024, 3, 9),
+        'time': datetime.time(17, 4, 5, 1000),
+        'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'text': ['मछली', 'ñandú', 'naïve café', '🐟', 'quote " backslash \\ newline \n'],
+        'lazy': gettext_lazy('Kilograms'),
+        'nested': {'items': [{'id': 1, 'weight': Decimal('2.50'), 'is_SP': False, 'desc': None}]},
+        1: 'integer key',
+    }
+
+    def test_json_response_matches_django(self):
+        expected = json.loads(DjangoJsonResponse(self.data).content)
+        for dumps in (orjson_dumps, stdlib_dumps):
+            with self.subTest(dumps=dumps.__name__), \
+                    override_settings(JSON_DUMPS=f'{dumps.__module__}.{dumps.__name__}'):
+                self.assertEqual(json.loads(JsonResponse(self.data).content), expected)
+
+    def test_renderer_matches_drf(self):
+        expected = json.loads(JSONRenderer().render(self.data))
+        for dumps in (orjson_dumps, stdlib_dumps):
+            with self.subTest(dumps=dumps.__name__), \
+                    override_settings(JSON_DUMPS=f'{dumps.__module__}.{dumps.__name__}'):
+                self.assertEqual(json.loads(FastJSONRenderer().render(self.data)), expected)
+
+    def test_encoders_agree_byte_for_byte(self):
+        self.assertEqual(orjson_dumps(self.data), stdlib_dumps(self.data))
+
+    def test_non_ascii_is_utf8(self):
+        content = JsonResponse({'name': 'मछली'}).content
+        self.assertEqual(content, '{"name":"मछली"}'.encode())
+
+
+class InvalidationTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.other_organization = Organization.objects.create(name='other organization')
+        place = Place.objects.create(name='center', organization=cls.organization, type=1)
+        user = create_user(cls.organization, place, designation=2)
+        cls.fish = Fish.objects.create(name='fish', organization=cls.organization)
+        cls.variant = FishVariant.objects.create(name='variant', fish=cls.fish, price=Decimal('12.50'))
+        cls.price_history = PriceHistory.objects.create(price=Decimal('12.50'), user=user, fish_variant=cls.variant)
+
+    def cache_price_history(self, evictions):
+        data = Controller().serialize_one(self.price_history, PriceHistorySerializer)
+        cache_detail('price_history', PriceHistorySerializer, data, evictions, timeout=60)
+
+    def test_write_bumps_generations_of_its_organization(self):
+        before = get_generations(['fish.fish'], self.organization.pk)
+        other_before = get_generations(['fish.fish'], self.other_organization.pk)
+        every_before = get_generations(['fish.fish'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Fish.objects.filter(pk=self.fish.pk).update(name='renamed')
+        self.assertNotEqual(get_generations(['fish.fish'], self.organization.pk), before)
+        self.assertEqual(get_generations(['fish.fish'], self.other_organization.pk), other_before)
+        self.assertNotEqual(get_generations(['fish.fish']), every_before)
+
+    def test_generations_are_bumped_on_commit_only(self):
+        before = get_generations(['fish.fish'], self.organization.pk)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.fish.save()
+        self.assertEqual(get_generations(['fish.fish'], self.organization.pk), before)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_writing_a_nested_object_evicts_the_detail(self):
+        self.cache_price_history(get_evictions())
+        self.assertIsNotNone(cache.get('price_history'))
+        self.assertIsNotNone(cache.get(get_validators_key('price_history')))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.save()
+        self.assertIsNone(cache.get('price_history'))
+        self.assertIsNone(cache.get(get_validators_key('price_history')))
+
+    def test_unrelated_write_keeps_the_detail(self):
+        self.cache_price_history(get_evictions())
+        with self.captureOnCommitCallbacks(execute=True):
+            FishVariant.objects.create(name='other', fish=self.fish)
+        self.assertIsNotNone(cache.get('price_history'))
+
+    def test_detail_read_before_an_eviction_is_not_cached(self):
+        evictions = get_evictions()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.variant.save()
+        self.cache_price_history(evictions)
+        self.assertIsNone(cache.get('price_history'))
+        self.cache_price_history(get_evictions())
+        self.assertIsNotNone(cache.get('price_history'))
+
+
+class GenerationTests(CacheTestCase):
+    def test_missing_generations_are_started_once(self):
+        generations = get_generations(['fish.fish', 'fish.fishvariant'], organization_id=1)
+        self.assertEqual(len(generations), 4)
+        self.assertTrue(all(generations))
+        self.assertEqual(get_generations(['fish.fish', 'fish.fishvariant'], organization_id=1), generations)
+
+    @override_settings(CACHES=UNREACHABLE_CACHES)
+    def test_unreachable_cache_has_no_generations(self):
+        self.assertIsNone(get_generations(['fish.fish'], organization_id=1))
+        self.assertIsNone(get_generations(['fish.fish']))
+
+
+class RecordRequestTestCase(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        organization = Organization.objects.create(name='organization')
+        cls.place = Place.objects.create(name='center', organization=organization, type=1)
+        cls.user = create_user(organization, cls.place, designation=2)
+        cls.record = Record.objects.create(organization=organization, record_type=RecordType.IMPORT,
+                                           export_to=cls.place, weight=Decimal('1.50'))
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url='/farms/api/records/?page=1'):
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+
+@override_settings(CACHE_STATS_FLUSH_INTERVAL=0)
+class CachedListingTests(RecordRequestTestCase):
+    def setUp(self):
+        super().setUp()
+        hit_counter.counts.clear()
+
+    def test_hits_and_misses_are_counted(self):
+        miss = self.get()
+        hit = self.get()
+        self.assertEqual(hit.json(), miss.json())
+        self.get('/farms/api/records/?page=1&is_SP=true')
+        self.assertEqual(get_hit_ratios()[CacheKeys.RECORD_LIST.name], (1, 2))
+        self.assertTrue(reset_hit_ratios())
+        self.assertEqual(get_hit_ratios(), {})
+
+    def test_write_misses_the_cached_listing(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            Record.objects.filter(pk=self.record.pk).update(weight=Decimal('2.50'))
+        self.assertEqual(self.get().json()['results'][0]['weight'], '2.50')
+        self.assertEqual(get_hit_ratios()[CacheKeys.RECORD_LIST.name], (0, 2))
+
+    def test_listing_is_served_while_redis_is_down(self):
+        with override_settings(CACHES=UNREACHABLE_CACHES):
+            for _ in range(2):
+                response = self.get()
+                self.assertEqual([record['id'] for record in response.json()['results']], [self.record.pk])
+                self.assertNotIn('ETag', response)
+                self.assertNotIn('Last-Modified', response)
+            with self.assertLogs('app.utils.response_cache', 'WARNING'):
+                self.assertEqual(get_hit_ratios(), {})
+                self.assertFalse(reset_hit_ratios())
+        self.assertFalse(hit_counter.counts)
+
+
+class ConditionalGetTests(RecordRequestTestCase):
+    def get_conditional(self, url, response, status_code):
+        conditional = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(conditional.status_code, status_code)
+        return conditional
+
+    def test_listing_not_modified_until_a_write(self):
+        url = '/farms/api/records/?page=1'
+        response = self.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        not_modified = self.get_conditional(url, response, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        since = self.client.get(url, secure=True, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Record.objects.filter(pk=self.record.pk).update(weight=Decimal('2.50'))
+        modified = self.get_conditional(url, response, 200)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+        self.assertEqual(modified.json()['results'][0]['weight'], '2.50')
+
+    def test_detail_not_modified_until_a_write(self):
+        url = f'/farms/api/records/{self.record.pk}/'
+        response = self.get(url)
+        # Validators of the entry cached by the first response, answered from it without the view
+        with self.assertNumQueries(0):
+            not_modified = self.get_conditional(url, response, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        since = self.client.get(url, secure=True, HTTP_IF_MODIFIED_SINCE=self.get(url)['Last-Modified'])
+        self.assertEqual(since.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Place.objects.filter(pk=self.place.pk).update(name='renamed')
+        modified = self.get_conditional(url, response, 200)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+        self.assertEqual(modified.json()['export_to']['name'], 'renamed')
+
+    def test_listing_is_never_not_modified_while_redis_is_down(self):
+        url = '/farms/api/records/?page=1'
+        response = self.get(url)
+        with override_settings(CACHES=UNREACHABLE_CACHES):
+            self.get_conditional(url, response, 200)
+            since = self.client.get(url, secure=True, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(since.status_code, 200)
+
+
+class CountingViewSet(viewsets.ViewSet):
+    """Idempotent endpoints answering with a DRF Response and with a plain HttpResponse, counting their calls"""
+    calls = 0
+
+    @idempotent
+    def create(self, request):
+        CountingViewSet.calls += 1
+        return Response({'calls': CountingViewSet.calls}, status=status.HTTP_201_CREATED)
+
+    @idempotent
+    def update(self, request, pk):
+        CountingViewSet.calls += 1
+        return HttpResponse(f'calls={CountingViewSet.calls}', content_type='text/plain', status=status.HTTP_200_OK)
+
+
+class IdempotencyTests(RecordRequestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.fish = Fish.objects.create(name='fish', organization=cls.user.organization)
+
+    def setUp(self):
+        super().setUp()
+        CountingViewSet.calls = 0
+
+    def land(self, key, weight='10', user=None):
+        if user is not None:
+            self.client.force_authenticate(user)
+        return self.client.post('/farms/api/records/add_to_landings/', {'fish_id': self.fish.pk, 'weight': weight},
+                                format='json', secure=True, HTTP_IDEMPOTENCY_KEY=key)
+
+    def get_stock_weight(self):
+        return Stock.objects.get(fish=self.fish).weight
+
+    def test_replay_returns_the_stored_response_without_applying_again(self):
+        response = self.land('key')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        replayed = self.land('key')
+        self.assertEqual((replayed.status_code, replayed.content), (201, response.content))
+        self.assertEqual(replayed['Content-Type'], response['Content-Type'])
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(Record.objects.filter(fish=self.fish).count(), 1)
+        self.assertEqual(self.get_stock_weight(), Decimal('10.00'))
+
+    def test_other_keys_users_and_unkeyed_requests_are_applied(self):
+        self.land('key')
+        self.land('other key')
+        self.land('key', user=create_user(self.user.organization, self.place, designation=2))
+        self.client.post('/farms/api/records/add_to_landings/', {'fish_id': self.fish.pk, 'weight': '10'},
+                         format='json', secure=True)
+        self.assertEqual(self.get_stock_weight(), Decimal('40.00'))
+
+    def test_key_reused_with_another_payload_is_rejected(self):
+        self.land('key', weight='10')
+        response = self.land('key', weight='12')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.get_stock_weight(), Decimal('10.00'))
+
+    def test_key_in_progress_is_a_conflict(self):
+        lock_key = build_cache_key(CacheKeys.IDEMPOTENT_LOCK, user_id=self.user.pk,
+                                   path='/farms/api/records/add_to_landings/', key='key')
+        cache.add(lock_key, 'fingerprint')
+        self.assertEqual(self.land('key').status_code, 409)
+        self.assertFalse(Stock.objects.exists())
+        cache.delete(lock_key)
+        self.assertEqual(self.land('key').status_code, 201)
+
+    def test_failures_are_not_stored(self):
+        self.assertEqual(self.land('key', weight='-1').status_code, 400)
+        response = self.land('key', weight='-1')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.land('key').status_code, 201)
+
+    def test_replayed_drf_response_is_rendered_from_its_data(self):
+        view = CountingViewSet.as_view({'post': 'create'})
+        responses = []
+        for _ in range(2):
+            request = APIRequestFactory().post('/counting/', {'weight': 1}, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            force_authenticate(request, self.user)
+            responses.append(view(request).render())
+        self.assertEqual(CountingViewSet.calls, 1)
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(json.loads(responses[1].content), {'calls': 1})
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+
+    def test_replayed_http_response_keeps_its_content_type(self):
+        view = CountingViewSet.as_view({'put': 'update'})
+        responses = []
+        for _ in range(2):
+            request = APIRequestFactory().put('/counting/1/', {'weight': 1}, format='json', HTTP_IDEMPOTENCY_KEY='key')
+            force_authenticate(request, self.user)
+            responses.append(view(request, pk=1))
+        self.assertEqual(CountingViewSet.calls, 1)
+        self.assertEqual(responses[1].content, b'calls=1')
+        self.assertEqual(responses[1]['Content-Type'], 'text/plain')
+        self.assertEqual(responses[1]['Idempotent-Replayed'], 'true')
+
+
+class SignalingQuerySetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.fish = [Fish.objects.create(name=f'fish {i}', organization=cls.organization) for i in range(3)]
+
+    def setUp(self):
+        self.sent = []
+        post_update.connect(self.receive, sender=Fish)
+        post_bulk_create.connect(self.receive, sender=Fish)
+        self.addCleanup(post_update.disconnect, self.receive, sender=Fish)
+        self.addCleanup(post_bulk_create.disconnect, self.receive, sender=Fish)
+
+    def receive(self, signal, sender, using, **kwargs):
+        self.sent.append((signal, sender, using, kwargs))
+
+    def test_update_sends_the_updated_pks(self):
+        rows = Fish.objects.filter(pk__in=[self.fish[0].pk, self.fish[2].pk]).update(name='renamed')
+        self.assertEqual(rows, 2)
+        [(signal, sender, using, kwargs)] = self.sent
+        self.assertEqual((signal, sender, using), (post_update, Fish, 'default'))
+        self.assertEqual(sorted(kwargs['pks']), [self.fish[0].pk, self.fish[2].pk])
+
+    def test_update_of_nothing_sends_nothing(self):
+        self.assertEqual(Fish.objects.filter(pk=0).update(name='renamed'), 0)
+        self.assertEqual(Fish.objects.none().update(name='renamed'), 0)
+        self.assertEqual(self.sent, [])
+
+    def test_bulk_update_sends_the_updated_pks(self):
+        for fish in self.fish:
+            fish.name = f'renamed {fish.pk}'
+        Fish.objects.bulk_update(self.fish, ['name'])
+        self.assertEqual(sorted(pk for _, _, _, kwargs in self.sent for pk in kwargs['pks']),
+                         sorted(fish.pk for fish in self.fish))
+        self.assertTrue(all(signal is post_update for signal, *_ in self.sent))
+
+    def test_bulk_create_sends_the_objects(self):
+        objs = Fish.objects.bulk_create([Fish(name='new', organization=self.organization)])
+        [(signal, sender, _, kwargs)] = self.sent
+        self.assertEqual((signal, sender), (post_bulk_create, Fish))
+        self.assertEqual(kwargs['objs'], objs)
+        self.assertIsNotNone(objs[0].pk)
+
+
+class LocalCacheInvalidationTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organization = Organization.objects.create(name='organization')
+        cls.fish = Fish.objects.create(name='fish', organization=cls.organization)
+
+    def setUp(self):
+        super().setUp()
+        invalidation_listener.ensure_started()
+        self.assertTrue(invalidation_listener.subscribed.wait(timeout=5))
+        self.key = get_reference_key('fish.fish', self.fish.pk)
+        local_cache.set(self.key, self.fish, local_cache.epoch)
+
+    def wait_for_eviction(self, key):
+        deadline = time.monotonic() + 5
+        while local_cache.get(key) is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return local_cache.get(key) is None
+
+    def test_published_keys_are_evicted(self):
+        other_key = get_reference_key('fish.fish', 0)
+        local_cache.set(other_key, self.fish, local_cache.epoch)
+        get_redis_connection('default').publish(get_invalidation_channel(), json.dumps([other_key]))
+        self.assertTrue(self.wait_for_eviction(other_key))
+        self.assertIsNotNone(local_cache.get(self.key))
+
+    def test_committed_write_evicts_the_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Fish.objects.filter(pk=self.fish.pk).update(name='renamed')
+        self.assertTrue(self.wait_for_eviction(self.key))
+
+    def test_value_read_before_an_eviction_is_not_stored(self):
+        epoch = local_cache.epoch
+        local_cache.delete([self.key])
+        local_cache.set(self.key, self.fish, epoch)
+        self.assertIsNone(local_cache.get(self.key))
@@ -1,4 +1,3 @@
-from django.http import JsonResponse
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
@@ -7,6 +6,7 @@ from rest_framework import status
 
 from app.utils.authentication import IsOrganizationUser
 from app.utils.helpers import get_data_for_field
+from app.utils.renderers import JsonResponse
 
 
 @api_view(['GET'])